@@ -0,0 +1,184 @@
+"""
+Critical path analysis of a flow, from the execution times in its task records.
+
+Every standalone task takes its execution_delta_time (0 if it did not run) and starts as soon as the task before it
+finishes - the prev in its chain, or whatever came before the composite the chain belongs to. A composite finishes
+when the last of its sub chains does.
+"""
+
+
+def analyze(task_list: list) -> dict:
+    """
+    Return the critical path analysis of the flow given as returned by to_list:
+
+        work - the total execution time of all tasks
+        span - the time the flow would take with unlimited parallelism, the length of the critical path
+        parallelism - work / span, the average number of tasks that could run at once
+        critical_path - the ids of the standalone tasks on the critical path, in the order they run
+        tasks - for every task in walk order: its id, name, duration, earliest start and finish, and slack - how much
+            longer it could take without making the flow take longer
+    """
+    analysis = _Analysis(task_list)
+
+    work = sum(analysis.get_duration(task_id) for task_id in analysis.order)
+    span = analysis.span
+    return {
+        "work": work,
+        "span": span,
+        "parallelism": work / span if span else None,
+        "critical_path": analysis.get_critical_path(),
+        "tasks": [
+            {
+                "id": task_id,
+                "name": analysis.records[task_id]["name"],
+                "is_standalone": analysis.records[task_id]["is_standalone"],
+                "duration": analysis.finish[task_id] - analysis.start[task_id],
+                "earliest_start": analysis.start[task_id],
+                "earliest_finish": analysis.finish[task_id],
+                "slack": analysis.get_slack(task_id),
+            }
+            for task_id in analysis.order
+        ],
+    }
+
+
+def critical_path(task_list: list) -> list:
+    """
+    Return the ids of the standalone tasks on the critical path of the flow given as returned by to_list.
+    """
+    return _Analysis(task_list).get_critical_path()
+
+
+def format_report(report: dict) -> str:
+    """
+    Format a report returned by analyze as text.
+    """
+    parallelism = f"{report['parallelism']:.2f}" if report["parallelism"] is not None else "-"
+    lines = [
+        f"work: {report['work']:.6f}s  span: {report['span']:.6f}s  parallelism: {parallelism}",
+        f"critical path: {' -> '.join(str(task_id) for task_id in report['critical_path'])}",
+        f"{'id':>8} {'duration':>12} {'start':>12} {'finish':>12} {'slack':>12}  name",
+    ]
+    for task in report["tasks"]:
+        lines.append(
+            f"{task['id']:>8} {task['duration']:>12.6f} {task['earliest_start']:>12.6f} "
+            f"{task['earliest_finish']:>12.6f} {task['slack']:>12.6f}  {task['name'] or ''}"
+        )
+
+    return "\n".join(lines)
+
+
+class _Analysis(object):
+    def __init__(self, task_list):
+        self.records = {task_data["id"]: task_data for task_data in task_list}
+        self.parents = {}
+        for task_data in task_list:
+            for sub_task_id in task_data.get("sub_tasks") or []:
+                self.parents[sub_task_id] = task_data["id"]
+
+        roots = [task_id for task_id, task_data in self.records.items() if not task_data["prev"]]
+        roots = [task_id for task_id in roots if task_id not in self.parents]
+        if len(roots) != 1:
+            raise ValueError(f"The task list must have exactly one root task, found {len(roots)}")
+
+        self._tails = {}
+        self.root_id = roots[0]
+        self._forward()
+        self._backward()
+
+    def get_duration(self, task_id):
+        task_data = self.records[task_id]
+        if not task_data["is_standalone"]:
+            return 0.0
+        return task_data.get("execution_delta_time") or 0.0
+
+    def get_tail(self, head_id):
+        if head_id not in self._tails:
+            task_id = head_id
+            while self.records[task_id]["next"]:
+                task_id = self.records[task_id]["next"]
+            self._tails[head_id] = task_id
+
+        return self._tails[head_id]
+
+    def get_slack(self, task_id):
+        # rounding errors should not make a task look late
+        return max(self.span - self.finish[task_id] - self._remaining[task_id], 0.0)
+
+    def get_critical_path(self):
+        path = []
+        task_id = self.get_tail(self.root_id)
+
+        while task_id is not None:
+            sub_tasks = self.records[task_id].get("sub_tasks")
+            if not self.records[task_id]["is_standalone"] and sub_tasks:
+                # continue into the sub chain that finished last
+                task_id = max((self.get_tail(sub_task_id) for sub_task_id in sub_tasks), key=self.finish.get)
+                continue
+
+            if self.records[task_id]["is_standalone"]:
+                path.append(task_id)
+
+            # move to what ran before - out of the composites whose first task this is
+            while task_id is not None and not self.records[task_id]["prev"]:
+                task_id = self.parents.get(task_id)
+            if task_id is not None:
+                task_id = self.records[task_id]["prev"]
+
+        path.reverse()
+        return path
+
+    def _forward(self):
+        # earliest start and finish of every task
+        self.start = {}
+        self.finish = {}
+        # the composite each task's chain belongs to
+        self.chain_parents = {}
+        # the order of to_list, which has every task after everything it waits for
+        self.order = []
+
+        stack = [(self.root_id, False)]
+        while stack:
+            task_id, sub_tasks_walked = stack.pop()
+            task_data = self.records[task_id]
+            sub_tasks = task_data.get("sub_tasks") or []
+
+            if not sub_tasks_walked:
+                if task_data["prev"]:
+                    self.start[task_id] = self.finish[task_data["prev"]]
+                    self.chain_parents[task_id] = self.chain_parents[task_data["prev"]]
+                elif task_id in self.parents:
+                    self.start[task_id] = self.start[self.parents[task_id]]
+                    self.chain_parents[task_id] = self.parents[task_id]
+                else:
+                    self.start[task_id] = 0.0
+                    self.chain_parents[task_id] = None
+
+                if not task_data["is_standalone"] and sub_tasks:
+                    stack.append((task_id, True))
+                    for task_index in range(len(sub_tasks) - 1, -1, -1):
+                        stack.append((sub_tasks[task_index], False))
+                    continue
+
+                self.finish[task_id] = self.start[task_id] + self.get_duration(task_id)
+            else:
+                self.finish[task_id] = max(self.finish[self.get_tail(sub_task_id)] for sub_task_id in sub_tasks)
+
+            self.order.append(task_id)
+            if task_data["next"]:
+                stack.append((task_data["next"], False))
+
+        self.span = self.finish[self.get_tail(self.root_id)]
+
+    def _backward(self):
+        # the longest time the flow still takes once a task finishes
+        self._remaining = {}
+
+        for task_id in reversed(self.order):
+            next_id = self.records[task_id]["next"]
+            if next_id:
+                self._remaining[task_id] = self.finish[next_id] - self.start[next_id] + self._remaining[next_id]
+            elif self.chain_parents[task_id] is not None:
+                self._remaining[task_id] = self._remaining[self.chain_parents[task_id]]
+            else:
+                self._remaining[task_id] = 0.0
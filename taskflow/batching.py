@@ -0,0 +1,74 @@
+"""
+Running many tasks that call the same function as one call of a batch version of it.
+
+    def square_all(args_list):
+        values = numpy.array([args[0] for args in args_list])
+        return list(values * values)
+
+    @batched(square_all, max_size=10000)
+    def square(value):
+        return value * value
+
+    Flow(CompositeTask(*[Task(square, args=(value,)) for value in range(100000)])).run()
+
+A flow running tasks of square that are ready at the same time calls square_all once for up to max_size of them,
+with the list of the arguments each task would have called square with, and gives every task its result from the
+returned list. The flow's keyword arguments are passed on to it. If the batch call fails, the flow calls square for
+each task of the batch instead, so that every task fails, is retried or halts on its own as it would without
+batching. Tasks with a timeout always run on their own.
+"""
+from .cancellation import _current_token
+from .outcomes import call_timed, elapsed, make_outcome, start_clock
+
+# where batched keeps the batch version on the function
+_ATTRIBUTE = "_taskflow_batch"
+
+
+class BatchFunction(object):
+    __slots__ = ("func", "max_size")
+
+    def __init__(self, func, max_size=None):
+        self.func = func
+        self.max_size = max_size
+
+
+def batched(batch_func, max_size=None):
+    """
+    Declare batch_func(args_list, **kwargs) as the batch version of the decorated function. It has to return the
+    results for args_list in the same order.
+    """
+
+    def decorator(func):
+        setattr(func, _ATTRIBUTE, BatchFunction(batch_func, max_size))
+        return func
+
+    return decorator
+
+
+def get_batch_function(func):
+    """
+    Return the BatchFunction declared for func with batched, or None.
+    """
+    return getattr(func, _ATTRIBUTE, None)
+
+
+def execute_batch(batch_func, func, args_list, kwargs, token=None):
+    """
+    Call batch_func for args_list and return the outcome for each of them in the form Task._execute does, with the
+    duration of the call split evenly. If the call fails, call func for each of them instead.
+    """
+    token_reset = _current_token.set(token) if token is not None else None
+    try:
+        started = start_clock()
+        try:
+            results = list(batch_func(args_list, **kwargs))
+            if len(results) != len(args_list):
+                raise ValueError(f"The batch function returned {len(results)} results for {len(args_list)} calls")
+        except Exception:
+            return [call_timed(func, *args, **kwargs) for args in args_list]
+
+        delta_time = elapsed(started) / len(args_list)
+        return [make_outcome(result, None, started, delta_time) for result in results]
+    finally:
+        if token_reset is not None:
+            _current_token.reset(token_reset)
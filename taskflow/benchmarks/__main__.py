@@ -0,0 +1,3 @@
+from taskflow.benchmarks.flows import main
+
+main()
@@ -0,0 +1,82 @@
+"""
+Measure building, running and serializing synthetic flows.
+
+    python -m taskflow.benchmarks [--size N] [--shape SHAPE ...] [--repeat N]
+
+Prints a JSON document, so that the results of different versions can be compared. Times are in seconds, the best of
+--repeat runs, and memory is the peak traced while building the tasks and the flow.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import taskflow
+from taskflow.benchmarks.generators import GENERATORS
+from taskflow.flow import Flow
+
+
+def _timed(func, *args):
+    # the result of func and the seconds it took - shared by the benchmarks
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _step_all(flow):
+    while flow.step():
+        pass
+
+
+def measure(shape, size):
+    generator = GENERATORS[shape]
+    result = {"shape": shape, "size": size}
+
+    root, result["build_seconds"] = _timed(generator, size)
+    flow, result["flow_seconds"] = _timed(Flow, root)
+    task_list, result["to_list_seconds"] = _timed(flow.to_list)
+    result["tasks"] = len(task_list)
+    _, result["from_list_seconds"] = _timed(Flow.from_list, task_list)
+
+    _, result["run_seconds"] = _timed(flow.run)
+    _, result["step_seconds"] = _timed(_step_all, Flow.from_list(task_list))
+    del root, flow, task_list
+
+    tracemalloc.start()
+    try:
+        Flow(generator(size))
+        result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return result
+
+
+def run(shapes=None, size=10000, repeat=1):
+    results = []
+    for shape in shapes or GENERATORS:
+        runs = [measure(shape, size) for _ in range(repeat)]
+        # best of the runs for every measurement
+        results.append(dict(runs[0], **{key: min(run[key] for run in runs) for key in runs[0] if key != "shape"}))
+
+    return {
+        "taskflow": taskflow.__version__,
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark building, running and serializing synthetic flows.")
+    parser.add_argument("--size", type=int, default=10000, help="number of tasks of each flow")
+    parser.add_argument("--shape", action="append", choices=sorted(GENERATORS), help="shapes to run, all by default")
+    parser.add_argument("--repeat", type=int, default=1, help="number of runs to keep the best of")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    print(json.dumps(run(args.shape, args.size, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Synthetic flows of a given number of tasks, made of tasks that do nothing.
+"""
+import random
+
+from taskflow.batching import batched
+from taskflow.tasks import CompositeTask, Task
+
+
+def noop(*args, **kwargs):
+    return None
+
+
+def noop_all(args_list, **kwargs):
+    return [None] * len(args_list)
+
+
+@batched(noop_all, max_size=10)
+def batched_noop(*args, **kwargs):
+    return None
+
+
+def chain(size):
+    """
+    A single chain of size tasks.
+    """
+    root = leaf = Task(noop)
+    for _ in range(size - 1):
+        leaf = leaf.then(Task(noop))
+    return root
+
+
+def fan_out(size):
+    """
+    size - 1 independent tasks followed by a task that needs all their results.
+    """
+    return CompositeTask(*[Task(noop) for _ in range(max(size - 1, 1))]).then(Task(noop))
+
+
+def batched_fan_out(size):
+    """
+    The same as fan_out, with the independent tasks run in batch calls of 10 - see taskflow.batching.
+    """
+    return CompositeTask(*[Task(batched_noop) for _ in range(max(size - 1, 1))]).then(Task(noop))
+
+
+def nested(size, width=4):
+    """
+    Composites of width sub tasks nested in each other, of size tasks in all, composites included - as many tasks at
+    the bottom as fit, and the tasks left over chained after the outermost composite.
+    """
+    # the most tasks at the bottom whose tree still fits in size
+    low, high = 1, size
+    while low < high:
+        middle = (low + high + 1) // 2
+        if _count_nested(middle, width) <= size:
+            low = middle
+        else:
+            high = middle - 1
+
+    level = [Task(noop) for _ in range(low)]
+    while len(level) > 1:
+        level = [CompositeTask(*level[index:index + width]) for index in range(0, len(level), width)]
+
+    leaf = level[0]
+    for _ in range(size - _count_nested(low, width)):
+        leaf = leaf.then(Task(noop))
+    return level[0]
+
+
+def _count_nested(bottom, width):
+    # tasks of nested with bottom tasks at the bottom
+    count = level = bottom
+    while level > 1:
+        level = -(-level // width)
+        count += level
+    return count
+
+
+def random_graph(size, seed=0, max_depth=4):
+    """
+    A random mix of chains and composites - including composites of chains of composites - of size tasks in all.
+    """
+    rng = random.Random(seed)
+    return _random_chain(rng, size, max_depth)
+
+
+def _random_chain(rng, budget, depth):
+    root = leaf = Task(noop)
+    budget -= 1
+
+    while budget > 0:
+        if depth > 0 and budget > 2 and rng.random() < 0.3:
+            # spend part of what is left on a composite of smaller random graphs
+            composite_budget = rng.randint(2, budget)
+            width = rng.randint(2, min(8, composite_budget))
+            sizes = _split(rng, composite_budget - 1, width)
+            task = CompositeTask(*[_random_chain(rng, sub_size, depth - 1) for sub_size in sizes])
+            budget -= composite_budget
+        else:
+            task = Task(noop)
+            budget -= 1
+
+        leaf = leaf.then(task)
+
+    return root
+
+
+def _split(rng, total, parts):
+    # parts positive sizes adding up to total
+    parts = min(parts, total)
+    cuts = sorted(rng.sample(range(1, total), parts - 1))
+    return [end - start for start, end in zip([0] + cuts, cuts + [total])]
+
+
+GENERATORS = {
+    "chain": chain,
+    "fan_out": fan_out,
+    "batched_fan_out": batched_fan_out,
+    "nested": nested,
+    "random_graph": random_graph,
+}
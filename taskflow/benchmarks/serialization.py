@@ -0,0 +1,46 @@
+"""
+Compare the size and speed of the JSON and binary forms of a flow.
+
+    python -m taskflow.benchmarks.serialization [task count]
+"""
+import json
+import sys
+
+from taskflow import binary
+from taskflow.benchmarks.flows import _timed
+from taskflow.flow import Flow
+from taskflow.tasks import CompositeTask, Task
+
+
+def _sample_function(*args):
+    return args
+
+
+def run(task_count=100000):
+    chains = [
+        Task(_sample_function, args=[index]).then(Task(_sample_function, name=f"step {index}"))
+        for index in range(task_count // 2)
+    ]
+    flow = Flow(CompositeTask(*chains))
+    flow.run()
+    task_list = flow.to_list()
+
+    json_data, json_dump_time = _timed(json.dumps, task_list)
+    _, json_load_time = _timed(json.loads, json_data)
+    binary_data, binary_dump_time = _timed(binary.dumps, task_list)
+    _, binary_load_time = _timed(binary.loads, binary_data)
+
+    return {
+        "tasks": len(task_list),
+        "json": {"bytes": len(json_data), "dump_seconds": json_dump_time, "load_seconds": json_load_time},
+        "binary": {"bytes": len(binary_data), "dump_seconds": binary_dump_time, "load_seconds": binary_load_time},
+    }
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    print(json.dumps(run(*[int(arg) for arg in argv]), indent=2))
+
+
+if __name__ == "__main__":
+    main()
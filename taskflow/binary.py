@@ -0,0 +1,234 @@
+"""
+Binary form of the task lists produced by Flow.to_list.
+
+Layout (little endian):
+    magic b"TFLW", format version (B)
+    string table: count (I), then per string its length (I) and UTF-8 bytes - class, function paths and names
+    task count (I), then per task:
+        fixed-width fields (see _TASK - version 1 had no execution time, and can still be read)
+        sub tasks of a composite: count (I) and ids (q each)
+        length-prefixed (I) pickled payloads, empty for None: args of tasks that have a function, the result and
+        a dict of any other keys
+
+WARNING: payloads are pickled to keep args and results exactly as they are, and unpickling can run any code. Never
+load data that did not come from a source you trust, such as a checkpoint only your own workers write - the same goes
+for the class and function paths, which are imported when the flow is created.
+"""
+import math
+import pickle
+import struct
+
+MAGIC = b"TFLW"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sB")
+_COUNT = struct.Struct("<I")
+_ID = struct.Struct("<q")
+# id, prev, next, class, func, name, runs, max_runs, status, flags, execution time (NaN for None)
+_TASK = struct.Struct("<qqqiiiIIBBd")
+# the fixed-width fields of each version that can be read - version 1 had no execution time
+_TASKS = {1: struct.Struct("<qqqiiiIIBB"), 2: _TASK}
+
+# part of the format - only ever append to it. ColumnarFlow keeps its statuses as the same codes
+STATUSES = ("pending", "running", "halted", "complete", None)
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+_HAS_PREV = 1
+_HAS_NEXT = 2
+_HAS_FUNC = 4
+_HAS_SUB_TASKS = 8
+_HAS_EXTRA = 16
+_NEEDS_PREV_RESULT = 32
+_IS_STANDALONE = 64
+_HAS_EXECUTION_TIME = 128
+
+# keys stored in fields of their own - any other key goes to the extra payload. ColumnarFlow has a column for each
+FIELD_KEYS = frozenset(
+    (
+        "class",
+        "max_runs",
+        "id",
+        "name",
+        "needs_prev_result",
+        "runs",
+        "status",
+        "result",
+        "is_standalone",
+        "func",
+        "args",
+        "execution_delta_time",
+        "prev",
+        "next",
+        "sub_tasks",
+    )
+)
+
+
+def dumps(task_list: list) -> bytes:
+    strings = {}
+
+    def string_index(string):
+        if string is None:
+            return -1
+        if string not in strings:
+            strings[string] = len(strings)
+        return strings[string]
+
+    body = [_COUNT.pack(len(task_list))]
+    for task_data in task_list:
+        flags = 0
+        if task_data["prev"] is not None:
+            flags |= _HAS_PREV
+        if task_data["next"] is not None:
+            flags |= _HAS_NEXT
+        if "func" in task_data:
+            flags |= _HAS_FUNC
+        if "sub_tasks" in task_data:
+            flags |= _HAS_SUB_TASKS
+        if task_data["needs_prev_result"]:
+            flags |= _NEEDS_PREV_RESULT
+        if task_data["is_standalone"]:
+            flags |= _IS_STANDALONE
+        if "execution_delta_time" in task_data:
+            flags |= _HAS_EXECUTION_TIME
+        execution_time = task_data.get("execution_delta_time")
+
+        extra_keys = task_data.keys() - FIELD_KEYS
+        if extra_keys:
+            flags |= _HAS_EXTRA
+
+        try:
+            status = STATUS_CODES[task_data["status"]]
+            body.append(
+                _TASK.pack(
+                    task_data["id"],
+                    task_data["prev"] if task_data["prev"] is not None else 0,
+                    task_data["next"] if task_data["next"] is not None else 0,
+                    string_index(task_data["class"]),
+                    string_index(task_data.get("func")),
+                    string_index(task_data["name"]),
+                    task_data["runs"],
+                    task_data["max_runs"],
+                    status,
+                    flags,
+                    execution_time if execution_time is not None else math.nan,
+                )
+            )
+        except (KeyError, TypeError, struct.error) as err:
+            raise ValueError(f"Task {task_data.get('id')!r} cannot be stored in the binary format: {err}") from err
+
+        if flags & _HAS_SUB_TASKS:
+            sub_tasks = task_data["sub_tasks"] or []
+            body.append(_COUNT.pack(len(sub_tasks)))
+            body.extend(_ID.pack(sub_task_id) for sub_task_id in sub_tasks)
+
+        payloads = [task_data["result"]]
+        if flags & _HAS_FUNC:
+            payloads.insert(0, task_data["args"])
+        if extra_keys:
+            payloads.append({key: value for key, value in task_data.items() if key in extra_keys})
+
+        for payload in payloads:
+            # None is stored as an empty payload
+            payload = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL) if payload is not None else b""
+            body.append(_COUNT.pack(len(payload)))
+            body.append(payload)
+
+    header = [_HEADER.pack(MAGIC, VERSION), _COUNT.pack(len(strings))]
+    for string in strings:
+        encoded = string.encode("utf-8")
+        header.append(_COUNT.pack(len(encoded)))
+        header.append(encoded)
+
+    return b"".join(header + body)
+
+
+def loads(data: bytes) -> list:
+    """
+    Return the task list that dumps stored in data. The payloads are unpickled, so never call it on untrusted data.
+    """
+    data = memoryview(data)
+    count_size = _COUNT.size
+
+    try:
+        magic, version = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("The data is not a serialized flow")
+        if version not in _TASKS:
+            raise ValueError(f"Unsupported flow format version {version}")
+        task_struct = _TASKS[version]
+        offset = _HEADER.size
+
+        (string_count,) = _COUNT.unpack_from(data, offset)
+        offset += count_size
+        strings = []
+        for _ in range(string_count):
+            (size,) = _COUNT.unpack_from(data, offset)
+            offset += count_size
+            strings.append(str(_read(data, offset, size), "utf-8"))
+            offset += size
+
+        (task_count,) = _COUNT.unpack_from(data, offset)
+        offset += count_size
+        task_list = []
+        for _ in range(task_count):
+            fields = task_struct.unpack_from(data, offset)
+            offset += task_struct.size
+            task_id, prev_id, next_id, class_code, func_code, name_code, runs, max_runs, status, flags = fields[:10]
+
+            if flags & _HAS_SUB_TASKS:
+                (sub_task_count,) = _COUNT.unpack_from(data, offset)
+                offset += count_size
+                sub_tasks = list(struct.unpack_from(f"<{sub_task_count}q", data, offset))
+                offset += sub_task_count * _ID.size
+
+            payloads = []
+            for _ in range(_payload_count(flags)):
+                (size,) = _COUNT.unpack_from(data, offset)
+                offset += count_size
+                payloads.append(pickle.loads(_read(data, offset, size)) if size else None)
+                offset += size
+
+            task_data = {
+                "class": strings[class_code] if class_code >= 0 else None,
+                "max_runs": max_runs,
+                "id": task_id,
+                "name": strings[name_code] if name_code >= 0 else None,
+                "needs_prev_result": bool(flags & _NEEDS_PREV_RESULT),
+                "runs": runs,
+                "status": STATUSES[status],
+                "result": payloads[1 if flags & _HAS_FUNC else 0],
+                "is_standalone": bool(flags & _IS_STANDALONE),
+            }
+            if flags & _HAS_FUNC:
+                task_data["func"] = strings[func_code] if func_code >= 0 else None
+                task_data["args"] = payloads[0]
+            if flags & _HAS_EXECUTION_TIME:
+                task_data["execution_delta_time"] = fields[10] if not math.isnan(fields[10]) else None
+            if flags & _HAS_EXTRA:
+                task_data.update(payloads[-1])
+
+            task_data["prev"] = prev_id if flags & _HAS_PREV else None
+            task_data["next"] = next_id if flags & _HAS_NEXT else None
+            if flags & _HAS_SUB_TASKS:
+                task_data["sub_tasks"] = sub_tasks
+
+            task_list.append(task_data)
+    except (struct.error, IndexError, UnicodeDecodeError, EOFError, pickle.UnpicklingError) as err:
+        raise ValueError(f"The data is not a valid serialized flow: {err}") from err
+
+    if offset != len(data):
+        raise ValueError("The data has trailing bytes after the serialized flow")
+
+    return task_list
+
+
+def _payload_count(flags):
+    return 1 + bool(flags & _HAS_FUNC) + bool(flags & _HAS_EXTRA)
+
+
+def _read(data, offset, size):
+    end = offset + size
+    if end > len(data):
+        raise ValueError("The data is truncated")
+    return data[offset:end]
@@ -0,0 +1,433 @@
+"""
+Caches of task results, so that a task whose result is already known completes without calling its function.
+
+A flow uses two kinds of keys, both made with make_key:
+
+    memo - the function path and the arguments the function would be called with, which include the result of the
+        task before it. Any task that would get the same call is served from it, within a flow or across flows.
+    result_cache - a fingerprint of the function path, the task's own arguments and the fingerprints of the tasks
+        its input comes from, like a Merkle tree. It does not need the results of earlier tasks, so a rerun of a
+        flow whose upstream work is unchanged completes task after task from it.
+
+    flow = Flow(root, memo=MemoryCache(max_entries=10000), result_cache=FileResultCache("/var/cache/flows"))
+
+Only tasks created with cacheable=True are cached, and only once they completed - a task whose function has side
+effects or whose result changes between calls has to run every time. In the result cache, a task that takes its
+input from a task that is not cacheable always runs as well. A cache hit does not count as a run of the task.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .result_stores import write_file
+from .type_helpers import type_to_string
+
+# fixed, so that keys stay the same across Python versions
+_KEY_PROTOCOL = 4
+
+
+def make_key(name, args, kwargs, dependencies=()):
+    """
+    Return a hex digest of a function path, its arguments and the keys of what it depends on, or None if the
+    arguments cannot be pickled. Dicts and sets make the same key in any order. args can be a list or a tuple, as
+    the function gets them unpacked either way - but a list and a tuple among them make different keys.
+    """
+    try:
+        args = tuple(_normalize(arg) for arg in args)
+        data = pickle.dumps((name, args, _normalize(kwargs), tuple(dependencies)), protocol=_KEY_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return None
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def _normalize(value):
+    # containers become tuples tagged with their type, so that no two of them make the same key
+    if isinstance(value, (list, tuple)):
+        return (_get_tag(value),) + tuple(_normalize(item) for item in value)
+    if isinstance(value, dict):
+        # sorted by repr, as the keys may not be comparable with each other
+        items = ((_normalize(key), _normalize(item)) for key, item in value.items())
+        return (_get_tag(value),) + tuple(sorted(items, key=repr))
+    if isinstance(value, (set, frozenset)):
+        return (_get_tag(value),) + tuple(sorted((_normalize(item) for item in value), key=repr))
+    return value
+
+
+def _get_tag(value):
+    return "$" + type_to_string(type(value))
+
+
+class Cache(object):
+    """
+    Base class for the caches of task results. Keys are the strings returned by make_key.
+    """
+
+    STATS = ("hits", "misses", "stores", "evictions")
+
+    def __init__(self):
+        self._stats = dict.fromkeys(self.STATS, 0)
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        """
+        Return the result cached under key, or raise KeyError.
+        """
+        raise NotImplementedError
+
+    def store(self, key, result):
+        raise NotImplementedError
+
+    def stats(self):
+        """
+        Return the hit, miss, store and eviction counts since the cache was created, and whatever else the cache
+        keeps count of.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, stat, count=1):
+        self._stats[stat] += count
+
+
+class MemoryCache(Cache):
+    """
+    Keeps results in memory in least recently used order: at most max_entries of them, taking up at most max_bytes
+    when pickled, each for at most ttl seconds. Safe to share between the flows of a worker, on any thread.
+
+    Results are kept pickled, so that every hit returns a copy of its own that can be changed - and results that
+    cannot be pickled are not cached.
+    """
+
+    STATS = Cache.STATS + ("expirations",)
+
+    def __init__(self, max_entries=1024, max_bytes=None, ttl=None):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> pickled result, its size, expiry time
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def load(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                self._count("expirations")
+                entry = None
+
+            if entry is None:
+                self._count("misses")
+                raise KeyError(key)
+
+            self._entries.move_to_end(key)
+            self._count("hits")
+            data = entry[0]
+
+        return pickle.loads(data)
+
+    def store(self, key, result):
+        try:
+            data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        size = len(data)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        expiry = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (data, size, expiry)
+            self._size += size
+            self._count("stores")
+
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self._size > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self._count("evictions")
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), size=self._size)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _remove(self, key):
+        self._size -= self._entries.pop(key)[1]
+
+
+class FileResultCache(Cache):
+    """
+    Keeps each result pickled in a file of its own under directory, which runs and processes can share. Once the
+    files take up more than max_size bytes, the least recently used are deleted.
+
+    Every file starts with the sha256 of the pickled result. With verify, it is checked on every load - a result
+    that does not match is deleted and counts as a miss. check_integrity checks all of them.
+    """
+
+    STATS = Cache.STATS + ("corrupted",)
+
+    def __init__(self, directory, max_size=None, verify=False):
+        super().__init__()
+        self.directory = os.fspath(directory)
+        self.max_size = max_size
+        self.verify = verify
+        # the size of the files, counted when first needed and kept up to date by store
+        self._size = None
+
+    def load(self, key):
+        path = self._get_path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._count("misses")
+            raise KeyError(key) from None
+
+        result = _unpack(data, self.verify)
+        with self._lock:
+            if result is _CORRUPTED:
+                self._count("corrupted")
+                self._count("misses")
+                self._delete(path)
+                raise KeyError(key)
+
+            self._count("hits")
+
+        try:
+            self._touch(path)
+        except OSError:
+            pass
+        return result
+
+    def store(self, key, result):
+        data = _pack(result)
+        if data is None:
+            return
+
+        with self._lock:
+            path = self._get_path(key)
+            write_file(path, data)
+            self._touch(path)
+            self._count("stores")
+
+            if self.max_size is not None:
+                if self._size is None:
+                    self._size = sum(entry.stat().st_size for entry in self._scan())
+                else:
+                    self._size += len(data)
+
+                if self._size > self.max_size:
+                    self._evict()
+
+    def check_integrity(self):
+        """
+        Check every result against its digest, delete those that do not match and return their keys.
+        """
+        corrupted = []
+        with self._lock:
+            for entry in self._scan():
+                with open(entry.path, "rb") as file:
+                    data = file.read()
+                if not _matches_digest(data):
+                    corrupted.append(entry.name)
+                    self._count("corrupted")
+                    self._delete(entry.path)
+
+        return corrupted
+
+    def stats(self):
+        with self._lock:
+            sizes = [entry.stat().st_size for entry in self._scan()]
+            return dict(self._stats, entries=len(sizes), size=sum(sizes))
+
+    def _evict(self):
+        entries = []
+        for entry in self._scan():
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self.max_size:
+                break
+
+            self._delete(path)
+            self._size -= size
+            self._count("evictions")
+
+    def _scan(self):
+        if not os.path.isdir(self.directory):
+            return
+
+        for prefix in os.scandir(self.directory):
+            if prefix.is_dir():
+                # skip the temporary files of writes in progress
+                yield from (entry for entry in os.scandir(prefix.path) if not entry.name.startswith("tmp"))
+
+    @staticmethod
+    def _touch(path):
+        # the modification time is when the result was last used, for the eviction - set to the nanosecond, as file
+        # systems may keep the time they set themselves more coarsely
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    @staticmethod
+    def _delete(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+
+class SQLiteResultCache(Cache):
+    """
+    Keeps the results pickled in a SQLite database at path, which runs and processes can share. Once the results take
+    up more than max_size bytes, the least recently used are deleted.
+
+    Every result is stored with the sha256 of its pickled form. With verify, it is checked on every load - a result
+    that does not match is deleted and counts as a miss. check_integrity checks all of them.
+    """
+
+    STATS = Cache.STATS + ("corrupted",)
+
+    def __init__(self, path, max_size=None, verify=False):
+        super().__init__()
+        self.path = os.fspath(path)
+        self.max_size = max_size
+        self.verify = verify
+
+        # in autocommit mode - every statement is a transaction of its own
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+
+    def load(self, key):
+        with self._lock:
+            row = self._connection.execute("SELECT data FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                raise KeyError(key)
+
+            result = _unpack(row[0], self.verify)
+            if result is _CORRUPTED:
+                self._count("corrupted")
+                self._count("misses")
+                self._connection.execute("DELETE FROM results WHERE key = ?", (key,))
+                raise KeyError(key)
+
+            self._count("hits")
+            self._connection.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+            return result
+
+    def store(self, key, result):
+        data = _pack(result)
+        if data is None:
+            return
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results (key, data, size, used) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+            self._count("stores")
+
+            if self.max_size is not None:
+                self._evict()
+
+    def check_integrity(self):
+        """
+        Check every result against its digest, delete those that do not match and return their keys.
+        """
+        with self._lock:
+            corrupted = [
+                key
+                for key, data in self._connection.execute("SELECT key, data FROM results")
+                if not _matches_digest(data)
+            ]
+            for key in corrupted:
+                self._connection.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._count("corrupted")
+
+        return corrupted
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            return dict(self._stats, entries=entries, size=size)
+
+    def close(self):
+        self._connection.close()
+
+    def _evict(self):
+        (size,) = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+        if size <= self.max_size:
+            return
+
+        evicted = []
+        for key, entry_size in self._connection.execute("SELECT key, size FROM results ORDER BY used"):
+            if size <= self.max_size:
+                break
+            evicted.append(key)
+            size -= entry_size
+
+        for key in evicted:
+            self._connection.execute("DELETE FROM results WHERE key = ?", (key,))
+        self._count("evictions", len(evicted))
+
+
+_DIGEST_SIZE = hashlib.sha256().digest_size
+
+# returned by the unpacking of a result that is damaged
+_CORRUPTED = object()
+
+
+def _pack(result):
+    # the digest followed by the pickled result, or None if it cannot be pickled
+    try:
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return None
+
+    return hashlib.sha256(data).digest() + data
+
+
+def _unpack(data, verify):
+    # the result packed by _pack, or _CORRUPTED
+    if verify and not _matches_digest(data):
+        return _CORRUPTED
+
+    try:
+        return pickle.loads(memoryview(data)[_DIGEST_SIZE:])
+    except Exception:
+        # damaged in a way that verify would have caught
+        return _CORRUPTED
+
+
+def _matches_digest(data):
+    data = memoryview(data)
+    return hashlib.sha256(data[_DIGEST_SIZE:]).digest() == data[:_DIGEST_SIZE]
@@ -0,0 +1,131 @@
+"""
+Cooperative cancellation of running task functions.
+
+Python cannot stop a function running on a thread, so a task function that may run for long should check the token
+of its run now and then and return early once it is cancelled:
+
+    def fetch_all(urls):
+        token = current_token()
+        for url in urls:
+            token.raise_if_cancelled()
+            ...
+
+A token is cancelled when its task runs past its timeout or when the flow running it is cancelled. Functions run in
+a process pool get a token that is never cancelled, so a call there that times out runs on until it returns.
+
+A call that timed out keeps its thread or worker process until it returns. abandoned_calls tells how many of them
+are still running.
+"""
+import asyncio
+import threading
+from contextvars import ContextVar
+
+
+class Cancelled(Exception):
+    """
+    Raised by CancelToken.raise_if_cancelled. A task that raises it counts as a failed run.
+    """
+
+
+class CancelToken(object):
+    """
+    Tells whether the work it was handed to should stop. Cancelling a token cancels the tokens created with it as
+    their parent as well.
+    """
+
+    __slots__ = ("_event", "_parent", "_children", "_lock")
+
+    def __init__(self, parent=None):
+        self._event = threading.Event()
+        self._parent = parent
+        self._children = set()
+        self._lock = threading.Lock()
+
+        if parent is not None:
+            with parent._lock:
+                parent._children.add(self)
+            if parent.is_cancelled:
+                self.cancel()
+
+    @property
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+
+        with self._lock:
+            children = list(self._children)
+        for child in children:
+            child.cancel()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+    def wait(self, timeout=None):
+        """
+        Wait until the token is cancelled, at most timeout seconds, and return whether it was - an interruptible
+        sleep.
+        """
+        return self._event.wait(timeout)
+
+    async def wait_async(self, timeout=None):
+        """
+        Same as wait, for coroutines. It waits on a thread, which is woken up as well when the coroutine is
+        cancelled.
+        """
+        waiter = CancelToken(self)
+        try:
+            return await asyncio.to_thread(waiter.wait, timeout) and self.is_cancelled
+        finally:
+            waiter.cancel()
+            waiter.close()
+
+    def close(self):
+        """
+        Detach the token from its parent once the work it was handed to is done.
+        """
+        if self._parent is not None:
+            with self._parent._lock:
+                self._parent._children.discard(self)
+            self._parent = None
+
+
+# never cancelled - the token of functions called outside of a flow
+_NEVER_CANCELLED = CancelToken()
+
+_current_token = ContextVar("taskflow_cancel_token", default=_NEVER_CANCELLED)
+
+
+def current_token():
+    """
+    Return the token of the task function being run, on the thread or the asyncio task running it.
+    """
+    return _current_token.get()
+
+
+# futures of the calls given up on after their timeout that have not returned yet
+_abandoned = set()
+_abandoned_lock = threading.Lock()
+
+
+def abandoned_calls():
+    """
+    Return the number of calls that timed out in run or step and are still running, holding a thread or a worker of
+    an executor.
+    """
+    with _abandoned_lock:
+        return len(_abandoned)
+
+
+def _abandon(future):
+    # counted until it returns
+    with _abandoned_lock:
+        _abandoned.add(future)
+    future.add_done_callback(_forget)
+
+
+def _forget(future):
+    with _abandoned_lock:
+        _abandoned.discard(future)
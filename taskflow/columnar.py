@@ -0,0 +1,469 @@
+import heapq
+import math
+from array import array
+from uuid import uuid4
+
+from . import binary
+from .binary import FIELD_KEYS, STATUS_CODES, STATUSES
+from .result_stores import ResultReference, result_from_data
+from .tasks import BaseTask, Task
+from .type_helpers import type_from_string
+
+# the status codes and record keys with a column of their own are those of the binary format
+_PENDING = STATUS_CODES[BaseTask.STATUS_PENDING]
+_HALTED = STATUS_CODES[BaseTask.STATUS_HALTED]
+_COMPLETE = STATUS_CODES[BaseTask.STATUS_COMPLETE]
+
+
+class ColumnarFlow(object):
+    """
+    A flow that keeps its tasks in typed arrays instead of task objects - one row per task, with links between tasks
+    stored as row numbers. It reads and writes the same task lists as Flow.to_list and Flow.from_list, and runs the
+    tasks in the same order as Flow.step, but only creates a task object for the task being run.
+
+    Meant for very large batch flows: there are no executor, asyncio or hook variants of running, and tasks cannot
+    have a backoff or implement run themselves.
+    """
+
+    def __init__(self, task_list: list, uid=None, friendly_name=None, result_store=None):
+        self.uid = uid or uuid4()
+        self.friendly_name = friendly_name or ""
+        self.result_store = result_store
+
+        count = len(task_list)
+        if not count:
+            raise ValueError("Cannot create a flow from an empty task list")
+
+        # class and function paths, stored once
+        self._strings = []
+        string_codes = {}
+        # whether the tasks of a class code implement run themselves
+        runs_itself = {}
+
+        self._ids = array("q")
+        self._classes = array("i")
+        self._funcs = array("i")
+        self._statuses = array("b")
+        self._runs = array("i")
+        self._max_runs = array("i")
+        self._needs_prev_result = array("b")
+        self._standalone = array("b")
+        self._args = []
+        # seconds, NaN for tasks that did not run
+        self._execution_times = array("d")
+        self._results = []
+        # rarely set, so only kept for the rows that have them
+        self._names = {}
+        self._errors = {}
+        self._extra = {}
+
+        rows = {}
+        for row, task_data in enumerate(task_list):
+            rows[task_data["id"]] = row
+            self._ids.append(task_data["id"])
+
+            for key, column in (("class", self._classes), ("func", self._funcs)):
+                string = task_data.get(key)
+                if string is None:
+                    column.append(-1)
+                    continue
+                if string not in string_codes:
+                    string_codes[string] = len(self._strings)
+                    self._strings.append(string)
+                column.append(string_codes[string])
+
+            class_code = self._classes[-1]
+            if task_data["is_standalone"] and class_code >= 0 and class_code not in runs_itself:
+                runs_itself[class_code] = type_from_string(self._strings[class_code]).run is not Task.run
+            if runs_itself.get(class_code):
+                # tasks are run through the steps of Task.run, on a task object that is not linked to the others
+                raise ValueError(f"Task {task_data['id']} implements run itself, which only Flow supports")
+
+            try:
+                self._statuses.append(STATUS_CODES[task_data["status"]])
+            except KeyError as err:
+                raise ValueError(f"Task {task_data['id']} has an unknown status {task_data['status']!r}") from err
+
+            self._runs.append(task_data["runs"])
+            self._max_runs.append(task_data["max_runs"])
+            self._needs_prev_result.append(task_data["needs_prev_result"])
+            self._standalone.append(task_data["is_standalone"])
+            self._args.append(task_data.get("args"))
+            execution_time = task_data.get("execution_delta_time")
+            self._execution_times.append(execution_time if execution_time is not None else math.nan)
+            self._results.append(task_data["result"])
+
+            if task_data["name"] is not None:
+                self._names[row] = task_data["name"]
+
+            extra = {key: value for key, value in task_data.items() if key not in FIELD_KEYS}
+            if "backoff" in extra or "retry_at" in extra:
+                # failed tasks are retried right away, waiting would need the scheduling of Flow
+                raise ValueError(f"Task {task_data['id']} has a backoff, which only Flow supports")
+            if extra:
+                self._extra[row] = extra
+
+        self._rows = rows
+        self._link(task_list)
+        self._count_leaves()
+
+        self._halted = sum(1 for row in range(count) if self._standalone[row] and self._statuses[row] == _HALTED)
+        # ranks of the pending tasks the walk reached - the row of a rank is _order[rank]
+        self._ready = []
+        self._explore(self._root)
+
+    @classmethod
+    def from_list(cls, task_list: list, uid=None, friendly_name=None, result_store=None):
+        return cls(task_list, uid=uid, friendly_name=friendly_name, result_store=result_store)
+
+    @classmethod
+    def from_flow(cls, flow):
+        return cls(flow.to_list(), uid=flow.uid, friendly_name=flow.friendly_name, result_store=flow.result_store)
+
+    def to_list(self):
+        return [self._get_task_data(row) for row in self._order]
+
+    def to_bytes(self):
+        return binary.dumps(self.to_list())
+
+    @classmethod
+    def from_bytes(cls, data: bytes, uid=None, friendly_name=None, result_store=None):
+        # unpickles args and results - only for trusted data, as Flow.from_bytes
+        return cls(binary.loads(data), uid=uid, friendly_name=friendly_name, result_store=result_store)
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def is_halted(self):
+        # a halted task anywhere halts the whole flow
+        return self._halted > 0
+
+    @property
+    def is_complete(self):
+        return self._get_status_code(self._tail[self._root]) == _COMPLETE
+
+    @property
+    def result(self):
+        return self._get_result(self._tail[self._root])
+
+    def get_status(self, task_id):
+        return STATUSES[self._get_status_code(self._rows[task_id])]
+
+    def get_result(self, task_id):
+        return self._get_result(self._rows[task_id])
+
+    def get_ready_ids(self, limit=None):
+        """
+        Return the ids of the tasks that can run right now, in the order step would run them.
+        """
+        if self.is_halted:
+            return []
+
+        ready = sorted(rank for rank in self._ready if self._statuses[self._order[rank]] == _PENDING)
+        return [self._ids[self._order[rank]] for rank in ready[:limit]]
+
+    def get_task(self, task_id):
+        """
+        Create a task object for a standalone task. It is not linked to anything, and changing it does not change
+        the flow.
+        """
+        row = self._rows[task_id]
+        if not self._standalone[row]:
+            raise ValueError(f"Task {task_id} is a composite task - use get_status and get_result instead")
+
+        task_data = self._get_task_data(row)
+        task_data.update(
+            {"prev": None, "sub_tasks": [], "result": result_from_data(task_data["result"], self.result_store)}
+        )
+
+        task = type_from_string(task_data["class"]).from_data(task_data)
+        task._error = self._errors.get(row)
+        return task
+
+    def step(self, **kwargs):
+        """
+        Run the next task and return it, or None if there is nothing to run.
+        """
+        row = self._pop_ready()
+        if row is None:
+            return None
+
+        return self._run_row(row, kwargs)
+
+    def run(self, **kwargs):
+        while True:
+            row = self._pop_ready()
+            if row is None:
+                break
+            self._run_row(row, kwargs)
+
+        return self.result
+
+    def _get_task_data(self, row):
+        task_data = {
+            "class": self._strings[self._classes[row]],
+            "max_runs": self._max_runs[row],
+            "id": self._ids[row],
+            "name": self._names.get(row),
+            "needs_prev_result": bool(self._needs_prev_result[row]),
+            "runs": self._runs[row],
+            "status": STATUSES[self._statuses[row]],
+            "result": self._results[row],
+            "is_standalone": bool(self._standalone[row]),
+        }
+        if self._funcs[row] >= 0:
+            task_data.update({"func": self._strings[self._funcs[row]], "args": self._args[row]})
+            if not math.isnan(self._execution_times[row]):
+                task_data["execution_delta_time"] = self._execution_times[row]
+        task_data.update(self._extra.get(row, {}))
+
+        task_data.update(
+            {
+                "prev": self._ids[self._prev[row]] if self._prev[row] >= 0 else None,
+                "next": self._ids[self._next[row]] if self._next[row] >= 0 else None,
+            }
+        )
+        if not self._standalone[row]:
+            task_data["sub_tasks"] = [self._ids[sub_row] for sub_row in self._get_sub_rows(row)]
+
+        return task_data
+
+    def _link(self, task_list):
+        count = len(task_list)
+        rows = self._rows
+
+        self._prev = array("i", [-1]) * count
+        self._next = array("i", [-1]) * count
+        self._parent = array("i", [-1]) * count
+        self._head = array("i", [-1]) * count
+        self._tail = array("i", [-1]) * count
+        # sub tasks of row are _sub_rows[_sub_offsets[row]:_sub_offsets[row + 1]]
+        self._sub_offsets = array("i", [0])
+        self._sub_rows = array("i")
+
+        try:
+            for row, task_data in enumerate(task_list):
+                if task_data["prev"] is not None:
+                    self._prev[row] = rows[task_data["prev"]]
+                if task_data["next"] is not None:
+                    self._next[row] = rows[task_data["next"]]
+
+                for sub_task_id in task_data.get("sub_tasks") or []:
+                    sub_row = rows[sub_task_id]
+                    self._sub_rows.append(sub_row)
+                    self._parent[sub_row] = row
+                self._sub_offsets.append(len(self._sub_rows))
+        except KeyError as err:
+            raise ValueError(f"The task list refers to task {err.args[0]} that is not in it") from err
+
+        roots = []
+        for row in range(count):
+            if self._prev[row] >= 0:
+                continue
+
+            chain_row = row
+            while chain_row >= 0:
+                self._head[chain_row] = row
+                tail = chain_row
+                chain_row = self._next[chain_row]
+            chain_row = row
+            while chain_row >= 0:
+                self._tail[chain_row] = tail
+                chain_row = self._next[chain_row]
+
+            if self._parent[row] < 0:
+                roots.append(row)
+
+        if len(roots) != 1:
+            raise ValueError(f"The task list must have exactly one root task, found {len(roots)}")
+        self._root = roots[0]
+
+        # the order of Flow.to_list - sub tasks before their composite, a composite before what comes after it
+        self._order = array("i")
+        self._ranks = array("i", [0]) * count
+        stack = [(self._root, False)]
+        while stack:
+            row, sub_tasks_walked = stack.pop()
+
+            if not self._standalone[row] and not sub_tasks_walked:
+                stack.append((row, True))
+                sub_rows = self._get_sub_rows(row)
+                for sub_index in range(len(sub_rows) - 1, -1, -1):
+                    stack.append((sub_rows[sub_index], False))
+                continue
+
+            self._ranks[row] = len(self._order)
+            self._order.append(row)
+            if self._next[row] >= 0:
+                stack.append((self._next[row], False))
+
+        if len(self._order) != count:
+            raise ValueError("The task list has tasks that are not connected to the root task")
+
+    def _count_leaves(self):
+        count = len(self._ids)
+        # statuses of the last tasks of each composite's sub chains
+        self._complete_leaves = array("i", [0]) * count
+        self._halted_leaves = array("i", [0]) * count
+
+        # sub tasks come first in the order, so nested composites are counted before the composites containing them
+        for row in self._order:
+            if self._standalone[row]:
+                continue
+
+            for sub_row in self._get_sub_rows(row):
+                status_code = self._get_status_code(self._tail[sub_row])
+                if status_code == _COMPLETE:
+                    self._complete_leaves[row] += 1
+                elif status_code == _HALTED:
+                    self._halted_leaves[row] += 1
+
+    def _get_sub_rows(self, row):
+        start, end = self._sub_offsets[row], self._sub_offsets[row + 1]
+        return self._sub_rows[start:end]
+
+    def _get_status_code(self, row):
+        if self._standalone[row]:
+            return self._statuses[row]
+
+        if self._halted_leaves[row]:
+            return _HALTED
+        if self._complete_leaves[row] == self._sub_offsets[row + 1] - self._sub_offsets[row]:
+            return _COMPLETE
+        return _PENDING
+
+    def _get_result(self, row):
+        # composites nest as deep as the flow does, so their lists are built with an explicit stack, each once the
+        # results of the last tasks of its sub chains are
+        results = {}
+        stack = [row]
+        while stack:
+            current = stack[-1]
+            if self._standalone[current]:
+                stack.pop()
+                result = result_from_data(self._results[current], self.result_store)
+                results[current] = result.load() if isinstance(result, ResultReference) else result
+                continue
+
+            leaf_rows = [self._tail[sub_row] for sub_row in self._get_sub_rows(current)]
+            missing = [leaf_row for leaf_row in leaf_rows if leaf_row not in results]
+            if missing:
+                stack.extend(missing)
+                continue
+
+            stack.pop()
+            results[current] = [results[leaf_row] for leaf_row in leaf_rows]
+
+        return results[row]
+
+    def _explore(self, row):
+        """
+        Walk the graph from row the same way Flow does and queue the pending tasks it reaches.
+        """
+        stack = [row]
+        while stack:
+            row = stack.pop()
+            status_code = self._get_status_code(row)
+
+            if status_code == _COMPLETE:
+                if self._next[row] >= 0:
+                    stack.append(self._next[row])
+            elif status_code == _PENDING:
+                if self._standalone[row]:
+                    heapq.heappush(self._ready, self._ranks[row])
+                else:
+                    stack.extend(self._get_sub_rows(row))
+
+    def _pop_ready(self):
+        while self._ready and not self.is_halted:
+            row = self._order[heapq.heappop(self._ready)]
+            if self._statuses[row] == _PENDING:
+                return row
+
+        return None
+
+    def _override_arguments(self, row, args):
+        while self._needs_prev_result[row]:
+            if self._prev[row] >= 0:
+                return list(args) + [self._get_result(self._prev[row])]
+
+            if self._parent[row] < 0:
+                break
+            row = self._parent[row]
+
+        return args
+
+    def _run_row(self, row, kwargs):
+        task = self.get_task(self._ids[row])
+
+        args, kwargs = task._start(**kwargs)
+        task._finish(*task._execute_in_time(self._override_arguments(row, args), kwargs))
+
+        old_status_code = self._statuses[row]
+        status_code = STATUS_CODES[task.status]
+        self._statuses[row] = status_code
+        self._runs[row] = task.runs
+        self._execution_times[row] = task.execution_delta_time
+
+        # results are kept in their serialized form
+        result = task.result
+        if isinstance(result, ResultReference):
+            result = result.to_data()
+        elif self.result_store is not None and status_code == _COMPLETE:
+            key = self.result_store.store(result)
+            if key is not None:
+                result = ResultReference(key, self.result_store).to_data()
+        self._results[row] = result
+
+        # keys without a column change as well, such as the chunks of a MapTask
+        extra = {key: value for key, value in task._get_task_data().items() if key not in FIELD_KEYS}
+        if extra:
+            self._extra[row] = extra
+        else:
+            self._extra.pop(row, None)
+
+        if task.error is None:
+            self._errors.pop(row, None)
+        else:
+            self._errors[row] = task.error
+
+        if status_code == _HALTED:
+            self._halted += 1
+
+        self._leaf_status_changed(row, old_status_code, status_code)
+
+        if status_code == _COMPLETE:
+            self._advance(row)
+        elif status_code == _PENDING:
+            heapq.heappush(self._ready, self._ranks[row])
+
+        return task
+
+    def _leaf_status_changed(self, row, old_status_code, status_code):
+        # keep the counters of the composites whose sub chain ends with row up to date, as far up as statuses change
+        while old_status_code != status_code and self._next[row] < 0:
+            parent = self._parent[self._head[row]]
+            if parent < 0:
+                return
+
+            old_parent_status_code = self._get_status_code(parent)
+            for code, change in ((old_status_code, -1), (status_code, 1)):
+                if code == _COMPLETE:
+                    self._complete_leaves[parent] += change
+                elif code == _HALTED:
+                    self._halted_leaves[parent] += change
+
+            row, old_status_code, status_code = parent, old_parent_status_code, self._get_status_code(parent)
+
+    def _advance(self, row):
+        # row completed - continue after it, or after every composite it completed
+        while True:
+            if self._next[row] >= 0:
+                self._explore(self._next[row])
+                return
+
+            parent = self._parent[self._head[row]]
+            if parent < 0 or self._get_status_code(parent) != _COMPLETE:
+                return
+            row = parent
@@ -1,2 +1,13 @@
 class Defaults(object):
     max_runs = 3
+    # a taskflow.retries.Backoff for tasks created without one - None retries failed tasks right away
+    backoff = None
+    # seconds a task created without a timeout may run before the run counts as failed - None waits forever
+    timeout = None
+    # idle threads kept for the calls of tasks with a timeout outside of an executor - each call gets a thread of its
+    # own, started when none of these is idle
+    timeout_threads = 8
+    # number of items of a MapTask run as one unit, which is recorded and retried as a whole
+    chunk_size = 100
+    # number of items a StreamTask holds between two of its stages
+    queue_size = 100
@@ -1,21 +1,59 @@
-from collections import deque
-from copy import deepcopy
+import asyncio
+import sys
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+from time import perf_counter_ns, time
 from uuid import uuid4
 
-from .tasks import BaseTask
-from .type_helpers import type_from_string
+from . import analysis, binary
+from .batching import execute_batch
+from .caches import make_key
+from .cancellation import CancelToken, _abandon
+from .outcomes import elapsed, make_outcome, start_clock
+from .result_stores import ResultReference, result_from_data
+from .scheduler import Scheduler
+from .tasks import BaseTask, Task
+from .type_helpers import function_to_string, type_from_string, type_to_string
+from .workers import call_batch
 
 
 class Flow(object):
-    def __init__(self, task: BaseTask, uid=None, friendly_name=None):
+    def __init__(self, task: BaseTask, uid=None, friendly_name=None, result_store=None, memo=None, result_cache=None):
         self.uid = uid or uuid4()
         self.friendly_name = friendly_name or ""
+        # large results are moved to it as soon as their task completes
+        self.result_store = result_store
+        # caches that tasks are completed from without running - see taskflow.caches
+        self.memo = memo
+        self.result_cache = result_cache
+        self._fingerprints = {}
+        # the flow kwargs the fingerprints were made with
+        self._fingerprint_kwargs = None
+        self._cache_keys = {}
+        # cancelled by cancel - the tokens of the running tasks are made from it
+        self._cancel_token = CancelToken()
         self.root_task = BaseTask.find_root(task)
 
         # when deserializing, tasks will already have ids, that we want to preserve
         if not self.root_task.id:
             self.root_task.set_ids()
 
+        self._scheduler = Scheduler(self.root_task)
+
+        # tasks changed since the last delta checkpoint - the tasks add themselves
+        self._dirty_tasks = set()
+        for task in self.root_task._walk():
+            task._dirty_tasks = self._dirty_tasks
+        self._tasks_by_id = None
+
+        # records of all tasks, when only part of them were loaded - see from_list
+        self._records = None
+
+        # see taskflow.instrumentation
+        self._listeners = []
+        self._scheduled_at = {}
+
     @property
     def is_halted(self):
         # if we encounter a halted task, we want to halt the whole flow
@@ -25,29 +63,567 @@ class Flow(object):
     def is_complete(self):
         return self.root_task.leaf.status == BaseTask.STATUS_COMPLETE
 
-    def run(self, **kwargs):
+    @property
+    def is_cancelled(self):
+        return self._cancel_token.is_cancelled
+
+    def cancel(self):
+        """
+        Stop starting tasks and cancel the tokens of the running ones - see taskflow.cancellation. Can be called from
+        any thread, or from a task. run and arun return once the running tasks return.
+        """
+        self._cancel_token.cancel()
+
+    def run(self, executor=None, **kwargs):
+        """
+        Run the flow until it is complete, halted or cancelled and return the result of its last task.
+
+        Given a concurrent.futures.Executor, every task that is ready is submitted to it at once and the flow
+        continues as soon as any of them completes. Only the task functions are called on the executor - the tasks
+        and the flow are updated on the calling thread. A ProcessPoolExecutor gets the functions by their path, so
+        they have to be importable. Tasks are then started through _before_task_run and _after_task_run, the same
+        way step does. Tasks that implement run themselves are run through it on the calling thread.
+
+        Tasks of a function with a batch version that are ready at the same time run in batch calls - see
+        taskflow.batching.
+        """
+        if executor is not None:
+            return self._run_with_executor(executor, **kwargs)
+
         while True:
-            task = self._get_next(self.root_task)
+            task = self._find_next()
             if not task:
-                break
-            task.run(**kwargs)
+                # wait for the tasks to be retried, if there are any
+                delay = self._get_retry_delay()
+                if delay is None:
+                    break
 
-        return self.root_task.leaf.result
+                # woken up by cancel
+                self._cancel_token.wait(delay)
+                continue
+
+            if self._get_batch_function(task) is None:
+                self._run_task(task, kwargs)
+            else:
+                self._run_batch(task, kwargs)
+
+        return self.root_task.leaf.load_result()
+
+    def _run_with_executor(self, executor, **kwargs):
+        running = {}
+        # the token and submission time of every running task, the timeout of those that have one and when their calls
+        # started, by token - the time out counts from there, not from when the call was queued for a worker
+        tokens = {}
+        start_times = {}
+        timeouts = {}
+        call_starts = {}
+        ready = self._find_ready(self._scheduler.get_ready)
+
+        while True:
+            declined = set()
+            finished = []
+            if self._can_dispatch():
+                started, finished, declined = self._start_tasks(ready, kwargs)
+                for batch_function, entries in self._group_batches(started):
+                    token = CancelToken(self._cancel_token)
+                    if batch_function is None:
+                        task, args, task_kwargs = entries[0]
+                        if task.timeout is None:
+                            future = task._submit(executor, args, task_kwargs, token)
+                        else:
+                            on_start = partial(_record_call_start, call_starts, token)
+                            future = task._submit(executor, args, task_kwargs, token, on_start)
+                            timeouts[future] = task.timeout
+                    else:
+                        future = self._submit_batch(executor, batch_function, entries, token)
+
+                    running[future] = [task for task, _, _ in entries]
+                    tokens[future] = token
+                    start_times[future] = start_clock()
+
+            if finished:
+                # start what the tasks finished on this thread made ready before waiting
+                ready = []
+                for task, execution_ns in finished:
+                    ready.extend(self._task_ran(task, execution_ns))
+                continue
+
+            if not running:
+                # nothing to wait for - check for tasks made ready outside of the flow before giving up
+                ready = self._find_ready(self._scheduler.get_ready) if self._can_dispatch() else []
+                ready = [task for task in ready if task not in declined]
+                for task in declined:
+                    self._forget_scheduled(task)
+                if not ready:
+                    delay = self._get_retry_delay()
+                    if delay is None:
+                        break
+                    self._cancel_token.wait(delay)
+                continue
+
+            # wake up when a task runs out of time or one waiting to be retried is due, if that comes first
+            done, _ = wait(
+                running, timeout=self._get_wait_timeout(timeouts, tokens, call_starts), return_when=FIRST_COMPLETED
+            )
+            ready = []
+            for future in done:
+                tasks = running.pop(future)
+                token = tokens.pop(future)
+                token.close()
+                timeouts.pop(future, None)
+                call_starts.pop(token, None)
+                outcomes = self._get_outcomes(future, tasks, start_times.pop(future))
+                for task, outcome in zip(tasks, outcomes):
+                    task._finish(*outcome)
+                    ready.extend(self._task_ran(task, round(outcome[3] * 1e9)))
+
+            # runs that took too long count as failed - their calls are left to return on their own, which cooperative
+            # functions do soon after their token is cancelled
+            for future, timeout in list(timeouts.items()):
+                token = tokens[future]
+                if token not in call_starts and future.running():
+                    # calls in worker processes cannot tell when they start
+                    _record_call_start(call_starts, token)
+                if token not in call_starts or elapsed(call_starts[token]) < timeout:
+                    continue
+
+                del timeouts[future]
+                (task,) = running.pop(future)
+                del tokens[future], start_times[future]
+                token.cancel()
+                token.close()
+                # the call keeps its worker until it returns
+                _abandon(future)
+                outcome = task._get_timeout_outcome(call_starts.pop(token))
+                task._finish(*outcome)
+                ready.extend(self._task_ran(task, round(outcome[3] * 1e9)))
+
+            if not done:
+                ready.extend(self._find_ready(self._scheduler.get_ready))
+
+        return self.root_task.leaf.load_result()
+
+    async def arun(self, concurrency=None, **kwargs):
+        """
+        Run the flow on the running asyncio event loop until it is complete or halted and return the result of its
+        last task.
+
+        Coroutine functions are awaited on the loop, other functions are called in a thread so that they do not block
+        it. Every task that is ready runs concurrently, at most concurrency of them at a time. Tasks are started
+        through _before_task_run and _after_task_run, the same way step does.
+        """
+        running = {}
+        ready = deque(self._find_ready(self._scheduler.get_ready))
+
+        try:
+            while True:
+                declined = set()
+                while ready and self._can_dispatch() and (concurrency is None or len(running) < concurrency):
+                    tasks = [ready.popleft()]
+                    batch_function = self._get_batch_function(tasks[0])
+                    if batch_function is not None:
+                        # the other ready tasks of the function go in the same batch call
+                        tasks.extend(self._take_batch(ready, tasks[0], batch_function))
+
+                    started, finished, tasks_declined = self._start_tasks(tasks, kwargs)
+                    declined.update(tasks_declined)
+                    for task, execution_ns in finished:
+                        ready.extend(self._task_ran(task, execution_ns))
+
+                    for batch_function, entries in self._group_batches(started):
+                        if batch_function is None:
+                            task, args, task_kwargs = entries[0]
+                            call = task._execute_async(args, task_kwargs, self._cancel_token)
+                        else:
+                            call = asyncio.to_thread(
+                                execute_batch,
+                                batch_function.func,
+                                entries[0][0]._func,
+                                [args for _, args, _ in entries],
+                                entries[0][2],
+                                self._cancel_token,
+                            )
+                        running[asyncio.ensure_future(call)] = [task for task, _, _ in entries]
+
+                if not running:
+                    # nothing to wait for - check for tasks made ready outside of the flow before giving up
+                    ready = self._find_ready(self._scheduler.get_ready) if self._can_dispatch() else []
+                    ready = deque(task for task in ready if task not in declined)
+                    for task in declined:
+                        self._forget_scheduled(task)
+                    if not ready:
+                        delay = self._get_retry_delay()
+                        if delay is None:
+                            break
+                        await self._cancel_token.wait_async(delay)
+                    continue
+
+                # wake up when a task waiting to be retried is due, if that comes first
+                done, _ = await asyncio.wait(
+                    running, timeout=self._get_retry_delay(), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    ready.extend(self._find_ready(self._scheduler.get_ready))
+                    continue
+
+                for future in done:
+                    tasks = running.pop(future)
+                    outcomes = future.result() if len(tasks) > 1 else [future.result()]
+                    for task, outcome in zip(tasks, outcomes):
+                        task._finish(*outcome)
+                        ready.extend(self._task_ran(task, round(outcome[3] * 1e9)))
+        finally:
+            for future in running:
+                future.cancel()
+
+        return self.root_task.leaf.load_result()
 
     def step(self, **kwargs):
+        """
+        Run the next task and return it. When only tasks waiting to be retried are left, sleep until the first one is
+        due, so that None means there is nothing left to run - the flow is complete, halted or cancelled. Use
+        get_ready_tasks and get_retry_at to schedule tasks without waiting.
+        """
         while True:
-            task = self._get_next(self.root_task)
+            task = self._find_next()
             if not task:
-                return
+                delay = self._get_retry_delay()
+                if delay is None:
+                    return None
+
+                # woken up by cancel
+                self._cancel_token.wait(delay)
+                continue
 
             if self._before_task_run(task):
                 break
+            self._forget_scheduled(task)
 
-        task.run(**kwargs)
+        self._run_task(task, kwargs)
         self._after_task_run(task)
 
         return task
 
+    def get_ready_tasks(self, limit=None):
+        """
+        Return every task that can run right now - at most limit of them - in the order step would run them.
+        """
+        if not self._can_dispatch():
+            return []
+
+        return self._scheduler.get_ready(limit=limit)
+
+    def mark_running(self, tasks):
+        """
+        Mark tasks returned by get_ready_tasks as running, e.g. once they were handed to workers, so that they are
+        not returned again.
+        """
+        for task in tasks:
+            if task.status != BaseTask.STATUS_PENDING or not task.is_standalone:
+                raise RuntimeError(f"Task {task.id} is not a pending standalone task and cannot be marked as running.")
+
+        for task in tasks:
+            task._status = BaseTask.STATUS_RUNNING
+
+    def get_retry_at(self):
+        """
+        Return the time.time() when the first task that failed and waits to be retried is due, or None if no task
+        waits. step and get_ready_tasks skip waiting tasks - call them again then.
+        """
+        if self.is_halted:
+            return None
+
+        # waiting tasks are found on the way
+        self._scheduler.get_ready()
+        return self._scheduler.get_retry_at()
+
+    def _get_retry_delay(self):
+        # seconds until the first waiting task is due, for run and arun, which have just looked for ready tasks
+        if not self._can_dispatch():
+            return None
+
+        retry_at = self._scheduler.get_retry_at()
+        return max(retry_at - time(), 0.0) if retry_at is not None else None
+
+    def _get_wait_timeout(self, timeouts, tokens, call_starts):
+        # seconds until the first running task may run out of time or waiting task is due, or None
+        timeout = self._get_retry_delay()
+        for future, task_timeout in timeouts.items():
+            call_start = call_starts.get(tokens[future])
+            if call_start is not None:
+                until_deadline = max(task_timeout - elapsed(call_start), 0)
+            else:
+                # look for the start of a call that waits for a worker every tenth of its timeout
+                until_deadline = task_timeout / 10
+            timeout = until_deadline if timeout is None else min(timeout, until_deadline)
+
+        return timeout
+
+    def _can_dispatch(self):
+        return not self.is_halted and not self._cancel_token.is_cancelled
+
+    def add_listener(self, listener):
+        """
+        Report what happens to the tasks run by run, arun and step to listener - see taskflow.instrumentation.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+        if not self._listeners:
+            self._scheduled_at.clear()
+
+    def _find_next(self):
+        if not self._listeners:
+            return self._get_next(self.root_task)
+
+        start = perf_counter_ns()
+        task = self._get_next(self.root_task)
+        if task:
+            self._notify_scheduled([task], perf_counter_ns() - start)
+        return task
+
+    def _find_ready(self, get_ready, *args):
+        if not self._listeners:
+            return get_ready(*args)
+
+        start = perf_counter_ns()
+        ready = get_ready(*args)
+        if ready:
+            # the tasks found together share the time it took
+            self._notify_scheduled(ready, (perf_counter_ns() - start) // len(ready))
+        return ready
+
+    def _run_task(self, task, kwargs):
+        if not self._listeners:
+            self._run_or_load(task, kwargs)
+        else:
+            self._notify_started(task)
+            self._notify_ran(task, self._run_or_load(task, kwargs))
+
+        self._store_result(task)
+
+    def _run_or_load(self, task, kwargs):
+        """
+        Run task, or complete it from a cache, and return how long its function ran in nanoseconds - measured the
+        same way as in _run_with_executor, without the time taken to start the task and to look it up in the caches.
+        """
+        if self._runs_itself(task):
+            start = perf_counter_ns()
+            task.run(**kwargs)
+            return perf_counter_ns() - start
+
+        args, task_kwargs = task._start(**kwargs)
+        if self._load_cached(task, args, task_kwargs, kwargs):
+            return 0
+
+        outcome = task._execute_in_time(args, task_kwargs, self._cancel_token)
+        task._finish(*outcome)
+        self._cache_result(task)
+        return round(outcome[3] * 1e9)
+
+    def _run_batch(self, task, kwargs):
+        """
+        Run task together with the other ready tasks of its function in batch calls, for run.
+        """
+        tasks = [task] + self._find_batch(task, self._get_batch_function(task))
+
+        started = []
+        for batch_task in tasks:
+            self._notify_started(batch_task)
+            args, task_kwargs = batch_task._start(**kwargs)
+            if self._load_cached(batch_task, args, task_kwargs, kwargs):
+                self._notify_ran(batch_task, 0)
+                self._store_result(batch_task)
+            else:
+                started.append((batch_task, args, task_kwargs))
+
+        for batch_function, entries in self._group_batches(started):
+            if batch_function is None:
+                batch_task, args, task_kwargs = entries[0]
+                outcomes = [batch_task._execute_in_time(args, task_kwargs, self._cancel_token)]
+            else:
+                outcomes = execute_batch(
+                    batch_function.func,
+                    task._func,
+                    [args for _, args, _ in entries],
+                    entries[0][2],
+                    self._cancel_token,
+                )
+
+            for (batch_task, _, _), outcome in zip(entries, outcomes):
+                batch_task._finish(*outcome)
+                self._notify_ran(batch_task, round(outcome[3] * 1e9))
+                self._cache_result(batch_task)
+                self._store_result(batch_task)
+
+    def _start_tasks(self, tasks, kwargs):
+        """
+        Start the pending tasks among tasks that _before_task_run accepts, for _run_with_executor and arun. Those
+        found in a cache are completed, and those that run themselves are run on this thread. Return the started ones
+        with their arguments, the finished ones with their execution time and the declined ones.
+        """
+        started = []
+        finished = []
+        declined = set()
+
+        for task in tasks:
+            if task.status != BaseTask.STATUS_PENDING:
+                continue
+
+            if not self._before_task_run(task):
+                self._forget_scheduled(task)
+                declined.add(task)
+                continue
+
+            self._notify_started(task)
+            if self._runs_itself(task):
+                start = perf_counter_ns()
+                task.run(**kwargs)
+                finished.append((task, perf_counter_ns() - start))
+                continue
+
+            args, task_kwargs = task._start(**kwargs)
+            if self._load_cached(task, args, task_kwargs, kwargs):
+                finished.append((task, 0))
+            else:
+                started.append((task, args, task_kwargs))
+
+        return started, finished, declined
+
+    @staticmethod
+    def _runs_itself(task):
+        """
+        Whether task has to be run through its run method - tasks that are not a Task, or override run - instead of
+        the steps of Task.run, which the flow calls itself to run tasks concurrently, time them and cache them.
+        """
+        return type(task).run is not Task.run
+
+    def _get_batch_function(self, task):
+        # tasks that run themselves do not call their function the way a batch call would
+        return task._get_batch_function() if not self._runs_itself(task) else None
+
+    def _take_batch(self, ready, task, batch_function):
+        """
+        Take the tasks that can go in a batch call with task out of the deque ready, up to the max size of the batch
+        function. Only the tasks up to the last one taken are looked at.
+        """
+        limit = batch_function.max_size - 1 if batch_function.max_size is not None else None
+        batch = []
+        skipped = []
+        while ready and (limit is None or len(batch) < limit):
+            other = ready.popleft()
+            (batch if self._fits_batch(other, task) else skipped).append(other)
+
+        ready.extendleft(reversed(skipped))
+        return batch
+
+    def _find_batch(self, task, batch_function):
+        """
+        Return the ready tasks that can go in a batch call with task, up to the max size of the batch function. The
+        walk of the frontier stops once enough of them were found.
+        """
+        limit = batch_function.max_size if batch_function.max_size is not None else None
+        batch = self._scheduler.get_ready(limit, lambda other: other is task or self._fits_batch(other, task))
+        return [other for other in batch if other is not task][: limit - 1 if limit is not None else None]
+
+    def _fits_batch(self, other, task):
+        return getattr(other, "_func", None) is task._func and self._get_batch_function(other) is not None
+
+    def _group_batches(self, started):
+        """
+        Split tasks that were started, with their arguments, into batches of tasks of the same function with a batch
+        version and single tasks. Returns a list of (batch function, entries) - the batch function is None for a
+        single task.
+        """
+        groups = []
+        batches = {}
+        for entry in started:
+            task = entry[0]
+            batch_function = self._get_batch_function(task)
+            if batch_function is None:
+                groups.append((None, [entry]))
+                continue
+
+            group = batches.get(task._func)
+            if group is None or (batch_function.max_size is not None and len(group[1]) >= batch_function.max_size):
+                group = batches[task._func] = (batch_function, [])
+                groups.append(group)
+            group[1].append(entry)
+
+        # a batch of one is a single task
+        return [(batch_function if len(entries) > 1 else None, entries) for batch_function, entries in groups]
+
+    @staticmethod
+    def _submit_batch(executor, batch_function, entries, token):
+        func = entries[0][0]._func
+        args_list = [args for _, args, _ in entries]
+        kwargs = entries[0][2]
+
+        if isinstance(executor, ProcessPoolExecutor):
+            # worker processes get the functions by their path, and no token
+            return executor.submit(
+                call_batch, function_to_string(batch_function.func), function_to_string(func), args_list, kwargs
+            )
+
+        return executor.submit(execute_batch, batch_function.func, func, args_list, kwargs, token)
+
+    @staticmethod
+    def _get_outcomes(future, tasks, started):
+        """
+        Return the outcomes of the tasks of a finished future, in the form Task._execute returns them. A call that
+        could not hand them back - its result or exception could not be pickled, or its worker died - counts as a
+        failed run of each of its tasks.
+        """
+        try:
+            # a batch call returns the outcomes of all its tasks
+            return future.result() if len(tasks) > 1 else [future.result()]
+        except Exception:
+            return [make_outcome(None, sys.exc_info(), started)] * len(tasks)
+
+    def _task_ran(self, task, execution_ns):
+        """
+        Handle a task run by _run_with_executor or arun that finished, and return the tasks it made ready.
+        """
+        self._notify_ran(task, execution_ns)
+        self._cache_result(task)
+        self._store_result(task)
+        self._after_task_run(task)
+        return self._find_ready(self._scheduler.update, task)
+
+    def _notify_scheduled(self, tasks, scheduling_ns):
+        now = perf_counter_ns()
+        for task in tasks:
+            self._scheduled_at[task] = now
+            for listener in self._listeners:
+                listener.on_schedule(task, scheduling_ns)
+
+    def _forget_scheduled(self, task):
+        # a declined task is scheduled again the next time it is found ready
+        self._scheduled_at.pop(task, None)
+
+    def _notify_started(self, task):
+        if not self._listeners:
+            return
+
+        now = perf_counter_ns()
+        queue_wait_ns = now - self._scheduled_at.pop(task, now)
+        for listener in self._listeners:
+            listener.on_start(task, queue_wait_ns)
+
+    def _notify_ran(self, task, execution_ns):
+        if not self._listeners:
+            return
+
+        status = task.status
+        for listener in self._listeners:
+            if status == BaseTask.STATUS_COMPLETE:
+                listener.on_finish(task, execution_ns)
+            elif status == BaseTask.STATUS_HALTED:
+                listener.on_halt(task, execution_ns)
+            elif status == BaseTask.STATUS_PENDING:
+                listener.on_retry(task, execution_ns)
+
     def _before_task_run(self, _task):
         """
         Allow inheritors to choose not to run the particular task by returning False
@@ -60,10 +636,152 @@ class Flow(object):
         """
         return None
 
+    def critical_path(self):
+        """
+        Return the standalone tasks that determined how long the flow took, in the order they ran, based on their
+        execution times - see taskflow.analysis.
+        """
+        return [self.get_task(task_id) for task_id in analysis.critical_path(self.to_list())]
+
+    def critical_path_report(self):
+        """
+        Return the total work, span, parallelism and the slack of every task - see taskflow.analysis.analyze.
+        """
+        return analysis.analyze(self.to_list())
+
+    def _load_cached(self, task, args, kwargs, flow_kwargs):
+        """
+        Complete task, just started with args and kwargs, with its result from the memo or the result cache without
+        calling its function. Return whether it was. On a miss, the keys are kept for _cache_result.
+        """
+        if (self.memo is None and self.result_cache is None) or not task.cacheable:
+            return False
+
+        keys = []
+        if self.memo is not None:
+            keys.append((self.memo, make_key(task.func_name, args, kwargs)))
+        if self.result_cache is not None:
+            keys.append((self.result_cache, self._get_fingerprint(task, flow_kwargs)))
+
+        missed = []
+        for cache, key in keys:
+            if key is None:
+                continue
+
+            try:
+                result = cache.load(key)
+            except KeyError:
+                missed.append((cache, key))
+                continue
+
+            task._finish_from_cache(result)
+            for missed_cache, missed_key in missed:
+                missed_cache.store(missed_key, result)
+            return True
+
+        self._cache_keys[task] = missed
+        return False
+
+    def _cache_result(self, task):
+        keys = self._cache_keys.pop(task, None)
+        if not keys or task.status != BaseTask.STATUS_COMPLETE:
+            return
+
+        for cache, key in keys:
+            cache.store(key, task._result)
+
+    def _get_fingerprint(self, task, kwargs):
+        """
+        Return the key of task in the result cache: a hash of its function path, its arguments, kwargs and the
+        fingerprints of the tasks its input comes from. None if any of them is not cacheable, or in a lazily loaded
+        flow, comes from a task that was not loaded.
+        """
+        if kwargs is not self._fingerprint_kwargs and kwargs != self._fingerprint_kwargs:
+            # the kwargs are part of every fingerprint
+            self._fingerprints.clear()
+            self._fingerprint_kwargs = kwargs
+
+        stack = [task]
+        while stack:
+            current_task = stack[-1]
+            if current_task in self._fingerprints:
+                stack.pop()
+                continue
+
+            dependencies = self._get_dependencies(current_task)
+            missing = [dependency for dependency in dependencies or [] if dependency not in self._fingerprints]
+            if missing:
+                stack.extend(missing)
+                continue
+
+            stack.pop()
+            fingerprints = [self._fingerprints[dependency] for dependency in dependencies or []]
+            if dependencies is None or None in fingerprints:
+                self._fingerprints[current_task] = None
+            elif not current_task.is_standalone:
+                # a composite results in the list of the results of its sub chains
+                self._fingerprints[current_task] = make_key(type_to_string(type(current_task)), [], {}, fingerprints)
+            elif current_task.cacheable:
+                self._fingerprints[current_task] = make_key(
+                    current_task.func_name, current_task.args, kwargs, fingerprints
+                )
+            else:
+                self._fingerprints[current_task] = None
+
+        return self._fingerprints[task]
+
+    def _get_dependencies(self, task):
+        """
+        Return the tasks whose results task gets - the last tasks of the sub chains of a composite, or the task
+        _override_arguments takes the previous result from. None if that was not loaded.
+        """
+        if not task.is_standalone:
+            return [sub_task.leaf for sub_task in task.get_all_tasks()]
+
+        source = task
+        while source.needs_prev_result:
+            if source.prev is not None:
+                return [source.prev]
+
+            record = self._records.get(source.id) if self._records is not None else None
+            if record is not None and record["prev"] is not None:
+                return None
+
+            if source.parent is None:
+                break
+            source = source.parent
+
+        return []
+
+    def _store_result(self, task):
+        """
+        Move the result of a task that just completed to the result store, if it is large enough.
+        """
+        if self.result_store is None or task.status != BaseTask.STATUS_COMPLETE:
+            return
+
+        if isinstance(task._result, ResultReference):
+            return
+
+        key = self.result_store.store(task._result)
+        if key is not None:
+            task._result = ResultReference(key, self.result_store)
+
     def _get_next(self, task):
-        if self.is_halted:
+        if not self._can_dispatch():
             return None
 
+        if task is self.root_task:
+            return self._scheduler.get_next()
+
+        return self._walk_next(task)
+
+    @staticmethod
+    def _walk_next(task):
+        """
+        Find the next task by walking the graph from task. Used for starting points other than the root, which the
+        scheduler does not track.
+        """
         stack = deque()
         stack.append(task)
 
@@ -88,33 +806,375 @@ class Flow(object):
 
         return None
 
+    def release(self):
+        """
+        Unlink the tasks of the flow from each other, so that they are freed by reference counting as soon as they
+        are no longer used, instead of waiting for the cyclic garbage collector. Statuses, results, leaf, local_root
+        and whether the flow and its tasks are halted or complete stay readable, but the flow and its tasks cannot be
+        run, changed or serialized afterwards.
+        """
+        tasks = list(self.root_task._walk())
+
+        # composites need their sub chains to aggregate their result, so keep it before anything is unlinked
+        for task in tasks:
+            if not task.is_standalone:
+                task.result
+
+        released_chains = {}
+        for task in tasks:
+            task._unlink(released_chains)
+
+        self._dirty_tasks.clear()
+        self._tasks_by_id = None
+        self._scheduled_at.clear()
+        self._fingerprints.clear()
+        self._cache_keys.clear()
+        self._scheduler.reset()
+
+    def get_task(self, task_id):
+        """
+        Return the task with the given id. A task of a lazily loaded flow that was not loaded is created from its
+        record on every call, without links to other tasks.
+        """
+        task = self._get_tasks_by_id().get(task_id)
+        if task is not None:
+            return task
+
+        if self._records is None or task_id not in self._records:
+            raise KeyError(task_id)
+
+        task_data = self._records[task_id]
+        if not task_data["is_standalone"]:
+            raise ValueError(f"Composite task {task_id} was not loaded and cannot be created without its sub tasks")
+
+        return type_from_string(task_data["class"]).from_data(
+            dict(task_data, prev=None, sub_tasks=[], result=result_from_data(task_data["result"], self.result_store))
+        )
+
+    def _get_tasks_by_id(self):
+        if self._tasks_by_id is None:
+            self._tasks_by_id = {task.id: task for task in self.root_task._walk()}
+
+        return self._tasks_by_id
+
+    def _get_task_record(self, task):
+        task_data = task._get_task_data()
+        task_data.update(task._get_links_data())
+
+        record = self._records.get(task.id) if self._records is not None else None
+        if record is not None:
+            # links to tasks that were not loaded are only in the record
+            task_data.update({"prev": record["prev"], "next": record["next"]})
+            if "sub_tasks" in record:
+                task_data["sub_tasks"] = record["sub_tasks"]
+
+        return task_data
+
     def to_list(self):
-        return self.root_task.to_list()
+        if self._records is None:
+            return self.root_task.to_list()
+
+        # in walk order, as for a flow that is fully loaded
+        head_id = self.root_task.id
+        while self._records[head_id]["prev"] is not None:
+            head_id = self._records[head_id]["prev"]
+
+        tasks_by_id = self._get_tasks_by_id()
+        return [
+            self._get_task_record(tasks_by_id[task_id]) if task_id in tasks_by_id else dict(self._records[task_id])
+            for task_id in _walk_records(self._records, head_id)
+        ]
+
+    def to_delta(self):
+        """
+        Return the records of the tasks that changed since the flow was created or since the last call, in the
+        format of to_list, and start tracking changes anew. Costs O(changed tasks), not O(flow).
+
+        Only the state of the tasks is tracked - tasks added to the flow afterwards need a full to_list.
+        """
+        tasks = sorted(self._dirty_tasks, key=lambda task: task.id)
+        self._dirty_tasks.clear()
+
+        delta = []
+        for task in tasks:
+            record = self._get_task_record(task)
+            # keys that never change are in the full checkpoint already
+            for key in task._unchanging_keys:
+                record.pop(key, None)
+            delta.append(record)
+
+        return delta
+
+    def apply_delta(self, delta: list):
+        """
+        Bring the tasks up to date with a delta returned by to_delta, e.g. when restoring a flow from a full
+        checkpoint followed by deltas. The updated tasks are not reported by the next to_delta.
+        """
+        tasks_by_id = self._get_tasks_by_id()
+
+        reset_scheduler = False
+        for task_data in delta:
+            task = tasks_by_id.get(task_data["id"])
+            if task is None:
+                self._apply_to_record(task_data)
+                continue
+
+            if task.status == BaseTask.STATUS_COMPLETE and task_data["status"] != BaseTask.STATUS_COMPLETE:
+                # the scheduler does not look at tasks it has passed again
+                reset_scheduler = True
+
+            task._apply_data(task_data, result_from_data(task_data["result"], self.result_store))
+            self._dirty_tasks.discard(task)
+
+        if reset_scheduler:
+            self._scheduler.reset()
+
+    def _apply_to_record(self, task_data):
+        if self._records is None or task_data["id"] not in self._records:
+            raise ValueError(f"The delta refers to task {task_data['id']} that is not in the flow")
+
+        if task_data["status"] != BaseTask.STATUS_COMPLETE:
+            # only completed tasks are left unloaded, the flow would have to be loaded again to run this one
+            raise ValueError(f"Task {task_data['id']} was not loaded and cannot become {task_data['status']}")
+
+        # the delta replaces the state of the record - keys missing from it are unset, apart from the links, which
+        # are only in the record, and the keys left out of deltas
+        old_record = self._records[task_data["id"]]
+        kept = ("prev", "next", "sub_tasks") + type_from_string(old_record["class"])._unchanging_keys
+        record = {key: value for key, value in task_data.items() if key not in kept}
+        record.update({key: old_record[key] for key in kept if key in old_record})
+        self._records[task_data["id"]] = record
+
+    def to_bytes(self):
+        """
+        Serialize the flow to the compact binary form of to_list - see taskflow.binary.
+        """
+        return binary.dumps(self.to_list())
+
+    @classmethod
+    def from_bytes(cls, data: bytes, uid=None, friendly_name=None, result_store=None, lazy=False):
+        """
+        Create a flow from the data returned by to_bytes. It unpickles args and results, so never call it on data
+        that did not come from a source you trust.
+        """
+        return cls.from_list(
+            binary.loads(data), uid=uid, friendly_name=friendly_name, result_store=result_store, lazy=lazy
+        )
 
     @classmethod
-    def from_list(cls, task_list: list, uid=None, friendly_name=None):
+    def from_list(cls, task_list: list, uid=None, friendly_name=None, result_store=None, lazy=False):
+        """
+        Create a flow from the records returned by to_list.
+
+        With lazy, only the tasks that can still run are created, together with the completed tasks right before
+        them, whose results they may need. The completed history stays as records: it is kept in to_list and
+        to_delta and can be looked at with get_task, but it is not part of the task graph. Tasks added to such
+        a flow later are not serialized.
+        """
+        if lazy:
+            return cls._from_list_lazy(task_list, uid, friendly_name, result_store)
+
         # tasks come in a possibly randomly ordered list
-        # we need to figure out the correct order for creating them starting with leaves
+        # a task can only be created after its prev and its sub tasks, so create them in dependency order
+
+        tasks_data = {task_data["id"]: task_data for task_data in task_list}
+        waiting_for = {}
+        dependents = defaultdict(list)
+        ready = []
+
+        for task_id, task_data in tasks_data.items():
+            task_depends_on = ([task_data["prev"]] if task_data["prev"] else []) + (task_data.get("sub_tasks") or [])
+
+            waiting_for[task_id] = len(task_depends_on)
+            for depends_on in task_depends_on:
+                dependents[depends_on].append(task_id)
+
+            if not task_depends_on:
+                ready.append(task_id)
 
         created = {}
-        last_created = None
-        remaining_tasks = deepcopy(task_list)
+        while ready:
+            task_id = ready.pop()
+            task_data = tasks_data[task_id]
 
-        while remaining_tasks:
-            for task_data in remaining_tasks:
-                task_depends_on = ([task_data["prev"]] if task_data["prev"] else []) + (
-                    task_data.get("sub_tasks") or []
+            task_type = type_from_string(task_data["class"])
+            created[task_id] = task_type.from_data(
+                dict(
+                    task_data,
+                    prev=created[task_data["prev"]] if task_data["prev"] else None,
+                    sub_tasks=[created[sub_task_id] for sub_task_id in (task_data.get("sub_tasks") or [])],
+                    result=result_from_data(task_data["result"], result_store),
                 )
+            )
+
+            for dependent_id in dependents.pop(task_id, ()):
+                waiting_for[dependent_id] -= 1
+                if not waiting_for[dependent_id]:
+                    ready.append(dependent_id)
+
+        if not created or len(created) != len(tasks_data):
+            raise ValueError("The task list is empty or refers to tasks that are not in it")
+
+        return cls(
+            BaseTask.find_root(created[task_id]), uid=uid, friendly_name=friendly_name, result_store=result_store
+        )
+
+    @classmethod
+    def _from_list_lazy(cls, task_list, uid, friendly_name, result_store):
+        records = {task_data["id"]: task_data for task_data in task_list}
+        sub_task_ids = {sub_task_id for task_data in task_list for sub_task_id in (task_data.get("sub_tasks") or [])}
+        roots = [
+            task_id for task_id, task_data in records.items() if not task_data["prev"] and task_id not in sub_task_ids
+        ]
+        if len(roots) != 1:
+            raise ValueError(f"The task list must have exactly one root task, found {len(roots)}")
+
+        try:
+            root_task = _LazyLoader(records, result_store).load(roots[0])
+        except KeyError as err:
+            raise ValueError(f"The task list refers to task {err.args[0]} that is not in it") from err
+
+        flow = cls(root_task, uid=uid, friendly_name=friendly_name, result_store=result_store)
+        flow._records = records
+        return flow
+
+
+def _record_call_start(call_starts, token):
+    call_starts[token] = start_clock()
+
+
+def _walk_records(records, head_id):
+    """
+    Yield the ids of the records of the task head_id, the tasks after it and all their sub tasks, in the order of
+    BaseTask._walk.
+    """
+    # (task id, whether its sub tasks were already walked)
+    stack = [(head_id, False)]
+
+    while stack:
+        task_id, sub_tasks_walked = stack.pop()
+        task_data = records[task_id]
+
+        if not task_data["is_standalone"] and not sub_tasks_walked:
+            stack.append((task_id, True))
+            stack.extend((sub_task_id, False) for sub_task_id in reversed(task_data["sub_tasks"]))
+            continue
+
+        yield task_id
+
+        if task_data["next"]:
+            stack.append((task_data["next"], False))
+
+
+class _LazyLoader(object):
+    """
+    Creates the tasks of a lazily loaded flow from its records - see Flow.from_list. Only the chains that are loaded
+    are walked, and everything is done with explicit stacks, so that deep flows do not hit the recursion limit.
+    """
+
+    def __init__(self, records, result_store):
+        self._records = records
+        self._result_store = result_store
+        # statuses of composites, worked out from their records
+        self._statuses = {}
+        # id of the last task of each chain, by the id of its head
+        self._leaves = {}
+        # ids of the tasks to load of each chain, by the id of its head
+        self._loaded_ids = {}
+        # id of the loaded task before each task to load, None for the first one of its chain
+        self._prev_ids = {}
+
+    def load(self, head_id):
+        """
+        Create the tasks to load of the chain starting with head_id and everything they need, and return the first.
+        """
+        created = {}
+        stack = [self._get_loaded_ids(head_id)[-1]]
+        while stack:
+            task_id = stack[-1]
+            if task_id in created:
+                stack.pop()
+                continue
 
-                if all(depends_on in created for depends_on in task_depends_on):
-                    task_type = type_from_string(task_data["class"])
-                    task_data["sub_tasks"] = [created[task_id] for task_id in (task_data.get("sub_tasks") or [])]
-                    task_data["prev"] = created[task_data["prev"]] if task_data["prev"] else None
+            # a task needs the task before it and the whole of its sub chains
+            task_data = self._records[task_id]
+            sub_task_ids = [self._get_loaded_ids(sub_task_id) for sub_task_id in (task_data.get("sub_tasks") or [])]
+            prev_id = self._prev_ids[task_id]
+            needed = ([prev_id] if prev_id is not None else []) + [loaded_ids[-1] for loaded_ids in sub_task_ids]
+            missing = [needed_id for needed_id in needed if needed_id not in created]
+            if missing:
+                stack.extend(missing)
+                continue
 
-                    last_created = task_type.from_data(task_data)
+            stack.pop()
+            created[task_id] = type_from_string(task_data["class"]).from_data(
+                dict(
+                    task_data,
+                    prev=created[prev_id] if prev_id is not None else None,
+                    sub_tasks=[created[loaded_ids[0]] for loaded_ids in sub_task_ids],
+                    result=result_from_data(task_data["result"], self._result_store),
+                )
+            )
 
-                    created[last_created.id] = last_created
-                    remaining_tasks.remove(task_data)
+        return created[self._get_loaded_ids(head_id)[0]]
+
+    def _get_loaded_ids(self, head_id):
+        # a completed chain is only needed for the result of its last task
+        if head_id not in self._loaded_ids:
+            chain = self._get_chain(head_id)
+            start = len(chain) - 1
+            for index, task_id in enumerate(chain):
+                if self._get_status(task_id) != BaseTask.STATUS_COMPLETE:
+                    # keep the completed task before the first one that can still run, for its result
+                    start = max(index - 1, 0)
                     break
 
-        return cls(BaseTask.find_root(last_created), uid=uid, friendly_name=friendly_name)
+            loaded_ids = chain[start:]
+            self._loaded_ids[head_id] = loaded_ids
+            self._prev_ids.update(zip(loaded_ids, [None] + loaded_ids[:-1]))
+
+        return self._loaded_ids[head_id]
+
+    def _get_chain(self, head_id):
+        chain = [head_id]
+        while self._records[chain[-1]]["next"]:
+            chain.append(self._records[chain[-1]]["next"])
+
+        self._leaves[head_id] = chain[-1]
+        return chain
+
+    def _get_leaf(self, head_id):
+        if head_id not in self._leaves:
+            self._get_chain(head_id)
+        return self._leaves[head_id]
+
+    def _get_status(self, task_id):
+        stack = [task_id]
+        while stack:
+            current_id = stack[-1]
+            task_data = self._records[current_id]
+            if task_data["is_standalone"] or current_id in self._statuses:
+                stack.pop()
+                continue
+
+            # a composite has the statuses of the last tasks of its sub chains
+            leaf_ids = [self._get_leaf(sub_task_id) for sub_task_id in task_data["sub_tasks"]]
+            missing = [
+                leaf_id
+                for leaf_id in leaf_ids
+                if not self._records[leaf_id]["is_standalone"] and leaf_id not in self._statuses
+            ]
+            if missing:
+                stack.extend(missing)
+                continue
+
+            stack.pop()
+            leaf_statuses = [self._statuses.get(leaf_id, self._records[leaf_id]["status"]) for leaf_id in leaf_ids]
+            if BaseTask.STATUS_HALTED in leaf_statuses:
+                self._statuses[current_id] = BaseTask.STATUS_HALTED
+            elif all(status == BaseTask.STATUS_COMPLETE for status in leaf_statuses):
+                self._statuses[current_id] = BaseTask.STATUS_COMPLETE
+            else:
+                self._statuses[current_id] = BaseTask.STATUS_PENDING
+
+        return self._statuses.get(task_id, self._records[task_id]["status"])
@@ -0,0 +1,181 @@
+"""
+Listeners for what happens to the tasks of a flow, and a listener that aggregates latency histograms and counters.
+
+    metrics = Metrics()
+    flow.add_listener(metrics)
+    flow.run()
+    metrics.snapshot()
+
+All times are in nanoseconds, measured with time.perf_counter_ns. Flows only take the time when a listener is
+attached.
+"""
+from .type_helpers import function_to_string, type_to_string
+
+
+class Listener(object):
+    """
+    Base class for flow listeners - override the events of interest. Listeners are called on the thread running the
+    flow.
+    """
+
+    def on_schedule(self, task, scheduling_ns):
+        """
+        The flow found task ready to run. scheduling_ns is the time the flow spent finding it.
+        """
+        return None
+
+    def on_start(self, task, queue_wait_ns):
+        """
+        task is about to run. queue_wait_ns is the time since it was scheduled.
+        """
+        return None
+
+    def on_finish(self, task, execution_ns):
+        """
+        task ran and completed.
+        """
+        return None
+
+    def on_retry(self, task, execution_ns):
+        """
+        task ran and failed, and will run again.
+        """
+        return None
+
+    def on_halt(self, task, execution_ns):
+        """
+        task ran and failed for the last time, halting the flow.
+        """
+        return None
+
+
+class Histogram(object):
+    """
+    Counts values in logarithmic buckets, four per power of two, so percentiles are accurate to within 25%.
+    """
+
+    __slots__ = ("count", "total", "min", "max", "_buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self._buckets = {}
+
+    def record(self, value):
+        value = max(int(value), 0)
+
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        bucket = self._get_bucket(value)
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+    def percentile(self, percent):
+        """
+        Return the upper bound of the bucket holding the given percentile, or None if nothing was recorded.
+        """
+        if not self.count:
+            return None
+
+        rank = percent / 100 * self.count
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(self._get_bounds(bucket)[1], self.max)
+
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            # lowest value, highest value, count
+            "buckets": [list(self._get_bounds(bucket)) + [self._buckets[bucket]] for bucket in sorted(self._buckets)],
+        }
+
+    @staticmethod
+    def _get_bucket(value):
+        if value < 4:
+            return value
+
+        # keep the three highest bits of the value
+        exponent = value.bit_length() - 3
+        return 4 * exponent + (value >> exponent)
+
+    @staticmethod
+    def _get_bounds(bucket):
+        if bucket < 4:
+            return bucket, bucket
+
+        exponent = bucket // 4 - 1
+        mantissa = bucket % 4 + 4
+        return mantissa << exponent, ((mantissa + 1) << exponent) - 1
+
+
+class Metrics(Listener):
+    """
+    Aggregates counters and histograms of scheduling overhead, queue wait and execution time for each task function.
+    """
+
+    COUNTERS = ("scheduled", "started", "finished", "retried", "halted")
+    HISTOGRAMS = ("scheduling_ns", "queue_wait_ns", "execution_ns")
+
+    def __init__(self):
+        self._functions = {}
+
+    def on_schedule(self, task, scheduling_ns):
+        self._record(task, "scheduled", "scheduling_ns", scheduling_ns)
+
+    def on_start(self, task, queue_wait_ns):
+        self._record(task, "started", "queue_wait_ns", queue_wait_ns)
+
+    def on_finish(self, task, execution_ns):
+        self._record(task, "finished", "execution_ns", execution_ns)
+
+    def on_retry(self, task, execution_ns):
+        self._record(task, "retried", "execution_ns", execution_ns)
+
+    def on_halt(self, task, execution_ns):
+        self._record(task, "halted", "execution_ns", execution_ns)
+
+    def snapshot(self):
+        """
+        Return the metrics so far as plain data, keyed by function path.
+        """
+        return {
+            name: {
+                "counters": dict(metrics["counters"]),
+                "histograms": {key: histogram.snapshot() for key, histogram in metrics["histograms"].items()},
+            }
+            for name, metrics in self._functions.items()
+        }
+
+    def reset(self):
+        self._functions = {}
+
+    def _record(self, task, counter, histogram, value):
+        name = self._get_name(task)
+        metrics = self._functions.get(name)
+        if metrics is None:
+            metrics = self._functions[name] = {
+                "counters": dict.fromkeys(self.COUNTERS, 0),
+                "histograms": {key: Histogram() for key in self.HISTOGRAMS},
+            }
+
+        metrics["counters"][counter] += 1
+        metrics["histograms"][histogram].record(value)
+
+    @staticmethod
+    def _get_name(task):
+        func = getattr(task, "_func", None)
+        return function_to_string(func) if func is not None else type_to_string(type(task))
@@ -0,0 +1,41 @@
+"""
+The outcome of a call of a task function, in the form Task._execute returns it: the result, the exception info if the
+call failed, the start time and the duration in seconds. The duration is measured with the monotonic perf_counter_ns.
+"""
+import sys
+import time
+from datetime import datetime
+
+
+def start_clock():
+    """
+    Return the (datetime, perf_counter_ns) pair a call starts at, which the other functions take as started.
+    """
+    return datetime.now(), time.perf_counter_ns()
+
+
+def elapsed(started):
+    """
+    Return the seconds since started.
+    """
+    return (time.perf_counter_ns() - started[1]) / 1e9
+
+
+def make_outcome(result, exc_info, started, delta_time=None):
+    """
+    Return the outcome of a call started at started, which took delta_time seconds - by default the time since then.
+    """
+    return result, exc_info, started[0], elapsed(started) if delta_time is None else delta_time
+
+
+def call_timed(func, *args, **kwargs):
+    """
+    Call func and return its outcome. An exception it raises makes a failed outcome.
+    """
+    started = start_clock()
+    try:
+        result = func(*args, **kwargs)
+    except Exception:
+        return make_outcome(None, sys.exc_info(), started)
+
+    return make_outcome(result, None, started)
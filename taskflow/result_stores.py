@@ -0,0 +1,178 @@
+import hashlib
+import itertools
+import mmap
+import os
+import pickle
+import tempfile
+
+# the key of the only item of the dict a stored result is serialized as
+REFERENCE_KEY = "$result_key"
+
+# containers larger than this are pickled to tell their size rather than estimated
+_ESTIMATE_MAX_ITEMS = 1000
+
+
+class ResultReference(object):
+    """
+    Stands in for a result kept in a result store. The result is loaded every time it is needed and not kept.
+    """
+
+    __slots__ = ("key", "store")
+
+    def __init__(self, key, store):
+        self.key = key
+        self.store = store
+
+    def load(self):
+        return self.store.load(self.key)
+
+    def to_data(self):
+        return {REFERENCE_KEY: self.key}
+
+    @staticmethod
+    def is_data(result):
+        return type(result) is dict and len(result) == 1 and REFERENCE_KEY in result
+
+    def __eq__(self, other):
+        return isinstance(other, ResultReference) and (self.key, self.store) == (other.key, other.store)
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"ResultReference({self.key!r})"
+
+
+def result_from_data(result, store):
+    """
+    Turn a serialized result back into a reference, if it is one.
+    """
+    if not ResultReference.is_data(result):
+        return result
+
+    if store is None:
+        raise ValueError(f"Result {result[REFERENCE_KEY]} is kept in a result store, but no result store was given")
+
+    return ResultReference(result[REFERENCE_KEY], store)
+
+
+class ResultStore(object):
+    """
+    Keeps large results out of the tasks and their serialized form. Results that pickle to at least min_size bytes
+    are stored - smaller ones stay in the task.
+    """
+
+    def __init__(self, min_size=1024 * 1024):
+        self.min_size = min_size
+
+    def store(self, result):
+        """
+        Store result and return its key, or None if it is too small to be worth storing or cannot be pickled.
+        """
+        size_bound = _get_size_bound(result)
+        if size_bound is not None and size_bound < self.min_size:
+            return None
+
+        try:
+            data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # kept in the task, where it is fine as long as the flow is not serialized
+            return None
+        if len(data) < self.min_size:
+            return None
+
+        # keyed by content, so the same result is only written once
+        key = hashlib.sha256(data).hexdigest()
+        if key not in self:
+            self._write(key, data)
+        return key
+
+    def load(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def __contains__(self, key):
+        raise NotImplementedError
+
+    def _write(self, key, data):
+        raise NotImplementedError
+
+
+def _get_size_bound(value, depth=0):
+    """
+    Return an upper bound of the size value pickles to, or None if it cannot be told without pickling it. Looks into
+    small containers of simple values only, so that small results are not pickled just to find out they are small.
+    """
+    value_type = type(value)
+    if value is None or value_type is bool or value_type is float:
+        return 16
+    if value_type is int:
+        return 16 + value.bit_length() // 8
+    if value_type is bytes or value_type is bytearray:
+        return 16 + len(value)
+    if value_type is str:
+        # at most 4 bytes per character in UTF-8
+        return 16 + 4 * len(value)
+
+    if depth >= 2 or value_type not in (list, tuple, set, frozenset, dict) or len(value) > _ESTIMATE_MAX_ITEMS:
+        return None
+
+    total = 16
+    for item in itertools.chain.from_iterable(value.items()) if value_type is dict else value:
+        item_bound = _get_size_bound(item, depth + 1)
+        if item_bound is None:
+            return None
+        total += item_bound
+
+    return total
+
+
+class FileResultStore(ResultStore):
+    """
+    Keeps each result in a file of its own under directory. Results are read through a memory map.
+    """
+
+    def __init__(self, directory, min_size=1024 * 1024):
+        super().__init__(min_size=min_size)
+        self.directory = os.fspath(directory)
+
+    def load(self, key):
+        try:
+            with open(self._get_path(key), "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return pickle.loads(data)
+        except FileNotFoundError as err:
+            raise KeyError(key) from err
+
+    def delete(self, key):
+        try:
+            os.remove(self._get_path(key))
+        except FileNotFoundError as err:
+            raise KeyError(key) from err
+
+    def __contains__(self, key):
+        return os.path.exists(self._get_path(key))
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _write(self, key, data):
+        write_file(self._get_path(key), data)
+
+
+def write_file(path, data):
+    """
+    Write data to path, creating the directory if needed. The data is written next to its final place and moved
+    there, so that it is never seen half written.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
@@ -0,0 +1,51 @@
+import random
+
+
+class Backoff(object):
+    """
+    How long a task that failed waits before it runs again: initial seconds after the first run, multiplied by
+    multiplier after every further run, up to max_delay. jitter takes a random part of up to that fraction off each
+    delay, so that tasks that failed together do not all retry at once - 1 spreads them over the whole delay.
+
+        Task(fetch, max_runs=5, backoff=Backoff(initial=0.5, max_delay=30))
+    """
+
+    __slots__ = ("initial", "multiplier", "max_delay", "jitter")
+
+    def __init__(self, initial=1.0, multiplier=2.0, max_delay=60.0, jitter=0.5):
+        if not 0 <= jitter <= 1:
+            raise ValueError(f"jitter must be between 0 and 1, not {jitter}")
+
+        self.initial = initial
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def get_delay(self, runs):
+        """
+        Return the delay in seconds before the run after the given number of failed runs.
+        """
+        # the exponent is capped, as a delay past max_delay is not needed and large powers overflow
+        delay = self.initial * self.multiplier ** min(max(runs - 1, 0), 64)
+        if self.max_delay is not None:
+            delay = min(delay, self.max_delay)
+
+        return delay - delay * self.jitter * random.random()
+
+    def to_data(self):
+        return {
+            "initial": self.initial,
+            "multiplier": self.multiplier,
+            "max_delay": self.max_delay,
+            "jitter": self.jitter,
+        }
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(**data)
+
+    def __eq__(self, other):
+        return isinstance(other, Backoff) and self.to_data() == other.to_data()
+
+    def __repr__(self):
+        return "Backoff({})".format(", ".join(f"{key}={value!r}" for key, value in self.to_data().items()))
@@ -0,0 +1,215 @@
+import time
+
+from .tasks import BaseTask
+
+
+class Scheduler(object):
+    """
+    Keeps the frontier of a flow - every task the depth-first walk from the root would stop at - ordered the same
+    way the walk visits them. Picking the next task only looks at the start of the frontier instead of walking the
+    whole graph again.
+
+    The frontier is validated lazily: a task in it that is found complete is replaced in place by whatever the walk
+    would reach after it, so statuses can be changed by anyone, not only by the flow running the tasks. Tasks the
+    walk has already passed are not looked at again - call reset if one of them is no longer complete. Tasks linked
+    with then() after a completed task make the frontier be rebuilt, as the walk may have passed that task.
+
+    Pending tasks that wait to be retried are left in the frontier, but not returned until they are due.
+    """
+
+    def __init__(self, root_task: BaseTask):
+        self.root_task = root_task
+
+        # doubly linked list of frontier tasks, closed by the sentinel
+        self._sentinel = object()
+        self._next_entry = None
+        self._prev_entry = None
+
+        # the composite each frontier task or expanded composite belongs to (None for the root chain)
+        self._owners = None
+        # number of frontier tasks and expanded composites belonging to each expanded composite
+        self._pending = None
+        # frontier tasks found waiting to be retried
+        self._waiting = set()
+        # BaseTask._links_after_complete when the frontier was built
+        self._links_seen = None
+
+    def reset(self):
+        """
+        Forget the frontier. It will be rebuilt from the root on the next call to get_next.
+        """
+        self._next_entry = None
+        self._prev_entry = None
+        self._owners = None
+        self._pending = None
+        self._waiting = set()
+
+    def get_next(self):
+        """
+        Return the first pending standalone task in walk order, or None if there is none.
+        """
+        ready = self.get_ready(limit=1)
+        return ready[0] if ready else None
+
+    def get_ready(self, limit=None, accept=None):
+        """
+        Return the pending standalone tasks that are due in walk order, at most limit of them. Given accept, only the
+        tasks it returns True for are returned - and the walk stops once limit of them were found.
+        """
+        if self._owners is None or self._links_seen != BaseTask._links_after_complete:
+            self._build()
+
+        return self._collect_ready(self._next_entry[self._sentinel], self._sentinel, limit, accept)
+
+    def get_retry_at(self):
+        """
+        Return the earliest time a task waits to be retried until, or None if none does. Only tasks skipped by
+        get_ready and update are known to wait - once get_ready returns nothing, that is all of them.
+        """
+        self._waiting = {
+            task for task in self._waiting if task.status == BaseTask.STATUS_PENDING and task.retry_at is not None
+        }
+        return min((task.retry_at for task in self._waiting), default=None)
+
+    def update(self, task):
+        """
+        Bring the frontier up to date after task ran and return the tasks that became ready because of it, in walk
+        order. This only looks at the frontier around task, so it is cheaper than get_ready on wide flows.
+        """
+        if self._owners is None or self._links_seen != BaseTask._links_after_complete or task not in self._next_entry:
+            return self.get_ready()
+
+        status = task.status
+        if status == BaseTask.STATUS_PENDING:
+            if task.is_due():
+                return [task]
+
+            self._waiting.add(task)
+            return []
+
+        if status != BaseTask.STATUS_COMPLETE:
+            return []
+
+        following = self._next_entry[task]
+        anchor = self._advance(task)
+        if anchor is None:
+            return self.get_ready()
+
+        return self._collect_ready(self._next_entry[anchor], following, None)
+
+    def _collect_ready(self, entry, stop, limit, accept=None):
+        ready = []
+        now = time.time()
+
+        while entry is not stop and (limit is None or len(ready) < limit):
+            status = entry.status
+            if status == BaseTask.STATUS_PENDING and entry.is_standalone:
+                if entry.is_due(now):
+                    if accept is None or accept(entry):
+                        ready.append(entry)
+                else:
+                    self._waiting.add(entry)
+                entry = self._next_entry[entry]
+                continue
+
+            if status == BaseTask.STATUS_COMPLETE or status == BaseTask.STATUS_PENDING:
+                # completed - or a halted composite that is pending again - replace it by what comes after it
+                anchor = self._advance(entry)
+                if anchor is None:
+                    # the frontier was rebuilt, start over
+                    return self._collect_ready(self._next_entry[self._sentinel], self._sentinel, limit, accept)
+
+                entry = self._next_entry[anchor]
+                continue
+
+            # running or halted - this task cannot be handled, move on.
+            entry = self._next_entry[entry]
+
+        return ready
+
+    def _build(self):
+        self._links_seen = BaseTask._links_after_complete
+        self._next_entry = {self._sentinel: self._sentinel}
+        self._prev_entry = {self._sentinel: self._sentinel}
+        self._owners = {}
+        self._pending = {}
+
+        self._insert_after(self._sentinel, self._explore(self.root_task, None))
+
+    def _explore(self, task, owner):
+        """
+        Walk the graph from task the same way the depth-first walk does and return the tasks it stops at.
+        Composites that are walked into are registered as expanded.
+        """
+        entries = []
+        stack = [(task, owner)]
+
+        while stack:
+            current_task, current_owner = stack.pop()
+            current_status = current_task.status
+
+            if current_status == BaseTask.STATUS_COMPLETE:
+                if current_task.next:
+                    stack.append((current_task.next, current_owner))
+                continue
+
+            if current_owner is not None:
+                self._pending[current_owner] += 1
+            self._owners[current_task] = current_owner
+
+            if current_status == BaseTask.STATUS_PENDING and not current_task.is_standalone:
+                self._pending[current_task] = 0
+                sub_tasks = current_task.get_all_tasks()
+                for task_index in range(len(sub_tasks) - 1, -1, -1):
+                    stack.append((sub_tasks[task_index], current_task))
+                continue
+
+            entries.append(current_task)
+
+        return entries
+
+    def _advance(self, entry):
+        """
+        Replace entry with the tasks the walk reaches after it. Returns the entry preceding the replaced one, or None
+        if the frontier had to be rebuilt.
+        """
+        anchor = self._prev_entry[entry]
+        self._remove(entry)
+
+        owner = self._owners.pop(entry)
+        self._insert_after(anchor, self._explore(entry, owner))
+
+        while owner is not None:
+            self._pending[owner] -= 1
+            if self._pending[owner]:
+                break
+
+            # nothing left to wait for inside the composite, so the walk continues after it
+            del self._pending[owner]
+            if owner.status != BaseTask.STATUS_COMPLETE:
+                # statuses were changed in a way the frontier cannot follow
+                self._build()
+                return None
+
+            composite = owner
+            owner = self._owners.pop(composite)
+            if composite.next:
+                self._insert_after(anchor, self._explore(composite.next, owner))
+
+        return anchor
+
+    def _insert_after(self, anchor, entries):
+        following = self._next_entry[anchor]
+        for entry in entries:
+            self._next_entry[anchor] = entry
+            self._prev_entry[entry] = anchor
+            anchor = entry
+
+        self._next_entry[anchor] = following
+        self._prev_entry[following] = anchor
+
+    def _remove(self, entry):
+        prev_entry = self._prev_entry.pop(entry)
+        next_entry = self._next_entry.pop(entry)
+        self._next_entry[prev_entry] = next_entry
+        self._prev_entry[next_entry] = prev_entry
@@ -0,0 +1,215 @@
+"""
+Running the stages of a StreamTask as a pipeline.
+
+    def read_rows(path):
+        with open(path) as file:
+            yield from csv.reader(file)
+
+    def parse(rows):
+        for row in rows:
+            yield Record.from_row(row)
+
+    def write(records):
+        return export(records)
+
+    StreamTask(read_rows, parse, write, args=(path,), queue_size=1000)
+
+The source is a generator function called with the arguments of the task, and every stage is called with an iterator
+over the items of the one before it. Each stage but the last runs on a thread or process of its own and hands its
+items on through a queue of queue_size items, blocking while the queue is full - so the stages work on different
+items at the same time, and at most that many items are held between two stages. The last stage runs on the thread
+running the task and its return value is the result of the task, collected into a list if it is an iterator.
+
+A stage that fails passes the exception on to the stages after it, so that it ends up failing the task. Once the last
+stage returns, fails or the run is cancelled, the stages still running are stopped the next time they wait on a
+queue. Stages run in processes get the functions by their path, so they have to be importable, and their items
+have to be picklable. A stage process that exits without finishing - killed or crashed - fails the task.
+"""
+import multiprocessing
+import pickle
+import queue
+import threading
+from collections.abc import Iterator
+
+from .cancellation import Cancelled, current_token
+from .type_helpers import function_from_string, function_to_string
+from .workers import _ExceptionWithTraceback
+
+# seconds between checks whether the pipeline was stopped, while a stage waits on a queue
+_POLL_INTERVAL = 0.05
+# seconds to wait for a stage to stop before leaving it running - or terminating it, for a process
+_STOP_TIMEOUT = 5
+
+
+class _End(object):
+    # put on a queue after the last item
+    pass
+
+
+class _Failure(object):
+    # put on a queue instead of the remaining items when a stage failed
+    def __init__(self, error):
+        self.error = error
+
+
+class _Stopped(BaseException):
+    # raised in a stage waiting on a queue once the pipeline stopped - not an Exception, so that stages do not catch it
+    pass
+
+
+class StageExited(Exception):
+    """
+    Raised when a stage process exited without finishing - killed or crashed.
+    """
+
+
+def run_pipeline(source, stages, args, kwargs, queue_size, processes=False):
+    """
+    Run source(*args, **kwargs) and stages as a pipeline and return the result of the last stage. Functions can be
+    given by their path.
+    """
+    if processes:
+        context = multiprocessing.get_context()
+        make_queue, make_event, start = context.Queue, context.Event, _start_process
+    else:
+        make_queue, make_event, start = queue.Queue, threading.Event, _start_thread
+    stopped = make_event()
+
+    functions = [source] + list(stages)
+    sink = functions.pop() if stages else None
+    token = current_token()
+
+    # each stage with the event it sets once it handed on all it had to
+    workers = []
+    inbox = None
+    try:
+        for func in functions:
+            outbox = make_queue(queue_size)
+            done = make_event()
+            workers.append((start(func, inbox, outbox, stopped, done, args if inbox is None else None, kwargs), done))
+            inbox = outbox
+
+        items = _receive(inbox, stopped, processes, token, workers)
+        if sink is None:
+            return list(items)
+
+        if isinstance(sink, str):
+            sink = function_from_string(sink)
+        result = sink(items, **kwargs)
+        return list(result) if isinstance(result, Iterator) else result
+    finally:
+        stopped.set()
+        for worker, _ in workers:
+            worker.join(_STOP_TIMEOUT)
+            if processes and worker.is_alive():
+                worker.terminate()
+
+
+def _start_thread(func, inbox, outbox, stopped, done, args, kwargs):
+    thread = threading.Thread(
+        target=_run_stage,
+        args=(func, inbox, outbox, stopped, done, args, kwargs, False),
+        name="taskflow-stage",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def _start_process(func, inbox, outbox, stopped, done, args, kwargs):
+    if not isinstance(func, str):
+        func = function_to_string(func)
+
+    process = multiprocessing.get_context().Process(
+        target=_run_stage,
+        args=(func, inbox, outbox, stopped, done, args, kwargs, True),
+        name=f"taskflow-stage:{func}",
+        daemon=True,
+    )
+    process.start()
+    return process
+
+
+def _run_stage(func, inbox, outbox, stopped, done, args, kwargs, in_process):
+    # items are pickled here rather than by the queue, which drops what it cannot pickle without telling anyone
+    pack = pickle.dumps if in_process else _identity
+    try:
+        try:
+            if isinstance(func, str):
+                func = function_from_string(func)
+
+            items = func(*args, **kwargs) if inbox is None else func(_receive(inbox, stopped, in_process), **kwargs)
+            for item in items:
+                _send(outbox, pack(item), stopped)
+            _send(outbox, pack(_End()), stopped)
+        except Exception as error:
+            _send(outbox, _pack_failure(error) if in_process else _Failure(error), stopped)
+    except _Stopped:
+        if in_process:
+            # items left in the queue must not keep the process from exiting
+            outbox.cancel_join_thread()
+        return
+
+    if in_process:
+        # the items are only handed on once the queue flushed them
+        outbox.close()
+        outbox.join_thread()
+    done.set()
+
+
+def _identity(item):
+    return item
+
+
+def _pack_failure(error):
+    wrapped = _ExceptionWithTraceback(error)
+    try:
+        return pickle.dumps(_Failure(wrapped))
+    except Exception:
+        # keep the traceback of an exception that cannot be pickled itself
+        wrapped.error = RuntimeError(f"{type(error).__qualname__}, which cannot be pickled: {error}")
+        return pickle.dumps(_Failure(wrapped))
+
+
+def _send(outbox, item, stopped):
+    while True:
+        try:
+            outbox.put(item, timeout=_POLL_INTERVAL)
+            return
+        except queue.Full:
+            if stopped.is_set():
+                raise _Stopped()
+
+
+def _receive(inbox, stopped, pickled, token=None, workers=()):
+    """
+    Yield the items from inbox until the stage before ends, raising its exception if it failed. Only the last stage
+    gets the token of the run and the stages, and stops the pipeline once it is cancelled or a stage exited without
+    finishing.
+    """
+    while True:
+        if token is not None and token.is_cancelled:
+            raise Cancelled()
+
+        try:
+            item = inbox.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            if stopped.is_set():
+                raise _Stopped()
+            _check_workers(workers)
+            continue
+
+        if pickled:
+            item = pickle.loads(item)
+        if isinstance(item, _End):
+            return
+        if isinstance(item, _Failure):
+            raise item.error
+        yield item
+
+
+def _check_workers(workers):
+    for worker, done in workers:
+        if not worker.is_alive() and not done.is_set():
+            exitcode = getattr(worker, "exitcode", None)
+            raise StageExited(f"Stage {worker.name} exited without finishing, with exit code {exitcode}")
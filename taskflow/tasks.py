@@ -1,8 +1,151 @@
+import asyncio
+import inspect
+import queue
 import sys
-from datetime import datetime
-
+import threading
+import time
+import weakref
+from array import array
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from taskflow.batching import get_batch_function
+from taskflow.cancellation import CancelToken, _abandon, _current_token
 from taskflow.defaults import Defaults
+from taskflow.outcomes import call_timed, make_outcome, start_clock
+from taskflow.result_stores import ResultReference
+from taskflow.retries import Backoff
+from taskflow.streaming import run_pipeline
 from taskflow.type_helpers import function_from_string, function_to_string, type_to_string
+from taskflow.workers import call_chunks, call_function, run_chunks
+
+# shared by all chains that have nothing halted, so that they do not need a set each
+_NOTHING_HALTED = frozenset()
+
+
+class _TimeoutThreads(object):
+    """
+    Runs the calls of tasks with a timeout outside of an executor. A call never waits for a thread, as one is started
+    whenever none is idle, so that its time does not run out while it is queued - calls given up on keep their
+    threads until they return. A thread that finished a call waits for the next one, unless Defaults.timeout_threads
+    threads already do.
+    """
+
+    def __init__(self):
+        self._calls = queue.SimpleQueue()
+        self._idle = 0
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args):
+        future = Future()
+        with self._lock:
+            if self._idle:
+                self._idle -= 1
+            else:
+                threading.Thread(target=self._work, name="taskflow-timeout", daemon=True).start()
+
+        self._calls.put((future, func, args))
+        return future
+
+    def _work(self):
+        while True:
+            future, func, args = self._calls.get()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args))
+                except BaseException as ex:
+                    future.set_exception(ex)
+
+            with self._lock:
+                if self._idle >= Defaults.timeout_threads:
+                    return
+                self._idle += 1
+
+
+_timeout_threads = _TimeoutThreads()
+
+
+class _Chain(object):
+    """
+    Bookkeeping shared by all tasks linked together with then(), so that the ends of the chain and whether anything
+    in it halted can be looked up without walking it.
+    """
+
+    __slots__ = ("head", "tail", "halted")
+
+    def __init__(self, task):
+        self.head = task
+        self.tail = task
+        # tasks in the chain that halt it - standalone tasks that halted and composites with a halted sub chain
+        self.halted = _NOTHING_HALTED
+
+    @property
+    def length(self):
+        # the indexes of the tasks of a chain are consecutive
+        return self.tail._chain_index - self.head._chain_index + 1
+
+    def join(self, other):
+        """
+        Join other after the end of this chain and return the merged chain. The tasks of the shorter chain are moved
+        over to the longer one, which keeps building a chain of n tasks at O(n log n) overall.
+        """
+        if self.length >= other.length:
+            index = self.tail._chain_index
+            task = other.head
+            while task:
+                index += 1
+                task._chain = self
+                task._chain_index = index
+                task = task._next
+
+            self.tail = other.tail
+            merged = self
+        else:
+            index = other.head._chain_index
+            task = self.tail
+            while task:
+                index -= 1
+                task._chain = other
+                task._chain_index = index
+                task = task._prev
+
+            other.head = self.head
+            merged = other
+
+        merged.halted = set(self.halted) | other.halted if self.halted or other.halted else _NOTHING_HALTED
+        return merged
+
+    def halts(self, index):
+        """
+        Whether a task of the chain up to the one at index halted it.
+        """
+        return bool(self.halted) and any(task._chain_index <= index for task in self.halted)
+
+
+class _ReleasedChain(object):
+    """
+    What Flow.release leaves of a _Chain. Its tasks must not refer to themselves or the tasks before them, so the ends
+    are only weakly referenced - the tail is kept alive by the tasks before it, the head is freed once no one uses it
+    and local_root is None then - and the tasks that halted the chain are kept by their index.
+    """
+
+    __slots__ = ("_head", "_tail", "_halted_indexes")
+
+    def __init__(self, chain):
+        self._head = weakref.ref(chain.head)
+        self._tail = weakref.ref(chain.tail)
+        self._halted_indexes = tuple(task._chain_index for task in chain.halted)
+
+    @property
+    def head(self):
+        return self._head()
+
+    @property
+    def tail(self):
+        return self._tail()
+
+    def halts(self, index):
+        return any(halted_index <= index for halted_index in self._halted_indexes)
 
 
 class BaseTask(object):
@@ -12,12 +155,38 @@ class BaseTask(object):
     STATUS_COMPLETE = "complete"
 
     is_standalone = True
+    # whether the result can be taken from a cache instead of running the task - see taskflow.caches
+    cacheable = False
+    # keys of the task record that do not change once the task is created, which delta checkpoints leave out
+    _unchanging_keys = ()
+    # number of tasks linked with then() after a completed task, which the frontier of a Scheduler may have passed
+    _links_after_complete = 0
+
+    __slots__ = (
+        "max_runs",
+        "_runs",
+        "_status_value",
+        "_result_value",
+        "_error",
+        "_exc_info",
+        "_id",
+        "_name",
+        "_needs_prev_result",
+        "_prev",
+        "_next",
+        "_parent",
+        "_chain",
+        "_chain_index",
+        "_dirty_tasks",
+        "_retry_at",
+        "__weakref__",
+    )
 
     def __init__(self, max_runs=None, needs_prev_result=True, name=None):
         self.max_runs = max_runs if max_runs is not None else Defaults.max_runs
         self._runs = 0
-        self._status = self.STATUS_PENDING
-        self._result = None
+        self._status_value = self.STATUS_PENDING
+        self._result_value = None
         self._error = None
         self._exc_info = None
         self._id = None
@@ -28,6 +197,40 @@ class BaseTask(object):
         self._next = None
         self._parent = None
 
+        self._chain = _Chain(self)
+        # position in the chain - only the order matters, the values are arbitrary
+        self._chain_index = 0
+        # the set of changed tasks of the flow tracking this task, if any
+        self._dirty_tasks = None
+        # the time.time() before which a task that failed is not run again
+        self._retry_at = None
+
+    @property
+    def _status(self):
+        return self._status_value
+
+    @_status.setter
+    def _status(self, status):
+        old_status = self._status_value
+        self._status_value = status
+
+        if self.is_standalone and status != old_status:
+            self._mark_dirty()
+            if (status == self.STATUS_HALTED) != (old_status == self.STATUS_HALTED):
+                self._set_halted(status == self.STATUS_HALTED)
+
+            self._leaf_changed(old_status)
+
+    @property
+    def _result(self):
+        return self._result_value
+
+    @_result.setter
+    def _result(self, result):
+        self._result_value = result
+        self._mark_dirty()
+        self._leaf_changed(self.status)
+
     @property
     def id(self):
         return self._id
@@ -54,8 +257,19 @@ class BaseTask(object):
 
     @property
     def result(self):
+        """
+        The result, or a taskflow.result_stores.ResultReference to it if the flow moved it to its result store - use
+        load_result for the value either way.
+        """
         return self._result
 
+    def load_result(self):
+        """
+        Return the result, loading it from the result store if it was kept there.
+        """
+        result = self.result
+        return result.load() if isinstance(result, ResultReference) else result
+
     @property
     def prev(self):
         return self._prev
@@ -73,46 +287,112 @@ class BaseTask(object):
         return self._runs
 
     @property
-    def local_root(self):
-        root = self
-        while root.prev:
-            root = root.prev
+    def retry_at(self):
+        return self._retry_at
+
+    def is_due(self, now=None):
+        """
+        Whether the task is not waiting to be retried at the time now - by default the current time.
+        """
+        return self._retry_at is None or self._retry_at <= (time.time() if now is None else now)
 
-        return root
+    @property
+    def local_root(self):
+        return self._chain.head
 
     @property
     def leaf(self):
-        leaf = self
-        while leaf.next:
-            leaf = leaf.next
+        return self._chain.tail
 
-        return leaf
+    @property
+    def is_dirty(self):
+        """
+        Whether the task changed since the last checkpoint of the flow tracking it.
+        """
+        return self._dirty_tasks is not None and self in self._dirty_tasks
+
+    def _mark_dirty(self):
+        if self._dirty_tasks is not None:
+            self._dirty_tasks.add(self)
 
     @property
     def is_halted(self):
-        if self.status == self.STATUS_HALTED:
-            return True
-
-        return self.prev.is_halted if self.prev else False
+        # halted if this task or anything before it in the chain halted
+        return self._chain.halts(self._chain_index)
+
+    def _set_halted(self, halted):
+        chain = self._chain
+        was_halted = bool(chain.halted)
+        if halted:
+            if not chain.halted:
+                chain.halted = set()
+            chain.halted.add(self)
+        elif self in chain.halted:
+            chain.halted.discard(self)
+
+        if was_halted != bool(chain.halted) and chain.head._parent:
+            chain.head._parent._sub_chain_halted_changed(not was_halted)
+
+    def _sub_chain_halted_changed(self, halted):
+        """
+        Called on the parent of a chain when the chain starts or stops being halted.
+        """
+        return None
+
+    def _leaf_changed(self, old_status):
+        """
+        Let the composite this task's chain belongs to know, if this task ends the chain and its status or result
+        changed.
+        """
+        chain = self._chain
+        if chain.tail is self and chain.head._parent:
+            chain.head._parent._sub_chain_changed(old_status, self.status)
+
+    def _sub_chain_changed(self, old_status, status):
+        """
+        Called on the parent of a chain when the status or the result at the end of the chain changed.
+        """
+        return None
 
     def set_ids(self, starting_id=1):
         current_id = starting_id
 
-        self._id = current_id
-        current_id += 1
-
-        if self._next:
-            current_id = self._next.set_ids(starting_id=current_id)
+        for task in self._walk():
+            task._id = current_id
+            current_id += 1
 
         return current_id
 
+    def _walk(self):
+        """
+        Yield this task, the tasks after it in the chain and all their sub tasks - sub tasks before their composite,
+        and a composite before what comes after it.
+        """
+        # (task, whether its sub tasks were already walked)
+        stack = [(self, False)]
+
+        while stack:
+            task, sub_tasks_walked = stack.pop()
+
+            if not task.is_standalone and not sub_tasks_walked:
+                stack.append((task, True))
+                sub_tasks = task.get_all_tasks()
+                for task_index in range(len(sub_tasks) - 1, -1, -1):
+                    stack.append((sub_tasks[task_index], False))
+                continue
+
+            yield task
+
+            if task._next:
+                stack.append((task._next, False))
+
     def run(self, **kwargs):
         raise NotImplementedError
 
     def _override_arguments(self, *args, **kwargs):
         if self._needs_prev_result:
             if self.prev:
-                prev_result = [self.prev.result]
+                prev_result = [self.prev.load_result()]
                 return list(args) + prev_result, kwargs
 
             if self._parent:
@@ -123,10 +403,32 @@ class BaseTask(object):
     def get_all_tasks(self):
         return [self]
 
+    def _get_batch_function(self):
+        """
+        Return the taskflow.batching.BatchFunction that the flow can run this task with, together with other tasks
+        of its function, or None if the task runs on its own.
+        """
+        return None
+
+    def _unlink(self, released_chains):
+        """
+        Drop the links back to earlier tasks, which are what makes the task graph cyclic. The links forward - next and
+        sub tasks - are kept, and the chain bookkeeping is replaced by a _ReleasedChain, shared by the tasks of the
+        chain through the dict released_chains.
+        """
+        self._prev = None
+        self._parent = None
+        chain = self._chain
+        if chain not in released_chains:
+            released_chains[chain] = _ReleasedChain(chain)
+        self._chain = released_chains[chain]
+        self._dirty_tasks = None
+
     @classmethod
     def find_root(cls, task):
-        while task.prev or task.parent:
-            task = task.prev or task.parent
+        task = task.local_root
+        while task.parent:
+            task = task.parent.local_root
         return task
 
     def then(self, task):
@@ -135,13 +437,27 @@ class BaseTask(object):
                 "Unsupported operation. Multiple then operations are not support. Use a CompositeTask instead."
             )
 
+        if self.status == self.STATUS_COMPLETE:
+            BaseTask._links_after_complete += 1
+        return self._link(task)
+
+    def _link(self, task):
         task = task.local_root
         self._next = task
         task._prev = self
-        return task.leaf
+
+        old_status = self.status
+        was_halted = bool(self._chain.halted)
+        chain = self._chain.join(task._chain)
+        if chain.head._parent:
+            if was_halted != bool(chain.halted):
+                chain.head._parent._sub_chain_halted_changed(not was_halted)
+            chain.head._parent._sub_chain_changed(old_status, chain.tail.status)
+
+        return chain.tail
 
     def _get_task_data(self):
-        return {
+        result = {
             "class": type_to_string(type(self)),
             "max_runs": self.max_runs,
             "id": self._id,
@@ -149,24 +465,41 @@ class BaseTask(object):
             "needs_prev_result": self._needs_prev_result,
             "runs": self._runs,
             "status": self._status,
-            "result": self._result,
+            "result": self._result.to_data() if isinstance(self._result, ResultReference) else self._result,
             "is_standalone": self.is_standalone,
         }
+        if self._retry_at is not None:
+            # only recorded while the task waits to be retried
+            result["retry_at"] = self._retry_at
 
-    def to_list(self):
-        result = [self._get_task_data()]
-        result[0].update(
-            {
-                "prev": self._prev.id if self._prev else None,
-                "next": self._next.id if self._next else None,
-            }
-        )
+        return result
 
-        if self._next:
-            result.extend(self._next.to_list())
+    def _get_links_data(self):
+        return {
+            "prev": self._prev.id if self._prev else None,
+            "next": self._next.id if self._next else None,
+        }
+
+    def to_list(self):
+        result = []
+        for task in self._walk():
+            task_data = task._get_task_data()
+            task_data.update(task._get_links_data())
+            result.append(task_data)
 
         return result
 
+    def _apply_data(self, task_data, result):
+        """
+        Bring the state of the task up to date with a record from a delta checkpoint - see Flow.apply_delta. result
+        is the result of the record, with references to a result store restored.
+        """
+        self.max_runs = task_data["max_runs"]
+        self._runs = task_data["runs"]
+        self._status = task_data["status"]
+        self._result = result
+        self._retry_at = task_data.get("retry_at")
+
     @classmethod
     def from_data(cls, task_data):
         result = cls()
@@ -178,9 +511,11 @@ class BaseTask(object):
         result._id = task_data["id"]
         result._name = task_data["name"]
         result._needs_prev_result = task_data["needs_prev_result"]
+        result._retry_at = task_data.get("retry_at")
 
         if task_data["prev"]:
-            task_data["prev"].then(result)
+            # no scheduler has seen the task yet
+            task_data["prev"]._link(result)
 
         return result
 
@@ -189,12 +524,38 @@ class BaseTask(object):
 
 
 class Task(BaseTask):
-    def __init__(self, func=None, args=None, max_runs=None, needs_prev_result=True, name=None):
+    __slots__ = (
+        "backoff",
+        "timeout",
+        "_func",
+        "_args",
+        "_execution_start_time",
+        "_execution_delta_time",
+        "_cacheable",
+    )
+
+    def __init__(
+        self,
+        func=None,
+        args=None,
+        max_runs=None,
+        needs_prev_result=True,
+        name=None,
+        cacheable=False,
+        backoff=None,
+        timeout=None,
+    ):
         super().__init__(max_runs=max_runs, needs_prev_result=needs_prev_result, name=name)
+        # see taskflow.retries.Backoff
+        self.backoff = backoff if backoff is not None else Defaults.backoff
+        # seconds a run may take before it counts as failed
+        self.timeout = timeout if timeout is not None else Defaults.timeout
         self._func = func
         self._args = args or []
         self._execution_start_time = None
         self._execution_delta_time = None
+        # turned on for functions without side effects, whose result only depends on their arguments
+        self._cacheable = cacheable
 
     @property
     def func_name(self):
@@ -208,40 +569,196 @@ class Task(BaseTask):
     def execution_delta_time(self):
         return self._execution_delta_time
 
+    @property
+    def cacheable(self):
+        return self._cacheable
+
     def run(self, **kwargs):
+        args, kwargs = self._start(**kwargs)
+        self._finish(*self._execute_in_time(args, kwargs))
+
+        if self._status == self.STATUS_COMPLETE:
+            return self._result
+
+    def _start(self, **kwargs):
+        """
+        Mark the task as running and return the arguments to call its function with.
+        """
         # overriding args with the prev result
         # use kwargs for persistent parameters to all Tasks
         self._status = self.STATUS_RUNNING
+        self._retry_at = None
         args, kwargs = self._override_arguments(*self._args, **kwargs)
 
         self._runs += 1
+        self._mark_dirty()
+        return args, kwargs
+
+    def _execute(self, args, kwargs, token=None, on_start=None):
+        """
+        Call the function without changing the task, so that it can be done on another thread. The function gets
+        token from taskflow.cancellation.current_token. on_start is called without arguments right before it.
+        Returns the outcome of the call - see taskflow.outcomes.
+        """
+        if on_start is not None:
+            on_start()
+        token_reset = _current_token.set(token) if token is not None else None
+        try:
+            return call_timed(self._call, args, kwargs)
+        finally:
+            if token_reset is not None:
+                _current_token.reset(token_reset)
+
+    def _call(self, args, kwargs):
+        return self._func(*args, **kwargs)
+
+    def _get_batch_function(self):
+        # tasks with a timeout run on their own, as a batch call cannot be given up on for one of them
+        if self._func is None or self.timeout is not None:
+            return None
+
+        return get_batch_function(self._func)
+
+    def _execute_in_time(self, args, kwargs, token=None):
+        """
+        Same as _execute, but gives up on the call once it takes longer than timeout. The call runs on a thread of its
+        own and is left running there with its token cancelled - see taskflow.cancellation.abandoned_calls.
+        """
+        if self.timeout is None:
+            return self._execute(args, kwargs, token)
+
+        started = start_clock()
+        token = CancelToken(token)
+        future = _timeout_threads.submit(self._execute, args, kwargs, token)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            token.cancel()
+            _abandon(future)
+            return self._get_timeout_outcome(started)
+        finally:
+            token.close()
+
+    def _to_thread(self, args, kwargs, token):
+        """
+        Return an awaitable of _execute called in a thread - one of its own when the task has a timeout, so that the
+        time does not run out while the call waits for a thread of the loop.
+        """
+        if self.timeout is None:
+            return asyncio.to_thread(self._execute, args, kwargs, token)
+
+        return asyncio.wrap_future(_timeout_threads.submit(self._execute, args, kwargs, token))
+
+    async def _execute_async(self, args, kwargs, token=None):
+        """
+        Same as _execute, but awaits coroutine functions and calls other functions in a thread, giving up on them once
+        they take longer than timeout. A coroutine is cancelled then - a thread is left running, with its token
+        cancelled.
+        """
+        started = start_clock()
+        token = CancelToken(token)
+        token_reset = _current_token.set(token)
         try:
-            self._execution_start_time = datetime.now()
-            self._result = self._func(*args, **kwargs)
+            if not inspect.iscoroutinefunction(self._func):
+                return await asyncio.wait_for(self._to_thread(args, kwargs, token), self.timeout)
+
+            return make_outcome(await asyncio.wait_for(self._func(*args, **kwargs), self.timeout), None, started)
+        except asyncio.TimeoutError:
+            token.cancel()
+            return self._get_timeout_outcome(started)
+        except Exception:
+            return make_outcome(None, sys.exc_info(), started)
+        finally:
+            _current_token.reset(token_reset)
+            token.close()
+
+    def _submit(self, executor, args, kwargs, token=None, on_start=None):
+        """
+        Submit _execute to executor. Worker processes cannot share the task, so they get the function by its path -
+        and no token, and on_start is not called for them.
+        """
+        if isinstance(executor, ProcessPoolExecutor):
+            return executor.submit(call_function, self.func_name, args, kwargs)
+
+        return executor.submit(self._execute, args, kwargs, token, on_start)
+
+    def _get_timeout_outcome(self, started):
+        """
+        Return the outcome of a run started at started - see taskflow.outcomes.start_clock - that took longer than
+        timeout.
+        """
+        try:
+            raise TimeoutError(f"Task {self} did not finish within {self.timeout} seconds")
+        except TimeoutError:
+            return make_outcome(None, sys.exc_info(), started)
+
+    def _finish_from_cache(self, result):
+        """
+        Complete the task, just started, with a result taken from a cache, which does not count as a run.
+        """
+        self._runs -= 1
+        self._finish(*make_outcome(result, None, start_clock(), 0.0))
+
+    def _finish(self, result, exc_info, start_time, delta_time):
+        """
+        Record the outcome of _execute on the task.
+        """
+        self._execution_start_time = start_time
+        self._execution_delta_time = delta_time
+
+        if exc_info is None:
+            self._result = result
             self._status = self.STATUS_COMPLETE
             self._error = None
-            return self._result
-        except Exception as ex:
+        else:
+            if self._runs < self.max_runs and self.backoff is not None:
+                self._retry_at = time.time() + self.backoff.get_delay(self._runs)
             self._status = self.STATUS_HALTED if self._runs >= self.max_runs else self.STATUS_PENDING
-            self._error = ex
-            self._exc_info = sys.exc_info()
-        finally:
-            self._execution_delta_time = (datetime.now() - self._execution_start_time).total_seconds()
+            self._error = exc_info[1]
+            self._exc_info = exc_info
+
+        self._mark_dirty()
 
     def __str__(self):
         return self._name if self._name else f"{function_to_string(self._func)}:{self._args}"
 
     def _get_task_data(self):
         result = super()._get_task_data()
-        result.update({"func": function_to_string(self._func), "args": self._args})
+        result.update(
+            {
+                "func": function_to_string(self._func),
+                "args": self._args,
+            }
+        )
+        if self._execution_delta_time is not None:
+            # only recorded once the task ran, so that the records of tasks that did not are as before
+            result["execution_delta_time"] = self._execution_delta_time
+        if self._cacheable:
+            # only recorded when turned on, which is the exception
+            result["cacheable"] = True
+        if self.backoff is not None:
+            result["backoff"] = self.backoff.to_data()
+        if self.timeout is not None:
+            result["timeout"] = self.timeout
 
         return result
 
+    def _apply_data(self, task_data, result):
+        super()._apply_data(task_data, result)
+        if "execution_delta_time" in task_data:
+            self._execution_delta_time = task_data["execution_delta_time"]
+
     @classmethod
     def from_data(cls, task_data):
         result = super().from_data(task_data)
         result._func = function_from_string(task_data["func"])
         result._args = task_data["args"]
+        # not in records written by older versions
+        result._execution_delta_time = task_data.get("execution_delta_time")
+        result._cacheable = task_data.get("cacheable", False)
+        backoff = task_data.get("backoff")
+        result.backoff = Backoff.from_data(backoff) if backoff is not None else None
+        result.timeout = task_data.get("timeout")
         return result
 
     @classmethod
@@ -252,14 +769,51 @@ class Task(BaseTask):
 class CompositeTask(BaseTask):
     is_standalone = False
 
+    __slots__ = ("_sub_tasks", "_halted_sub_chains", "_leaf_statuses", "_result_cache")
+
     def __init__(self, *sub_tasks, needs_prev_result=True, name=None):
         super().__init__(needs_prev_result=needs_prev_result, name=name)
+        self._sub_tasks = []
+        self._halted_sub_chains = 0
+        # statuses of the last tasks of the sub chains
+        self._leaf_statuses = Counter()
+        self._result_cache = None
+        self._set_sub_tasks(sub_tasks)
+
+        # not a standalone task, so only the calculated property makes sense
+        self._status = None
+
+    def _set_sub_tasks(self, sub_tasks):
+        # read before the sub tasks change, as it is worked out from them
+        old_status = self.status
         self._sub_tasks = [sub_task.local_root for sub_task in sub_tasks or []]
         for sub_task in self._sub_tasks:
             sub_task._parent = self
 
-        # not a standalone task, so only the calculated property makes sense
-        self._status = None
+        self._leaf_statuses = Counter(sub_task.leaf.status for sub_task in self._sub_tasks)
+        self._result_cache = None
+
+        was_halted = self._halted_sub_chains > 0
+        self._halted_sub_chains = sum(1 for sub_task in self._sub_tasks if sub_task._chain.halted)
+        if was_halted != (self._halted_sub_chains > 0):
+            self._set_halted(not was_halted)
+
+        self._leaf_changed(old_status)
+
+    def _sub_chain_halted_changed(self, halted):
+        was_halted = self._halted_sub_chains > 0
+        self._halted_sub_chains += 1 if halted else -1
+        if was_halted != (self._halted_sub_chains > 0):
+            self._set_halted(not was_halted)
+
+    def _sub_chain_changed(self, old_status, status):
+        old_own_status = self.status
+        self._leaf_statuses[old_status] -= 1
+        self._leaf_statuses[status] += 1
+        self._result_cache = None
+
+        # the result of the composite changed as well, and possibly its status
+        self._leaf_changed(old_own_status)
 
     def sub_tasks_to_list(self):
         result = []
@@ -270,30 +824,27 @@ class CompositeTask(BaseTask):
 
     @property
     def status(self):
-        if any(sub_task.leaf.status == self.STATUS_HALTED for sub_task in self._sub_tasks):
+        if self._leaf_statuses[self.STATUS_HALTED]:
             return self.STATUS_HALTED
-        elif all(sub_task.leaf.status == self.STATUS_COMPLETE for sub_task in self._sub_tasks):
+        elif self._leaf_statuses[self.STATUS_COMPLETE] == len(self._sub_tasks):
             return self.STATUS_COMPLETE
         return self.STATUS_PENDING
 
-    @property
-    def is_halted(self):
-        if any(sub_task.leaf.is_halted for sub_task in self._sub_tasks):
-            return True
-
-        return super().is_halted
-
     @property
     def result(self):
-        return [sub_task.leaf.result for sub_task in self._sub_tasks]
+        """
+        The results of the sub chains, which are references for those moved to a result store, as for
+        BaseTask.result - use load_result for the values.
+        """
+        # collected once and kept as a tuple until a sub chain changes - every caller gets a list of its own
+        if self._result_cache is None:
+            self._result_cache = tuple(sub_task.leaf.result for sub_task in self._sub_tasks)
 
-    def set_ids(self, starting_id=1):
-        current_id = starting_id
-
-        for index, sub_task in enumerate(self._sub_tasks):
-            current_id = sub_task.set_ids(starting_id=current_id)
+        return list(self._result_cache)
 
-        return super().set_ids(starting_id=current_id)
+    def load_result(self):
+        # not cached, so that loaded results are not kept
+        return [sub_task.leaf.load_result() for sub_task in self._sub_tasks]
 
     def get_all_tasks(self):
         return self._sub_tasks[:]
@@ -301,19 +852,290 @@ class CompositeTask(BaseTask):
     def run(self, **kwargs):
         raise RuntimeError("Composite tasks cannot be run directly")
 
-    def to_list(self):
-        sub_tasks_result = self.sub_tasks_to_list()
+    def _get_links_data(self):
+        result = super()._get_links_data()
+        result["sub_tasks"] = [sub_task.id for sub_task in self._sub_tasks]
+        return result
+
+    @classmethod
+    def from_data(cls, task_data):
+        result = super().from_data(task_data)
+        result._set_sub_tasks(task_data["sub_tasks"])
+        return result
+
+
+class MapTask(Task):
+    """
+    Maps func over the items of iterable as a single task, instead of one task per item under a CompositeTask. Each
+    item is called as func(item, *args, **kwargs), and the result is the list of the results in item order - what
+    the next task gets, as with CompositeTask.result.
+
+    The items run in chunks of chunk_size, and the task only keeps, per chunk, its results once it is done and how
+    many runs it had. A chunk that fails does not stop the others, and only the chunks that are not done run again.
+    max_runs applies to each chunk - the task halts once a chunk failed that many times. A function with a batch
+    version is called once per chunk - see taskflow.batching. Results are not cached.
+
+        MapTask(resize, paths, chunk_size=500).then(Task(upload))
+    """
+
+    __slots__ = ("_items", "_chunk_size", "_chunk_runs", "_chunk_results")
+
+    _unchanging_keys = ("items",)
+
+    def __init__(
+        self,
+        func=None,
+        iterable=None,
+        chunk_size=None,
+        args=None,
+        max_runs=None,
+        needs_prev_result=True,
+        name=None,
+        backoff=None,
+        timeout=None,
+    ):
+        super().__init__(
+            func=func,
+            args=args,
+            max_runs=max_runs,
+            needs_prev_result=needs_prev_result,
+            name=name,
+            cacheable=False,
+            backoff=backoff,
+            timeout=timeout,
+        )
+        self._items = list(iterable or [])
+        self._chunk_size = chunk_size or Defaults.chunk_size
+        self._set_chunks()
+
+    def _set_chunks(self):
+        count = -(-len(self._items) // self._chunk_size)
+        self._chunk_runs = array("I", [0]) * count
+        # the results of each chunk, None until it is done - dropped once the task completes
+        self._chunk_results = [None] * count
+
+    @property
+    def items(self):
+        return self._items
+
+    @property
+    def chunk_size(self):
+        return self._chunk_size
+
+    @property
+    def chunk_count(self):
+        return len(self._chunk_runs)
+
+    @property
+    def chunk_runs(self):
+        return self._chunk_runs.tolist()
 
-        base_list = super().to_list()
-        base_list[0].update({"sub_tasks": [sub_task.id for sub_task in self._sub_tasks]})
+    @property
+    def done_chunks(self):
+        if self._chunk_results is None:
+            return self.chunk_count
+        return sum(1 for results in self._chunk_results if results is not None)
+
+    def _get_batch_function(self):
+        # the batch version is called for each chunk instead
+        return None
+
+    def _get_pending_chunks(self):
+        size = self._chunk_size
+        return [
+            (index, self._items[index * size:(index + 1) * size])
+            for index, results in enumerate(self._chunk_results or ())
+            if results is None
+        ]
+
+    def _execute(self, args, kwargs, token=None, on_start=None):
+        if on_start is not None:
+            on_start()
+        token_reset = _current_token.set(token) if token is not None else None
+        try:
+            return run_chunks(self._func, self._get_pending_chunks(), args, kwargs)
+        finally:
+            if token_reset is not None:
+                _current_token.reset(token_reset)
 
-        return sub_tasks_result + base_list
+    async def _execute_async(self, args, kwargs, token=None):
+        # chunks always run in a thread
+        started = start_clock()
+        token = CancelToken(token)
+        try:
+            return await asyncio.wait_for(self._to_thread(args, kwargs, token), self.timeout)
+        except asyncio.TimeoutError:
+            token.cancel()
+            return self._get_timeout_outcome(started)
+        finally:
+            token.close()
+
+    def _submit(self, executor, args, kwargs, token=None, on_start=None):
+        if isinstance(executor, ProcessPoolExecutor):
+            return executor.submit(call_chunks, self.func_name, self._get_pending_chunks(), args, kwargs)
+
+        return executor.submit(self._execute, args, kwargs, token, on_start)
+
+    def _finish(self, result, exc_info, start_time, delta_time):
+        """
+        Record the outcome of _execute - the outcome of each chunk that ran - on the task. A run that timed out
+        counts as a failed run of every chunk that was not done.
+        """
+        if result is None:
+            result = [(index, None, exc_info) for index, _ in self._get_pending_chunks()]
+
+        failed_runs = 0
+        for index, results, _ in result:
+            self._chunk_runs[index] += 1
+            if results is None:
+                failed_runs = max(failed_runs, self._chunk_runs[index])
+            else:
+                self._chunk_results[index] = results
+
+        self._execution_start_time = start_time
+        self._execution_delta_time = delta_time
+
+        if exc_info is None and self.done_chunks == self.chunk_count:
+            self._result = [item_result for results in self._chunk_results for item_result in results]
+            self._chunk_results = None
+            self._status = self.STATUS_COMPLETE
+            self._error = None
+        else:
+            halted = failed_runs >= self.max_runs
+            if not halted and self.backoff is not None:
+                self._retry_at = time.time() + self.backoff.get_delay(max(failed_runs, 1))
+            self._status = self.STATUS_HALTED if halted else self.STATUS_PENDING
+            self._error = exc_info[1]
+            self._exc_info = exc_info
+
+        self._mark_dirty()
+
+    def __str__(self):
+        return self._name if self._name else f"{function_to_string(self._func)}:map({len(self._items)})"
+
+    def _get_task_data(self):
+        result = super()._get_task_data()
+        result.update({"items": self._items, "chunk_size": self._chunk_size, "chunk_runs": self._chunk_runs.tolist()})
+        if self._chunk_results is not None and any(results is not None for results in self._chunk_results):
+            # only recorded while some chunks are done and others are not
+            result["chunk_results"] = self._chunk_results
+
+        return result
+
+    def _apply_data(self, task_data, result):
+        super()._apply_data(task_data, result)
+        self._set_chunk_data(task_data)
+
+    def _set_chunk_data(self, task_data):
+        self._chunk_runs = array("I", task_data["chunk_runs"])
+        if self._status == self.STATUS_COMPLETE:
+            self._chunk_results = None
+        else:
+            self._chunk_results = list(task_data.get("chunk_results") or [None] * len(self._chunk_runs))
 
     @classmethod
     def from_data(cls, task_data):
         result = super().from_data(task_data)
-        result._sub_tasks = [sub_task.local_root for sub_task in task_data["sub_tasks"] or []]
-        for sub_task in result._sub_tasks:
-            sub_task._parent = result
+        result._items = task_data["items"]
+        result._chunk_size = task_data["chunk_size"]
+        result._set_chunk_data(task_data)
+        return result
 
+
+class StreamTask(Task):
+    """
+    Runs func - a generator function called with the arguments of the task - and stages as a pipeline, each stage
+    getting an iterator over the items of the one before it, instead of chaining tasks that each build their whole
+    result before the next one starts. The stages run at the same time, on threads or with processes=True on
+    processes, with at most queue_size items held between two of them. The result of the task is the return value of
+    the last stage, or the list of items of func if there are no stages - see taskflow.streaming.
+
+        StreamTask(read_rows, parse, write, args=(path,), queue_size=1000)
+
+    The items are not recorded, so a failed run starts the pipeline over. Results are not cached. Run on a
+    ProcessPoolExecutor, the stages run on threads of the worker process.
+    """
+
+    __slots__ = ("_stages", "_queue_size", "_processes")
+
+    def __init__(
+        self,
+        func=None,
+        *stages,
+        args=None,
+        queue_size=None,
+        processes=False,
+        max_runs=None,
+        needs_prev_result=True,
+        name=None,
+        backoff=None,
+        timeout=None,
+    ):
+        super().__init__(
+            func=func,
+            args=args,
+            max_runs=max_runs,
+            needs_prev_result=needs_prev_result,
+            name=name,
+            cacheable=False,
+            backoff=backoff,
+            timeout=timeout,
+        )
+        self._stages = stages
+        self._queue_size = queue_size or Defaults.queue_size
+        self._processes = processes
+
+    @property
+    def stages(self):
+        return self._stages
+
+    @property
+    def queue_size(self):
+        return self._queue_size
+
+    @property
+    def processes(self):
+        return self._processes
+
+    def _get_batch_function(self):
+        # func is not called once per task
+        return None
+
+    def _call(self, args, kwargs):
+        return run_pipeline(self._func, self._stages, args, kwargs, self._queue_size, self._processes)
+
+    def _submit(self, executor, args, kwargs, token=None, on_start=None):
+        if isinstance(executor, ProcessPoolExecutor):
+            # worker processes cannot start processes of their own
+            stage_paths = [function_to_string(stage) for stage in self._stages]
+            return executor.submit(
+                call_function,
+                function_to_string(run_pipeline),
+                (self.func_name, stage_paths, args, kwargs, self._queue_size),
+                {},
+            )
+
+        return executor.submit(self._execute, args, kwargs, token, on_start)
+
+    def __str__(self):
+        if self._name:
+            return self._name
+        return " | ".join(function_to_string(func) for func in (self._func,) + self._stages)
+
+    def _get_task_data(self):
+        result = super()._get_task_data()
+        result.update(
+            {"stages": [function_to_string(stage) for stage in self._stages], "queue_size": self._queue_size}
+        )
+        if self._processes:
+            result["processes"] = True
+
+        return result
+
+    @classmethod
+    def from_data(cls, task_data):
+        result = super().from_data(task_data)
+        result._stages = tuple(function_from_string(stage) for stage in task_data["stages"])
+        result._queue_size = task_data["queue_size"]
+        result._processes = task_data.get("processes", False)
         return result
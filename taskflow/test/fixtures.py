@@ -10,3 +10,18 @@ class InheritedHandlers(Handlers):
 
 def handler(*args, **kwargs):
     return args
+
+
+def fail(*args, **kwargs):
+    raise ValueError("Boom")
+
+
+async def async_handler(*args, **kwargs):
+    return args
+
+
+def without_execution_times(task_list):
+    # execution times differ between two runs of the same flow
+    return [
+        {key: value for key, value in task_data.items() if key != "execution_delta_time"} for task_data in task_list
+    ]
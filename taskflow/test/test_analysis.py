@@ -0,0 +1,83 @@
+import pytest
+
+from taskflow.analysis import analyze, critical_path, format_report
+from taskflow.flow import Flow
+from taskflow.tasks import CompositeTask, Task
+
+from .fixtures import handler
+
+
+def _make_flow():
+    # 1 -> (2 -> 3 | 4) -> 6
+    root = Task(handler)
+    root.then(CompositeTask(Task(handler).then(Task(handler)), Task(handler))).then(Task(handler))
+    flow = Flow(root)
+    flow.run()
+
+    durations = {1: 1.0, 2: 2.0, 3: 3.0, 4: 4.0, 6: 0.5}
+    for task_id, duration in durations.items():
+        flow.get_task(task_id)._execution_delta_time = duration
+
+    return flow
+
+
+class TestAnalysis(object):
+    def test_analyze(self):
+        report = analyze(_make_flow().to_list())
+
+        assert report["work"] == 10.5
+        assert report["span"] == 6.5
+        assert report["parallelism"] == pytest.approx(10.5 / 6.5)
+        assert report["critical_path"] == [1, 2, 3, 6]
+
+        tasks = {task["id"]: task for task in report["tasks"]}
+        assert [task["id"] for task in report["tasks"]] == [1, 2, 3, 4, 5, 6]
+        assert (tasks[4]["earliest_start"], tasks[4]["earliest_finish"], tasks[4]["slack"]) == (1.0, 5.0, 1.0)
+        assert (tasks[5]["earliest_start"], tasks[5]["earliest_finish"]) == (1.0, 6.0)
+        assert tasks[5]["duration"] == 5.0
+        assert not tasks[5]["is_standalone"]
+        assert all(tasks[task_id]["slack"] == 0 for task_id in [1, 2, 3, 5, 6])
+
+    def test_nested(self):
+        root = CompositeTask(CompositeTask(Task(handler), Task(handler)), Task(handler))
+        flow = Flow(root)
+        flow.run()
+        flow.get_task(1)._execution_delta_time = 1.0
+        flow.get_task(2)._execution_delta_time = 3.0
+        flow.get_task(4)._execution_delta_time = 2.0
+
+        assert critical_path(flow.to_list()) == [2]
+        assert [task.id for task in flow.critical_path()] == [2]
+
+    def test_not_run(self):
+        flow = Flow(Task(handler).then(Task(handler)))
+        report = flow.critical_path_report()
+
+        assert (report["work"], report["span"], report["parallelism"]) == (0, 0, None)
+        assert report["critical_path"] == [1, 2]
+
+    def test_rehydrated(self):
+        flow = _make_flow()
+
+        assert Flow.from_list(flow.to_list()).critical_path_report() == flow.critical_path_report()
+        assert Flow.from_bytes(flow.to_bytes()).critical_path_report() == flow.critical_path_report()
+
+    def test_lazy(self):
+        flow = _make_flow()
+        lazy = Flow.from_list(flow.to_list(), lazy=True)
+
+        assert lazy.critical_path_report() == flow.critical_path_report()
+        assert [task.id for task in lazy.critical_path()] == [1, 2, 3, 6]
+
+    def test_invalid(self):
+        task_list = _make_flow().to_list()
+
+        with pytest.raises(ValueError):
+            analyze(task_list[1:])
+
+    def test_format_report(self):
+        text = format_report(_make_flow().critical_path_report())
+
+        assert "span: 6.500000s" in text
+        assert "critical path: 1 -> 2 -> 3 -> 6" in text
+        assert len(text.splitlines()) == 3 + 6
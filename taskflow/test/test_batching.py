@@ -0,0 +1,170 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from taskflow.batching import batched, execute_batch, get_batch_function
+from taskflow.benchmarks.generators import batched_fan_out
+from taskflow.flow import Flow
+from taskflow.tasks import BaseTask, CompositeTask, MapTask, StreamTask, Task
+
+# the argument lists of every batch call and the arguments of every single call, in order
+BATCHES = []
+SINGLES = []
+
+
+def square_all(args_list, offset=0):
+    BATCHES.append([args[0] for args in args_list])
+    if any(args[0] < 0 for args in args_list):
+        raise ValueError("Negative value")
+    return [args[0] * args[0] + offset for args in args_list]
+
+
+@batched(square_all)
+def square(value, offset=0):
+    SINGLES.append(value)
+    if value < 0:
+        raise ValueError("Negative value")
+    return value * value + offset
+
+
+def cube_all(args_list):
+    BATCHES.append([args[0] for args in args_list])
+    return [args[0] ** 3 for args in args_list]
+
+
+@batched(cube_all, max_size=2)
+def cube(value):
+    return value**3
+
+
+def add_one(value):
+    return value + 1
+
+
+@pytest.fixture(autouse=True)
+def _clear_calls():
+    BATCHES.clear()
+    SINGLES.clear()
+
+
+def _make_flow(values, func=square, **task_kwargs):
+    return Flow(CompositeTask(*[Task(func, args=(value,), **task_kwargs) for value in values]))
+
+
+class TestBatched(object):
+    def test_get_batch_function(self):
+        assert get_batch_function(square).func is square_all
+        assert get_batch_function(cube).max_size == 2
+        assert get_batch_function(add_one) is None
+
+    def test_execute_batch(self):
+        outcomes = execute_batch(square_all, square, [(2,), (3,)], {"offset": 1})
+
+        assert [outcome[0] for outcome in outcomes] == [5, 10]
+        assert all(outcome[1] is None for outcome in outcomes)
+        assert SINGLES == []
+
+    def test_execute_batch_fallback(self):
+        outcomes = execute_batch(square_all, square, [(2,), (-1,)], {})
+
+        assert outcomes[0][0] == 4
+        assert outcomes[1][1][0] is ValueError
+        assert SINGLES == [2, -1]
+
+    def test_execute_batch_wrong_length(self):
+        outcomes = execute_batch(lambda args_list: [1], square, [(2,), (3,)], {})
+
+        assert [outcome[0] for outcome in outcomes] == [4, 9]
+        assert SINGLES == [2, 3]
+
+
+class TestFlowBatching(object):
+    def test_run(self):
+        flow = _make_flow([1, 2, 3])
+
+        assert flow.run() == [1, 4, 9]
+        assert BATCHES == [[1, 2, 3]]
+        assert SINGLES == []
+        assert all(task.runs == 1 for task in flow.root_task.get_all_tasks())
+
+    def test_flow_kwargs(self):
+        assert _make_flow([1, 2]).run(offset=10) == [11, 14]
+        assert len(BATCHES) == 1
+
+    def test_following_tasks(self):
+        chains = [Task(square, args=(value,)) for value in range(3)]
+        for chain in chains:
+            chain.then(Task(add_one, needs_prev_result=True))
+
+        assert Flow(CompositeTask(*chains)).run() == [1, 2, 5]
+        assert BATCHES == [[0, 1, 2]]
+
+    def test_max_size(self):
+        assert _make_flow([1, 2, 3, 4, 5], func=cube).run() == [1, 8, 27, 64, 125]
+        assert BATCHES == [[1, 2], [3, 4]]
+
+    def test_single_task(self):
+        assert Flow(Task(square, args=(3,))).run() == 9
+        assert BATCHES == []
+        assert SINGLES == [3]
+
+    def test_fallback(self):
+        flow = _make_flow([2, -1, 3], max_runs=2)
+        flow.run()
+
+        tasks = flow.root_task.get_all_tasks()
+        assert [task.result for task in tasks] == [4, None, 9]
+        assert tasks[1].status == BaseTask.STATUS_HALTED
+        assert tasks[1].runs == 2
+        assert tasks[0].runs == 1
+        assert flow.is_halted
+
+    def test_timeout_not_batched(self):
+        assert _make_flow([1, 2], timeout=5).run() == [1, 4]
+        assert BATCHES == []
+        assert SINGLES == [1, 2]
+
+    def test_run_thread_executor(self):
+        flow = _make_flow([1, 2, 3])
+
+        with ThreadPoolExecutor(2) as executor:
+            assert flow.run(executor=executor) == [1, 4, 9]
+        assert BATCHES == [[1, 2, 3]]
+
+    def test_run_process_executor(self):
+        flow = _make_flow([1, 2, -3], func=cube, max_runs=1)
+
+        with ProcessPoolExecutor(2) as executor:
+            flow.run(executor=executor)
+        assert [task.result for task in flow.root_task.get_all_tasks()] == [1, 8, -27]
+
+    def test_arun(self):
+        flow = _make_flow([1, 2, 3])
+
+        assert asyncio.run(flow.arun()) == [1, 4, 9]
+        assert BATCHES == [[1, 2, 3]]
+
+    def test_arun_max_size(self):
+        assert asyncio.run(_make_flow([1, 2, 3], func=cube).arun()) == [1, 8, 27]
+        assert BATCHES == [[1, 2]]
+
+    def test_no_batching_for_special_tasks(self):
+        assert MapTask(square, [1])._get_batch_function() is None
+        assert StreamTask(square)._get_batch_function() is None
+        assert Task(square)._get_batch_function().func is square_all
+
+    @pytest.mark.parametrize("mode", ["run", "arun"])
+    def test_scales_linearly(self, mode, mocker):
+        # the tasks looked at to make up the batches, for a flow of size tasks
+        def looked_at(size):
+            spy = mocker.spy(Flow, "_fits_batch")
+            flow = Flow(batched_fan_out(size))
+            if mode == "run":
+                flow.run()
+            else:
+                asyncio.run(flow.arun())
+            mocker.stop(spy)
+            return spy.call_count
+
+        assert looked_at(4000) <= 5 * looked_at(1000)
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from taskflow.benchmarks import flows
+from taskflow.benchmarks.generators import GENERATORS, nested, random_graph
+from taskflow.flow import Flow
+
+
+class TestGenerators(object):
+    @pytest.mark.parametrize("shape", ["chain", "nested", "random_graph"])
+    def test_size(self, shape):
+        for size in (1, 2, 3, 50, 500):
+            assert len(Flow(GENERATORS[shape](size)).to_list()) == size
+
+    def test_nested(self):
+        flow = Flow(nested(16 + 4 + 1, width=4))
+
+        assert len(flow.to_list()) == 16 + 4 + 1
+        assert len(flow.root_task.get_all_tasks()) == 4
+        assert flow.root_task.next is None
+
+        # one more than fits in the tree is chained after it
+        assert Flow(nested(16 + 4 + 2, width=4)).root_task.next is not None
+
+    def test_random_graph_seed(self):
+        assert Flow(random_graph(200, seed=1)).to_list() == Flow(random_graph(200, seed=1)).to_list()
+        assert Flow(random_graph(200, seed=1)).to_list() != Flow(random_graph(200, seed=2)).to_list()
+
+    @pytest.mark.parametrize("shape", sorted(GENERATORS))
+    def test_runs(self, shape):
+        flow = Flow(GENERATORS[shape](300))
+        flow.run()
+
+        assert flow.is_complete
+
+
+class TestFlows(object):
+    def test_main(self, capsys):
+        flows.main(["--size", "50", "--shape", "chain", "--shape", "nested", "--repeat", "2"])
+        output = json.loads(capsys.readouterr().out)
+
+        assert [result["shape"] for result in output["results"]] == ["chain", "nested"]
+        assert output["results"][0]["tasks"] == 50
+        assert all(result["run_seconds"] > 0 and result["peak_bytes"] > 0 for result in output["results"])
@@ -0,0 +1,115 @@
+import base64
+import json
+
+import pytest
+
+from taskflow import binary
+from taskflow.columnar import ColumnarFlow
+from taskflow.flow import Flow
+from taskflow.tasks import BaseTask, CompositeTask, Task
+
+from .fixtures import Handlers, fail, handler, without_execution_times
+
+# _make_flow after run, written by version 1, which had no execution times
+_VERSION_1 = base64.b64decode(
+    "VEZMVwEHAAAAEwAAAHRhc2tmbG93LnRhc2tzLlRhc2seAAAAdGFza2Zsb3cudGVzdC5maXh0dXJlcy5oYW5kbGVyJgAAAHRhc2tmbG93LnRl"
+    "c3QuZml4dHVyZXMuSGFuZGxlcnMucmVwZWF0BQAAAGZpcnN0GwAAAHRhc2tmbG93LnRlc3QuZml4dHVyZXMuZmFpbBwAAAB0YXNrZmxvdy50"
+    "YXNrcy5Db21wb3NpdGVUYXNrBAAAAGJvdGgGAAAAAQAAAAAAAAAAAAAAAAAAAAUAAAAAAAAAAAAAAAEAAAD/////AQAAAAMAAAADZhAAAACA"
+    "BZUFAAAAAAAAAEsAhZQuEAAAAIAFlQUAAAAAAAAASwCFlC4CAAAAAAAAAAAAAAAAAAAAAwAAAAAAAAAAAAAAAgAAAAMAAAABAAAAAwAAAANm"
+    "FgAAAIAFlQsAAAAAAAAASwGMA29uZZSGlC4aAAAAgAWVDwAAAAAAAABLAYwDb25llEsAhZSHlC4DAAAAAAAAAAIAAAAAAAAAAAAAAAAAAAAA"
+    "AAAABAAAAP////8BAAAAAQAAAAJlBQAAAIAFXZQuAAAAAAQAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABAAAA/////wAAAAADAAAAAEQp"
+    "AAAAgAWVHgAAAAAAAABdlH2UjAZuZXN0ZWSUXZQoRz/4AAAAAAAATmVzYS4AAAAABQAAAAAAAAABAAAAAAAAAAYAAAAAAAAABQAAAP////8G"
+    "AAAAAAAAAAMAAAAEKwIAAAACAAAAAAAAAAQAAAAAAAAAAAAAAAYAAAAAAAAABQAAAAAAAAAAAAAAAAAAAAAAAAABAAAA/////wAAAAADAAAA"
+    "AGUFAAAAgAVdlC4AAAAA"
+)
+
+
+def _make_flow():
+    sub1 = Task(Handlers.repeat, args=(1, "one"), name="first")
+    sub1.then(Task(fail, max_runs=1))
+    sub2 = Task(handler, args=[{"nested": [1.5, None]}], needs_prev_result=False)
+    root = Task(handler, args=(0,))
+    root.then(CompositeTask(sub1, sub2, name="both")).then(Task(handler))
+    return Flow(root)
+
+
+class TestBinary(object):
+    def test_round_trip(self):
+        flow = _make_flow()
+        flow.run()
+        task_list = flow.to_list()
+        assert flow.is_halted
+
+        assert binary.loads(binary.dumps(task_list)) == task_list
+
+    def test_round_trip_keeps_unknown_keys(self):
+        task_list = _make_flow().to_list()
+        task_list[0]["priority"] = 5
+
+        assert binary.loads(binary.dumps(task_list)) == task_list
+
+    def test_flow(self):
+        flow = _make_flow()
+        data = flow.to_bytes()
+
+        loaded = Flow.from_bytes(data, uid=flow.uid)
+        assert loaded.uid == flow.uid
+        assert loaded.to_list() == flow.to_list()
+
+        loaded.run()
+        assert loaded.root_task.next.get_all_tasks()[0].result == (1, "one", (0,))
+        assert loaded.root_task.next.status == BaseTask.STATUS_HALTED
+
+    def test_columnar_flow(self):
+        flow = _make_flow()
+        columnar = ColumnarFlow.from_bytes(flow.to_bytes())
+
+        assert columnar.to_list() == flow.to_list()
+        assert columnar.to_bytes() == flow.to_bytes()
+
+    def test_version_1(self):
+        flow = _make_flow()
+        flow.run()
+
+        assert binary.loads(_VERSION_1) == without_execution_times(flow.to_list())
+
+    def test_execution_time_only_once_run(self):
+        flow = _make_flow()
+        flow.step()
+        task_list = flow.to_list()
+
+        assert task_list[0]["execution_delta_time"] >= 0
+        assert "execution_delta_time" not in task_list[1]
+        assert binary.loads(binary.dumps(task_list)) == task_list
+
+    def test_smaller_than_json(self):
+        root = CompositeTask(*[Task(handler, args=[index]) for index in range(1000)])
+        task_list = Flow(root).to_list()
+
+        assert len(binary.dumps(task_list)) < len(json.dumps(task_list)) / 2
+
+    def test_invalid_data(self):
+        data = _make_flow().to_bytes()
+
+        with pytest.raises(ValueError, match="not a serialized flow"):
+            binary.loads(b"JSON" + data[4:])
+        with pytest.raises(ValueError, match="version"):
+            binary.loads(data[:4] + bytes([binary.VERSION + 1]) + data[5:])
+        with pytest.raises(ValueError):
+            binary.loads(data[:-1])
+        with pytest.raises(ValueError, match="trailing"):
+            binary.loads(data + b"\0")
+
+    def test_unsupported_id(self):
+        task_list = _make_flow().to_list()
+        task_list[0]["id"] = "first"
+
+        with pytest.raises(ValueError):
+            binary.dumps(task_list)
+
+    def test_missing_id(self):
+        task_list = _make_flow().to_list()
+        del task_list[0]["id"]
+
+        with pytest.raises(ValueError, match="None"):
+            binary.dumps(task_list)
@@ -0,0 +1,299 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from taskflow.caches import FileResultCache, MemoryCache, SQLiteResultCache, make_key
+from taskflow.flow import Flow
+from taskflow.tasks import CompositeTask, Task
+
+# arguments of every call to add
+CALLS = []
+
+
+def add(*args):
+    CALLS.append(args)
+    return sum(args)
+
+
+@pytest.fixture(autouse=True)
+def _clear_calls():
+    CALLS.clear()
+
+
+def _make_root(start=1, cacheable=True):
+    # 1 -> (2 | 3) -> 5
+    root = Task(add, args=(start,), cacheable=cacheable)
+    sub_tasks = Task(add, args=(10,), cacheable=True), Task(add, args=(20,), cacheable=True)
+    root.then(CompositeTask(*sub_tasks)).then(Task(len, cacheable=True))
+    return root
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def persistent_cache(request, tmp_path):
+    if request.param == "file":
+        return lambda **kwargs: FileResultCache(tmp_path / "cache", **kwargs)
+    return lambda **kwargs: SQLiteResultCache(tmp_path / "cache.db", **kwargs)
+
+
+class TestMakeKey(object):
+    def test_normalized(self):
+        assert make_key("f", (1, [2]), {"a": 1, "b": 2}) == make_key("f", [1, [2]], {"b": 2, "a": 1})
+        assert make_key("f", [{1, 2}], {}) == make_key("f", [{2, 1}], {})
+        assert make_key("f", [1], {}) != make_key("g", [1], {})
+        assert make_key("f", [1], {}) != make_key("f", [1], {}, ["dependency"])
+        assert make_key("f", [{"a": 1}], {}) != make_key("f", [[("a", 1)]], {})
+
+    def test_types_distinguished(self):
+        assert make_key("f", [[1, 2]], {}) != make_key("f", [(1, 2)], {})
+        assert make_key("f", [{"a": 1}], {}) != make_key("f", [("$dict", ("a", 1))], {})
+        assert make_key("f", [{1}], {}) != make_key("f", [frozenset([1])], {})
+
+    def test_not_picklable(self):
+        assert make_key("f", [lambda: None], {}) is None
+
+
+class TestMemoryCache(object):
+    def test_lru(self):
+        cache = MemoryCache(max_entries=2)
+        cache.store("a", 1)
+        cache.store("b", 2)
+        assert cache.load("a") == 1
+
+        cache.store("c", 3)
+        assert "b" not in cache
+        assert cache.load("a") == 1
+        with pytest.raises(KeyError):
+            cache.load("b")
+
+        assert cache.stats() == {
+            "hits": 2,
+            "misses": 1,
+            "stores": 3,
+            "evictions": 1,
+            "expirations": 0,
+            "entries": 2,
+            "size": cache.stats()["size"],
+        }
+
+    def test_copies(self):
+        cache = MemoryCache()
+        result = {"items": [1, 2]}
+        cache.store("a", result)
+        result["items"].append(3)
+
+        loaded = cache.load("a")
+        assert loaded == {"items": [1, 2]}
+        loaded["items"].append(4)
+        assert cache.load("a") == {"items": [1, 2]}
+
+    def test_not_picklable(self):
+        cache = MemoryCache()
+        cache.store("a", lambda: None)
+        assert "a" not in cache
+
+    def test_max_bytes(self):
+        cache = MemoryCache(max_bytes=250)
+        cache.store("a", b"x" * 100)
+        cache.store("b", b"x" * 100)
+        cache.store("too large", b"x" * 1000)
+        assert len(cache) == 2
+
+        cache.store("c", b"x" * 100)
+        assert "a" not in cache
+        assert cache.stats()["size"] <= 250
+
+    def test_ttl(self, mocker):
+        monotonic = mocker.patch("taskflow.caches.time.monotonic", return_value=100.0)
+        cache = MemoryCache(ttl=10)
+        cache.store("a", 1)
+
+        monotonic.return_value = 109.0
+        assert cache.load("a") == 1
+
+        monotonic.return_value = 110.0
+        with pytest.raises(KeyError):
+            cache.load("a")
+        assert cache.stats()["expirations"] == 1
+
+
+class TestPersistentCaches(object):
+    def test_store_and_load(self, persistent_cache):
+        cache = persistent_cache()
+
+        cache.store("ab12", {"result": [1, 2]})
+        assert cache.load("ab12") == {"result": [1, 2]}
+        with pytest.raises(KeyError):
+            cache.load("cd34")
+
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["stores"], stats["entries"]) == (1, 1, 1, 1)
+
+    def test_max_size(self, persistent_cache):
+        cache = persistent_cache(max_size=2500)
+        for index in range(3):
+            cache.store(f"{index:04x}", b"x" * 1000)
+            # the least recently used goes first
+            cache.load("0000")
+
+        assert cache.load("0000") == b"x" * 1000
+        with pytest.raises(KeyError):
+            cache.load("0001")
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["size"] <= 2500
+
+    def test_verify(self, tmp_path):
+        cache = FileResultCache(tmp_path, verify=True)
+        cache.store("ab12", [1, 2, 3])
+        path = tmp_path / "ab" / "ab12"
+        data = path.read_bytes()
+        path.write_bytes(data[:-2] + b"\x00" + data[-1:])
+
+        with pytest.raises(KeyError):
+            cache.load("ab12")
+        assert not path.exists()
+        assert cache.stats()["corrupted"] == 1
+
+    def test_check_integrity(self, tmp_path):
+        cache = SQLiteResultCache(tmp_path / "cache.db")
+        cache.store("ab12", [1, 2, 3])
+        cache.store("cd34", [4, 5, 6])
+        (data,) = cache._connection.execute("SELECT data FROM results WHERE key = 'cd34'").fetchone()
+        cache._connection.execute("UPDATE results SET data = ? WHERE key = 'cd34'", (data + b"\x00",))
+
+        assert cache.check_integrity() == ["cd34"]
+        assert cache.load("ab12") == [1, 2, 3]
+        assert cache.stats()["entries"] == 1
+
+    def test_check_integrity_files(self, tmp_path):
+        cache = FileResultCache(tmp_path)
+        cache.store("ab12", [1, 2, 3])
+        with open(os.path.join(tmp_path, "ab", "ab12"), "ab") as file:
+            file.write(b"\x00")
+
+        assert cache.check_integrity() == ["ab12"]
+        assert cache.stats()["entries"] == 0
+
+
+class TestFlowMemo(object):
+    def test_run(self):
+        memo = MemoryCache()
+
+        assert Flow(_make_root(), memo=memo).run() == 2
+        assert len(CALLS) == 3
+
+        flow = Flow(_make_root(), memo=memo)
+        assert flow.run() == 2
+        assert len(CALLS) == 3
+        assert flow.root_task.status == Task.STATUS_COMPLETE
+        assert flow.root_task.execution_delta_time == 0.0
+        # a hit is not a run
+        assert flow.root_task.runs == 0
+        assert memo.stats()["hits"] == 4
+
+    def test_opt_in(self):
+        memo = MemoryCache()
+        root = Task(add, args=(1,))
+        root.then(Task(add, args=(2,), cacheable=True))
+        Flow(root, memo=memo).run()
+
+        assert not root.cacheable
+        assert len(memo) == 1
+
+    def test_keyed_on_prev_result(self):
+        memo = MemoryCache()
+        Flow(_make_root(), memo=memo).run()
+
+        Flow(_make_root(start=2), memo=memo).run()
+        assert CALLS[3:] == [(2,), (10, 2), (20, 2)]
+
+    def test_not_cacheable(self):
+        memo = MemoryCache()
+        Flow(_make_root(cacheable=False), memo=memo).run()
+        Flow(_make_root(cacheable=False), memo=memo).run()
+
+        assert CALLS.count((1,)) == 2
+        assert CALLS.count((10, 1)) == 1
+
+    def test_executor(self):
+        memo = MemoryCache()
+        Flow(_make_root(), memo=memo).run()
+
+        with ThreadPoolExecutor(2) as executor:
+            assert Flow(_make_root(), memo=memo).run(executor=executor) == 2
+        assert len(CALLS) == 3
+
+    def test_arun(self):
+        memo = MemoryCache()
+        asyncio.run(Flow(_make_root(), memo=memo).arun())
+
+        assert asyncio.run(Flow(_make_root(), memo=memo).arun()) == 2
+        assert len(CALLS) == 3
+
+
+class TestFlowResultCache(object):
+    def test_run(self, persistent_cache):
+        Flow(_make_root(), result_cache=persistent_cache()).run()
+
+        flow = Flow(_make_root(), result_cache=persistent_cache())
+        assert flow.run() == 2
+        assert len(CALLS) == 3
+        assert [task.status for task in flow.root_task._walk()] == [Task.STATUS_COMPLETE] * 5
+
+    def test_changed_upstream(self, persistent_cache):
+        Flow(_make_root(), result_cache=persistent_cache()).run()
+
+        Flow(_make_root(start=2), result_cache=persistent_cache()).run()
+        assert len(CALLS) == 6
+
+    def test_not_cacheable_upstream(self, persistent_cache):
+        Flow(_make_root(cacheable=False), result_cache=persistent_cache()).run()
+        Flow(_make_root(cacheable=False), result_cache=persistent_cache()).run()
+
+        assert len(CALLS) == 6
+
+    def test_fills_memo(self, persistent_cache):
+        Flow(_make_root(), result_cache=persistent_cache()).run()
+
+        memo = MemoryCache()
+        Flow(_make_root(), memo=memo, result_cache=persistent_cache()).run()
+        assert len(memo) == 4
+
+    def test_from_list(self, persistent_cache):
+        Flow(_make_root(), result_cache=persistent_cache()).run()
+
+        task_list = Flow(_make_root(cacheable=False)).to_list()
+        assert "cacheable" not in task_list[0]
+        assert task_list[2]["cacheable"] is True
+
+        flow = Flow.from_bytes(Flow(_make_root()).to_bytes())
+        flow.result_cache = persistent_cache()
+        flow.run()
+        assert len(CALLS) == 3
+
+        flow = Flow.from_list(task_list)
+        flow.result_cache = persistent_cache()
+        flow.run()
+        assert len(CALLS) == 6
+
+    def test_lazy(self, persistent_cache):
+        root = Task(add, args=(1,), cacheable=True)
+        root.then(Task(add, args=(2,), cacheable=True)).then(Task(add, args=(3,), cacheable=True))
+        flow = Flow(root)
+        flow.step()
+        flow.step()
+
+        lazy = Flow.from_list(flow.to_list(), lazy=True)
+        lazy.result_cache = persistent_cache()
+        # the input of the last task comes from a task that was not loaded, so its fingerprint is not known
+        assert lazy._get_fingerprint(lazy.get_task(3), {}) is None
+        assert lazy.run() == 6
+
+    def test_kwargs_changed(self):
+        root = Task(add, args=(1,), cacheable=True)
+        flow = Flow(root)
+        fingerprint = flow._get_fingerprint(root, {"a": 1})
+
+        assert flow._get_fingerprint(root, {"a": 1}) == fingerprint
+        assert flow._get_fingerprint(root, {"a": 2}) != fingerprint
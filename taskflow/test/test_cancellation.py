@@ -0,0 +1,250 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from taskflow.cancellation import Cancelled, CancelToken, abandoned_calls, current_token
+from taskflow.defaults import Defaults
+from taskflow.flow import Flow
+from taskflow.tasks import BaseTask, CompositeTask, Task
+
+from .fixtures import handler
+
+# whether each call of wait_for_cancel was cancelled
+CANCELLED = []
+
+
+def wait_for_cancel(seconds=5):
+    # a cooperative function that runs for the given seconds unless its token is cancelled
+    cancelled = current_token().wait(seconds)
+    CANCELLED.append(cancelled)
+    if cancelled:
+        raise Cancelled()
+    return seconds
+
+
+def hang_once(seconds=5):
+    # not cooperative - only the first call hangs
+    CANCELLED.append(False)
+    if len(CANCELLED) == 1:
+        time.sleep(seconds)
+    return "done"
+
+
+async def async_hang(seconds=5):
+    await asyncio.sleep(seconds)
+
+
+@pytest.fixture(autouse=True)
+def _clear_cancelled():
+    CANCELLED.clear()
+
+
+class TestCancelToken(object):
+    def test_cancel(self):
+        parent = CancelToken()
+        child = CancelToken(parent)
+        child.raise_if_cancelled()
+
+        parent.cancel()
+        assert child.is_cancelled
+        assert child.wait(0)
+        with pytest.raises(Cancelled):
+            child.raise_if_cancelled()
+        assert CancelToken(parent).is_cancelled
+
+    def test_close(self):
+        parent = CancelToken()
+        child = CancelToken(parent)
+        child.close()
+
+        parent.cancel()
+        assert not child.is_cancelled
+
+    def test_wait_async(self):
+        token = CancelToken()
+        threading.Timer(0.05, token.cancel).start()
+
+        assert asyncio.run(token.wait_async(5))
+        assert not asyncio.run(CancelToken().wait_async(0.01))
+
+    def test_current_token(self):
+        assert not current_token().is_cancelled
+
+
+class TestTimeout(object):
+    def test_cooperative(self):
+        flow = Flow(Task(wait_for_cancel, timeout=0.05, max_runs=1))
+        start = time.monotonic()
+
+        flow.run()
+        assert time.monotonic() - start < 1
+        assert flow.is_halted
+        assert isinstance(flow.root_task.error, TimeoutError)
+        # the time the run actually took
+        assert 0.05 <= flow.root_task.execution_delta_time < 1
+
+        # the call was told to stop
+        for _ in range(100):
+            if CANCELLED:
+                break
+            time.sleep(0.01)
+        assert CANCELLED == [True]
+
+    def test_threads_reused(self):
+        for _ in range(20):
+            Flow(Task(handler, timeout=1)).run()
+
+        threads = [thread for thread in threading.enumerate() if thread.name.startswith("taskflow-timeout")]
+        assert 0 < len(threads) <= Defaults.timeout_threads
+
+    def test_abandoned(self):
+        task = Task(hang_once, args=(0.3,), timeout=0.05, max_runs=2)
+
+        assert Flow(task).run() == "done"
+        # the first call still holds its thread, the second one got another
+        assert abandoned_calls() == 1
+        assert task.runs == 2
+        assert CANCELLED == [False, False]
+
+        for _ in range(100):
+            if not abandoned_calls():
+                break
+            time.sleep(0.01)
+        assert abandoned_calls() == 0
+
+    def test_flows_in_threads(self):
+        # calls of one flow do not wait for the threads of the calls of others, so none runs out of time
+        flows = [Flow(Task(time.sleep, args=(0.4,), timeout=1, max_runs=1)) for _ in range(24)]
+        threads = [threading.Thread(target=flow.run) for flow in flows]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not any(flow.is_halted for flow in flows)
+
+    @pytest.mark.parametrize("executor_type", [ThreadPoolExecutor, ProcessPoolExecutor])
+    def test_queued_for_executor(self, executor_type):
+        # the time out counts from the start of the call, not from when it was queued for a worker
+        root = CompositeTask(*[Task(time.sleep, args=(0.2,), timeout=1, max_runs=1) for _ in range(12)])
+        flow = Flow(root)
+
+        with executor_type(2) as executor:
+            flow.run(executor=executor)
+        assert flow.is_complete
+
+    def test_queued_for_executor_timed_out(self):
+        root = CompositeTask(*[Task(wait_for_cancel, args=(0.5,), timeout=0.1, max_runs=1) for _ in range(4)])
+        flow = Flow(root)
+        start = time.monotonic()
+
+        with ThreadPoolExecutor(2) as executor:
+            flow.run(executor=executor)
+        assert flow.is_halted
+        assert all(isinstance(task.error, TimeoutError) for task in root.get_all_tasks())
+        assert 0.2 <= time.monotonic() - start < 1
+        assert CANCELLED == [True] * 4
+
+    def test_retried(self):
+        flow = Flow(Task(hang_once, args=(0.5,), timeout=0.05, max_runs=2))
+        start = time.monotonic()
+
+        assert flow.run() == "done"
+        assert time.monotonic() - start < 0.5
+        assert flow.root_task.runs == 2
+
+    def test_defaults(self, monkeypatch):
+        monkeypatch.setattr(Defaults, "timeout", 10)
+
+        assert Task(handler).timeout == 10
+        assert Task(handler, timeout=1).timeout == 1
+
+    def test_serialized(self):
+        task_list = Flow(Task(handler, timeout=1.5).then(Task(handler))).to_list()
+
+        assert task_list[0]["timeout"] == 1.5
+        assert "timeout" not in task_list[1]
+        assert Flow.from_list(task_list).root_task.timeout == 1.5
+
+    def test_executor_slot_freed(self):
+        root = CompositeTask(Task(wait_for_cancel, timeout=0.05, max_runs=1), Task(handler, args=(1,)))
+        flow = Flow(root)
+        start = time.monotonic()
+
+        with ThreadPoolExecutor(1) as executor:
+            flow.run(executor=executor)
+
+        assert time.monotonic() - start < 1
+        assert root.get_all_tasks()[0].status == BaseTask.STATUS_HALTED
+        assert root.get_all_tasks()[1].result == (1,)
+        assert CANCELLED == [True]
+
+    def test_arun(self):
+        flow = Flow(Task(async_hang, timeout=0.05, max_runs=1))
+        start = time.monotonic()
+
+        asyncio.run(flow.arun())
+        assert time.monotonic() - start < 1
+        assert isinstance(flow.root_task.error, TimeoutError)
+
+    def test_arun_thread(self):
+        flow = Flow(Task(wait_for_cancel, timeout=0.05, max_runs=1))
+
+        asyncio.run(flow.arun())
+        assert isinstance(flow.root_task.error, TimeoutError)
+        for _ in range(100):
+            if CANCELLED:
+                break
+            time.sleep(0.01)
+        assert CANCELLED == [True]
+
+
+class TestCancel(object):
+    def _make_flow(self):
+        root = Task(wait_for_cancel)
+        root.then(Task(handler))
+        return Flow(root)
+
+    def test_run(self):
+        flow = self._make_flow()
+        threading.Timer(0.05, flow.cancel).start()
+
+        flow.run()
+        assert flow.is_cancelled
+        assert CANCELLED == [True]
+        assert flow.root_task.next.status == BaseTask.STATUS_PENDING
+        assert flow.step() is None
+        assert flow.get_ready_tasks() == []
+
+    def test_run_executor(self):
+        flow = self._make_flow()
+        threading.Timer(0.05, flow.cancel).start()
+
+        with ThreadPoolExecutor(2) as executor:
+            flow.run(executor=executor)
+        assert CANCELLED == [True]
+        assert flow.root_task.next.status == BaseTask.STATUS_PENDING
+
+    def test_arun(self):
+        flow = self._make_flow()
+
+        async def cancel_later():
+            await asyncio.sleep(0.05)
+            flow.cancel()
+
+        async def main():
+            await asyncio.gather(flow.arun(), cancel_later())
+
+        asyncio.run(main())
+        assert CANCELLED == [True]
+        assert flow.root_task.next.status == BaseTask.STATUS_PENDING
+
+    def test_before_run(self):
+        flow = self._make_flow()
+        flow.cancel()
+
+        assert flow.run() is None
+        assert flow.root_task.runs == 0
@@ -0,0 +1,183 @@
+import random
+import time
+
+import pytest
+
+from taskflow.columnar import ColumnarFlow
+from taskflow.flow import Flow
+from taskflow.retries import Backoff
+from taskflow.tasks import BaseTask, CompositeTask, Task
+
+from .fixtures import Handlers, fail, handler, without_execution_times
+from .test_flow import CountingTask, WrappingTask
+from .test_scheduler import _make_graph
+
+
+def _make_flow():
+    sub1 = Task(Handlers.repeat, args=(1,))
+    sub1.then(Task(Handlers.repeat, args=(11,)))
+    sub2 = Task(Handlers.repeat, args=(2,), name="second")
+    root = Task(Handlers.repeat, args=(0,))
+    root.then(CompositeTask(sub1, sub2)).then(Task(Handlers.repeat, args=(3,)))
+    return Flow(root)
+
+
+class TestColumnarFlow(object):
+    def test_to_list(self):
+        flow = _make_flow()
+        columnar = ColumnarFlow.from_flow(flow)
+
+        assert len(columnar) == 6
+        assert columnar.uid == flow.uid
+        assert columnar.to_list() == flow.to_list()
+
+    def test_to_list_keeps_unknown_keys(self):
+        task_list = _make_flow().to_list()
+        task_list[0]["priority"] = 5
+
+        assert ColumnarFlow.from_list(task_list).to_list() == task_list
+
+    def test_run(self):
+        flow = _make_flow()
+        columnar = ColumnarFlow.from_flow(flow)
+
+        assert columnar.run() == flow.run()
+        assert columnar.is_complete
+        assert without_execution_times(columnar.to_list()) == without_execution_times(flow.to_list())
+        assert Flow.from_list(columnar.to_list()).is_complete
+
+    def test_step_matches_flow(self):
+        rng = random.Random(1234)
+
+        for _ in range(30):
+            flow = Flow(_make_graph(rng))
+            columnar = ColumnarFlow.from_flow(flow)
+
+            while True:
+                task = flow.step()
+                columnar_task = columnar.step()
+                if task is None:
+                    assert columnar_task is None
+                    break
+
+                assert columnar_task.id == task.id
+                assert columnar_task.result == task.result
+
+            assert columnar.is_complete
+            assert without_execution_times(columnar.to_list()) == without_execution_times(flow.to_list())
+
+    def test_status_and_result(self):
+        flow = _make_flow()
+        columnar = ColumnarFlow.from_flow(flow)
+        composite_id = flow.root_task.next.id
+
+        assert columnar.get_status(composite_id) == BaseTask.STATUS_PENDING
+        assert columnar.get_ready_ids() == [flow.root_task.id]
+
+        columnar.step()
+        assert columnar.get_ready_ids() == [2, 4]
+        assert columnar.get_ready_ids(limit=1) == [2]
+
+        columnar.run()
+        assert columnar.get_status(composite_id) == BaseTask.STATUS_COMPLETE
+        assert columnar.get_result(composite_id) == [(11, (1, (0,))), (2, (0,))]
+
+    def test_get_task(self):
+        flow = _make_flow()
+        columnar = ColumnarFlow.from_flow(flow)
+
+        task = columnar.get_task(4)
+        assert task.name == "second"
+        assert task.args == (2,)
+        assert task.prev is None
+
+        with pytest.raises(ValueError):
+            columnar.get_task(flow.root_task.next.id)
+
+    def test_retry_and_halt(self):
+        root = Task(handler, args=(1,))
+        root.then(Task(fail, max_runs=2)).then(Task(handler))
+        columnar = ColumnarFlow.from_flow(Flow(root))
+
+        columnar.step()
+        task = columnar.step()
+        assert task.status == BaseTask.STATUS_PENDING
+        assert not columnar.is_halted
+
+        task = columnar.step()
+        assert task.status == BaseTask.STATUS_HALTED
+        assert task.runs == 2
+        assert str(columnar.get_task(task.id).error) == "Boom"
+        assert columnar.is_halted
+        assert columnar.step() is None
+        assert columnar.get_ready_ids() == []
+
+    def test_halted_composite(self):
+        root = CompositeTask(Task(handler), Task(fail, max_runs=1))
+        root.then(Task(handler))
+        columnar = ColumnarFlow.from_flow(Flow(root))
+
+        columnar.run()
+        assert columnar.is_halted
+        assert columnar.get_status(root.id) == BaseTask.STATUS_HALTED
+        assert not columnar.is_complete
+
+    def test_timeout(self):
+        root = Task(time.sleep, args=(1,), timeout=0.05, max_runs=1)
+        root.then(Task(handler))
+        columnar = ColumnarFlow.from_flow(Flow(root))
+        start = time.monotonic()
+
+        task = columnar.step()
+        assert time.monotonic() - start < 0.5
+        assert isinstance(task.error, TimeoutError)
+        assert columnar.is_halted
+
+    def test_invalid_lists(self):
+        with pytest.raises(ValueError):
+            ColumnarFlow.from_list([])
+
+        task_list = _make_flow().to_list()
+        task_list[0]["next"] = 100
+        with pytest.raises(ValueError):
+            ColumnarFlow.from_list(task_list)
+
+        other = Task(handler)
+        other.set_ids(starting_id=100)
+        task_list = _make_flow().to_list() + Flow(other).to_list()
+        with pytest.raises(ValueError):
+            ColumnarFlow.from_list(task_list)
+
+    def test_backoff_rejected(self):
+        root = Task(fail, backoff=Backoff(initial=1))
+        root.then(Task(handler))
+
+        with pytest.raises(ValueError, match="backoff"):
+            ColumnarFlow.from_flow(Flow(root))
+
+    def test_custom_run_rejected(self):
+        for task in (CountingTask(), WrappingTask(handler)):
+            with pytest.raises(ValueError, match="implements run"):
+                ColumnarFlow.from_flow(Flow(CompositeTask(Task(handler), task)))
+
+    def test_large_fan_out(self):
+        root = CompositeTask(*[Task(handler, args=(index,), needs_prev_result=False) for index in range(20000)])
+        root.then(Task(handler, needs_prev_result=False))
+        columnar = ColumnarFlow.from_flow(Flow(root))
+
+        assert columnar.run() == ()
+        assert columnar.is_complete
+        assert columnar.get_result(root.id)[-1] == (19999,)
+
+    def test_deep_result(self):
+        task = Task(handler, args=(1,))
+        for _ in range(1500):
+            task = CompositeTask(task)
+        columnar = ColumnarFlow.from_list(Flow(task).to_list())
+        columnar.step()
+
+        # nested deeper than the recursion limit
+        result = columnar.get_result(task.id)
+        for _ in range(1500):
+            (result,) = result
+        assert result == (1,)
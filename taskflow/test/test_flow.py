@@ -1,10 +1,18 @@
+import asyncio
+import gc
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from random import shuffle
 from uuid import uuid4
 
+import pytest
+
 from taskflow.flow import Flow
 from taskflow.tasks import BaseTask, CompositeTask, Task
 
-from .fixtures import Handlers
+from .fixtures import Handlers, async_handler, fail, without_execution_times
+from .test_scheduler import _make_graph
 
 
 class TestFlow(object):
@@ -58,6 +66,130 @@ class TestFlow(object):
         assert result == leaf.result
         assert result == (6, (5, (4,)))
 
+    def test_run_executor(self):
+        root = Task(Handlers.repeat, args=(4,))
+        then = Task(Handlers.repeat, args=(5,))
+        leaf = Task(Handlers.repeat, args=(6,))
+
+        flow = Flow(root.then(CompositeTask(then, Task(Handlers.repeat, args=(7,)))).then(leaf))
+        with ThreadPoolExecutor(2) as executor:
+            result = flow.run(executor=executor)
+
+        assert flow.is_complete
+        assert result == (6, [(5, (4,)), (7, (4,))])
+
+    def test_run_executor_concurrent(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def wait_for_others(value):
+            barrier.wait()
+            return value
+
+        tasks = [Task(wait_for_others, args=(index,), needs_prev_result=False) for index in range(3)]
+        flow = Flow(CompositeTask(*tasks))
+        with ThreadPoolExecutor(3) as executor:
+            result = flow.run(executor=executor)
+
+        assert result == [0, 1, 2]
+
+    def test_run_executor_retry(self):
+        calls = []
+
+        def flaky(value):
+            calls.append(value)
+            if len(calls) < 3:
+                raise ValueError("Boom")
+            return value
+
+        task = Task(flaky, args=(1,), max_runs=3)
+        flow = Flow(task)
+        with ThreadPoolExecutor(2) as executor:
+            assert flow.run(executor=executor) == 1
+
+        assert task.runs == 3
+        assert task.error is None
+
+    def test_run_executor_halt(self):
+        def fail():
+            raise ValueError("Boom")
+
+        failing = Task(fail, max_runs=2, needs_prev_result=False)
+        other = Task(Handlers.repeat, args=(1,), needs_prev_result=False)
+        leaf = Task(Handlers.repeat, args=(2,))
+        flow = Flow(CompositeTask(failing, other).then(leaf))
+
+        with ThreadPoolExecutor(2) as executor:
+            assert flow.run(executor=executor) is None
+
+        assert flow.is_halted
+        assert failing.runs == 2
+        assert isinstance(failing.error, ValueError)
+        assert other.status == BaseTask.STATUS_COMPLETE
+        assert leaf.status == BaseTask.STATUS_PENDING
+
+    def test_run_executor_hooks(self, mocker):
+        root = Task(Handlers.repeat, args=(4,))
+        skipped = Task(Handlers.repeat, args=(5,))
+        flow = Flow(root.then(skipped))
+
+        after_task_run = mocker.patch("taskflow.flow.Flow._after_task_run")
+        mocker.patch("taskflow.flow.Flow._before_task_run", lambda self, task: task is root)
+
+        with ThreadPoolExecutor(2) as executor:
+            assert flow.run(executor=executor) is None
+
+        after_task_run.assert_called_once_with(root)
+        assert skipped.status == BaseTask.STATUS_PENDING
+
+    def test_arun(self):
+        root = Task(async_handler, args=(4,))
+        then = Task(Handlers.repeat, args=(5,))
+        leaf = Task(async_handler, args=(6,))
+
+        flow = Flow(root.then(CompositeTask(then, Task(async_handler, args=(7,)))).then(leaf))
+        result = asyncio.run(flow.arun())
+
+        assert flow.is_complete
+        assert result == (6, [(5, (4,)), (7, (4,))])
+
+    def test_arun_concurrency(self):
+        active = []
+        peak = []
+
+        async def track(value):
+            active.append(value)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.remove(value)
+            return value
+
+        tasks = [Task(track, args=(index,), needs_prev_result=False) for index in range(6)]
+        flow = Flow(CompositeTask(*tasks))
+
+        assert asyncio.run(flow.arun(concurrency=2)) == list(range(6))
+        assert max(peak) == 2
+
+        flow = Flow(CompositeTask(*[Task(track, args=(index,), needs_prev_result=False) for index in range(6)]))
+        asyncio.run(flow.arun())
+        assert max(peak) == 6
+
+    def test_arun_retry_and_halt(self):
+        calls = []
+
+        async def flaky():
+            calls.append(None)
+            raise ValueError("Boom")
+
+        failing = Task(flaky, max_runs=2, needs_prev_result=False)
+        leaf = Task(Handlers.repeat, args=(2,))
+        flow = Flow(failing.then(leaf))
+
+        assert asyncio.run(flow.arun()) is None
+        assert flow.is_halted
+        assert len(calls) == 2
+        assert isinstance(failing.error, ValueError)
+        assert leaf.status == BaseTask.STATUS_PENDING
+
     def test_step(self):
         root = Task(Handlers.repeat, args=(4,))
         then = Task(Handlers.repeat, args=(5,))
@@ -78,6 +210,26 @@ class TestFlow(object):
         assert result == leaf
         assert leaf.result == (6, (5, (4,)))
 
+    def test_step_after_extending(self):
+        root = Task(Handlers.repeat, args=(4,))
+        flow = Flow(root)
+        flow.run()
+
+        leaf = flow.root_task.leaf.then(Task(Handlers.repeat, args=(5,)))
+        assert not flow.is_complete
+        assert flow.step() == leaf
+        assert flow.is_complete
+        assert flow.run() == (5, (4,))
+
+    def test_run_after_extending_composite(self):
+        sub = Task(Handlers.repeat, args=(1,))
+        flow = Flow(CompositeTask(sub))
+        flow.run()
+
+        sub.then(Task(Handlers.repeat, args=(2,)))
+        assert flow.run() == [(2, (1,))]
+        assert flow.is_complete
+
     def test_step_before_task_run(self, mocker):
         root = Task(Handlers.repeat, args=(4,))
         leaf = Task(Handlers.repeat, args=(6,))
@@ -93,6 +245,43 @@ class TestFlow(object):
         assert not flow.is_complete
         assert result is None
 
+    def test_get_ready_tasks(self):
+        sub1 = Task(Handlers.repeat, args=(1,))
+        sub2 = Task(Handlers.repeat, args=(2,))
+        sub3 = Task(Handlers.repeat, args=(3,))
+        leaf = Task(Handlers.repeat)
+        flow = Flow(CompositeTask(sub1, sub2, sub3).then(leaf))
+
+        assert flow.get_ready_tasks() == [sub1, sub2, sub3]
+        assert flow.get_ready_tasks(limit=2) == [sub1, sub2]
+
+        flow.mark_running([sub1, sub2])
+        assert sub1.status == BaseTask.STATUS_RUNNING
+        assert sub2.status == BaseTask.STATUS_RUNNING
+        assert flow.get_ready_tasks() == [sub3]
+
+        sub3._status = BaseTask.STATUS_HALTED
+        assert flow.get_ready_tasks() == []
+
+        for task in (sub1, sub2, sub3):
+            task._status = BaseTask.STATUS_COMPLETE
+        assert flow.get_ready_tasks() == [leaf]
+
+    def test_mark_running_not_pending(self):
+        sub1 = Task(Handlers.repeat, args=(1,))
+        sub2 = Task(Handlers.repeat, args=(2,))
+        composite = CompositeTask(sub1, sub2)
+        flow = Flow(composite)
+
+        flow.mark_running([sub1])
+        with pytest.raises(RuntimeError):
+            flow.mark_running([sub2, sub1])
+
+        with pytest.raises(RuntimeError):
+            flow.mark_running([composite])
+
+        assert sub2.status == BaseTask.STATUS_PENDING
+
     def test_get_next(self):
         task1 = Task(Handlers.repeat, args=(1,))
         task2 = task1.then(Task(Handlers.repeat, args=(2,)))
@@ -137,6 +326,111 @@ class TestFlow(object):
         result = flow._get_next(task1)
         assert result == task4
 
+    def test_release(self):
+        gc.collect()
+        gc.disable()
+        try:
+            sub1 = Task(Handlers.repeat, args=(1,))
+            sub2 = Task(Handlers.repeat, args=(2,))
+            composite = CompositeTask(sub1, sub2)
+            flow = Flow(Task(Handlers.repeat, args=(0,)).then(composite).then(Task(Handlers.repeat)))
+            result = flow.run()
+
+            flow.release()
+            assert sub1.parent is None
+            assert sub1.status == BaseTask.STATUS_COMPLETE
+            assert composite.result == [(1, (0,)), (2, (0,))]
+            assert flow.root_task.next is composite
+            assert flow.is_complete
+            assert not flow.is_halted
+            assert composite.leaf is flow.root_task.leaf
+            assert composite.local_root is flow.root_task
+            assert sub2.local_root is sub2
+            assert not composite.is_halted
+
+            del flow, sub1, sub2, composite
+            assert gc.collect() == 0
+            assert result == ([(1, (0,)), (2, (0,))],)
+        finally:
+            gc.enable()
+
+    def test_release_halted(self):
+        halted = Task(fail, max_runs=1)
+        leaf = Task(Handlers.repeat)
+        flow = Flow(Task(Handlers.repeat).then(halted).then(leaf))
+        flow.run()
+
+        flow.release()
+        assert flow.is_halted
+        assert not flow.is_complete
+        assert halted.is_halted
+        assert not flow.root_task.is_halted
+        assert halted.leaf is leaf
+        assert leaf.local_root is flow.root_task
+
+    def test_to_delta(self):
+        sub1 = Task(Handlers.repeat, args=(1,))
+        sub2 = Task(Handlers.repeat, args=(2,))
+        leaf = CompositeTask(sub1, sub2).then(Task(Handlers.repeat))
+        flow = Flow(leaf)
+
+        assert flow.to_delta() == []
+
+        flow.step()
+        assert sub1.is_dirty
+        assert not sub2.is_dirty
+        assert flow.to_delta() == [task_data for task_data in flow.to_list() if task_data["id"] == sub1.id]
+        assert not sub1.is_dirty
+        assert flow.to_delta() == []
+
+        flow.run()
+        assert [task_data["id"] for task_data in flow.to_delta()] == [sub2.id, leaf.id]
+
+    def test_to_delta_mark_running(self):
+        task = Task(Handlers.repeat, args=(1,))
+        flow = Flow(task)
+
+        flow.mark_running([task])
+        flow.to_delta()
+
+        task.run()
+        assert flow.to_delta()[0]["runs"] == 1
+
+    def test_apply_delta(self):
+        flow1 = Flow(Task(Handlers.repeat, args=(1,)).then(CompositeTask(Task(Handlers.repeat), Task(Handlers.repeat))))
+        checkpoint = flow1.to_list()
+        flow2 = Flow.from_list(checkpoint)
+
+        deltas = []
+        while flow1.step():
+            deltas.append(flow1.to_delta())
+
+        for delta in deltas:
+            flow2.apply_delta(delta)
+
+        assert flow2.to_list() == flow1.to_list()
+        assert flow2.is_complete
+        assert flow2.to_delta() == []
+
+    def test_apply_delta_restarts_passed_tasks(self):
+        task1 = Task(Handlers.repeat, args=(1,))
+        task2 = task1.then(Task(Handlers.repeat, args=(2,)))
+        flow = Flow(task1)
+        delta = flow.to_list()[:1]
+
+        flow.step()
+        assert flow._get_next(flow.root_task) is task2
+
+        flow.apply_delta(delta)
+        assert flow._get_next(flow.root_task) is task1
+
+    def test_apply_delta_missing_task(self):
+        flow = Flow(Task(Handlers.repeat))
+        task_data = dict(flow.to_list()[0], id=100)
+
+        with pytest.raises(ValueError):
+            flow.apply_delta([task_data])
+
     def test_to_list(self):
         task1 = Task(Handlers.repeat, args=(1,))
         flow = Flow(
@@ -160,3 +454,229 @@ class TestFlow(object):
         flow2 = Flow.from_list(data_list, uid=uuid4(), friendly_name="Copy")
 
         assert flow2.to_list() == flow1.to_list()
+
+    def test_from_list_keeps_input(self):
+        task1 = Task(Handlers.repeat, args=(1,))
+        flow1 = Flow(task1.then(CompositeTask(Task(Handlers.repeat), Task(Handlers.repeat))))
+
+        data_list = flow1.to_list()
+        expected = [dict(task_data) for task_data in data_list]
+        Flow.from_list(data_list)
+
+        assert data_list == expected
+
+    def test_from_list_statuses_and_parents(self):
+        sub1 = Task(Handlers.repeat, args=(1,))
+        sub2 = Task(Handlers.repeat, args=(2,))
+        sub21 = sub2.then(Task(Handlers.repeat, args=(21,)))
+        flow1 = Flow(CompositeTask(sub1, sub2).then(Task(Handlers.repeat)))
+        flow1.step()
+        sub21._status = BaseTask.STATUS_HALTED
+
+        data_list = flow1.to_list()
+        shuffle(data_list)
+        flow2 = Flow.from_list(data_list)
+
+        root = flow2.root_task
+        assert [task.id for task in root.get_all_tasks()] == [sub1.id, sub2.id]
+        assert all(task.parent is root for task in root.get_all_tasks())
+        assert root.get_all_tasks()[0].status == BaseTask.STATUS_COMPLETE
+        assert root.get_all_tasks()[1].leaf.status == BaseTask.STATUS_HALTED
+        assert flow2.is_halted
+
+    def test_from_list_shuffled_nested(self):
+        rng = random.Random(1234)
+
+        for _ in range(20):
+            inner = CompositeTask(Task(Handlers.repeat, args=(2,)))
+            root = CompositeTask(Task(Handlers.repeat, args=(1,)).then(inner))
+            root.then(Task(Handlers.repeat, args=(3,)))
+            flow1 = Flow(root)
+            flow1.step()
+
+            # the outer composite may be created before the composite at the end of its sub chain
+            task_list = flow1.to_list()
+            rng.shuffle(task_list)
+            flow2 = Flow.from_list(task_list)
+            assert not flow2.is_complete
+            assert flow2.run() == flow1.run() == (3, [[(2, (1,))]])
+
+    def test_from_list_checkpoints(self):
+        rng = random.Random(4321)
+
+        for seed in range(30):
+            expected = Flow(_make_graph(random.Random(seed))).run()
+
+            flow = Flow(_make_graph(random.Random(seed)))
+            for _ in range(rng.randint(1, 10)):
+                flow.step()
+            task_list = flow.to_list()
+            rng.shuffle(task_list)
+            assert Flow.from_list(task_list).run() == expected
+
+    def test_from_list_missing_task(self):
+        task1 = Task(Handlers.repeat, args=(1,))
+        flow1 = Flow(task1.then(Task(Handlers.repeat)))
+
+        data_list = flow1.to_list()
+        with pytest.raises(ValueError):
+            Flow.from_list(data_list[1:])
+
+        with pytest.raises(ValueError):
+            Flow.from_list([])
+
+    def test_from_list_lazy(self):
+        sub1 = Task(Handlers.repeat, args=(1,))
+        sub1.then(Task(Handlers.repeat, args=(11,)))
+        sub2 = Task(Handlers.repeat, args=(2,))
+        root = Task(Handlers.repeat, args=(0,))
+        leaf = root.then(Task(Handlers.repeat)).then(CompositeTask(sub1, sub2)).then(Task(Handlers.repeat, args=(3,)))
+        flow1 = Flow(root)
+        for _ in range(4):
+            flow1.step()
+
+        flow2 = Flow.from_list(flow1.to_list(), lazy=True)
+
+        # the first task and the complete chain of sub1 are left out
+        assert sorted(flow2._get_tasks_by_id()) == [2, 4, 5, 6, 7]
+        assert flow2.root_task.id == 2
+        assert flow2.root_task.prev is None
+        assert flow2.to_list() == flow1.to_list()
+
+        assert flow2.run() == flow1.run()
+        assert flow2.get_task(leaf.id).result == leaf.result
+        assert without_execution_times(flow2.to_list()) == without_execution_times(flow1.to_list())
+
+    def test_from_list_lazy_walk_order(self):
+        rng = random.Random(1234)
+
+        for _ in range(10):
+            flow1 = Flow(_make_graph(rng))
+            for _ in range(rng.randint(0, 10)):
+                flow1.step()
+
+            task_list = flow1.to_list()
+            rng.shuffle(task_list)
+            assert Flow.from_list(task_list, lazy=True).to_list() == flow1.to_list()
+
+    def test_from_list_lazy_deep(self):
+        task = Task(Handlers.repeat, args=(1,))
+        for _ in range(400):
+            task = CompositeTask(task)
+        root = Task(Handlers.repeat, args=(0,))
+        root.then(task).then(Task(Handlers.repeat))
+        flow1 = Flow(root)
+        flow1.step()
+        flow1.step()
+
+        # more levels than the recursion limit allows for three calls per level
+        flow2 = Flow.from_list(flow1.to_list(), lazy=True)
+        assert flow2.run() == flow1.run()
+
+    def test_from_list_lazy_matches_from_list(self):
+        rng = random.Random(4321)
+
+        for _ in range(30):
+            flow1 = Flow(_make_graph(rng))
+            for _ in range(rng.randint(0, 10)):
+                flow1.step()
+
+            flow2 = Flow.from_list(flow1.to_list(), lazy=True)
+            while True:
+                task = flow1.step()
+                lazy_task = flow2.step()
+                if task is None:
+                    assert lazy_task is None
+                    break
+
+                assert lazy_task.id == task.id
+                assert lazy_task.result == task.result
+
+            assert flow2.is_complete
+            assert without_execution_times(flow2.to_list()) == without_execution_times(flow1.to_list())
+
+    def test_from_list_lazy_delta(self):
+        root = Task(Handlers.repeat, args=(0,))
+        root.then(Task(Handlers.repeat)).then(Task(Handlers.repeat))
+        flow1 = Flow(root)
+        flow1.step()
+        flow1.step()
+        flow1.to_delta()
+
+        flow2 = Flow.from_list(flow1.to_list(), lazy=True)
+        flow2.step()
+        flow1.step()
+        assert without_execution_times(flow2.to_delta()) == without_execution_times(flow1.to_delta())
+
+        # the first task was not loaded, but a delta for it can still be applied
+        flow2.apply_delta([dict(flow1.to_list()[0], result="changed")])
+        assert flow2.get_task(root.id).result == "changed"
+        assert flow2.to_list()[0]["result"] == "changed"
+
+        with pytest.raises(ValueError):
+            flow2.apply_delta([dict(flow1.to_list()[0], status=BaseTask.STATUS_PENDING)])
+
+    def test_get_task_lazy(self):
+        root = CompositeTask(Task(Handlers.repeat, args=(1,)), Task(Handlers.repeat, args=(2,)))
+        root.then(Task(Handlers.repeat)).then(Task(Handlers.repeat))
+        flow1 = Flow(root)
+        flow1.step()
+        flow1.step()
+        flow1.step()
+
+        flow2 = Flow.from_list(flow1.to_list(), lazy=True)
+        assert flow2.get_task(1).result == (1,)
+        assert flow2.get_task(4).result == ([(1,), (2,)],)
+        with pytest.raises(ValueError):
+            flow2.get_task(3)
+        with pytest.raises(KeyError):
+            flow2.get_task(100)
+
+        assert flow1.get_task(3) is root
+
+
+class CountingTask(BaseTask):
+    # a task that implements run itself, without the steps of Task.run
+    def run(self, **kwargs):
+        self._runs += 1
+        self._result = ("counted", self._runs, kwargs.get("extra"))
+        self._status = self.STATUS_COMPLETE
+        return self._result
+
+
+class WrappingTask(Task):
+    def run(self, **kwargs):
+        result = super().run(**kwargs)
+        if self.status == self.STATUS_COMPLETE:
+            self._result = ("wrapped", result)
+        return self._result
+
+
+class TestCustomTasks(object):
+    def _make_flow(self):
+        root = CountingTask()
+        root.then(WrappingTask(Handlers.repeat, args=(1,), needs_prev_result=False))
+        return Flow(root)
+
+    def test_run(self):
+        flow = self._make_flow()
+
+        assert flow.run(extra=2) == ("wrapped", (1,))
+        assert flow.root_task.result == ("counted", 1, 2)
+
+    def test_step(self):
+        flow = self._make_flow()
+        flow.step()
+        flow.step()
+
+        assert flow.root_task.next.result == ("wrapped", (1,))
+
+    def test_run_executor(self):
+        flow = self._make_flow()
+
+        with ThreadPoolExecutor(2) as executor:
+            assert flow.run(executor=executor) == ("wrapped", (1,))
+        assert flow.root_task.runs == 1
+
+    def test_arun(self):
+        assert asyncio.run(self._make_flow().arun()) == ("wrapped", (1,))
@@ -0,0 +1,188 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from taskflow.flow import Flow
+from taskflow.instrumentation import Histogram, Listener, Metrics
+from taskflow.tasks import CompositeTask, Task
+
+from .fixtures import fail, handler
+
+
+class RecordingListener(Listener):
+    def __init__(self):
+        self.events = []
+
+    def on_schedule(self, task, scheduling_ns):
+        self.events.append(("schedule", task.id))
+
+    def on_start(self, task, queue_wait_ns):
+        self.events.append(("start", task.id))
+
+    def on_finish(self, task, execution_ns):
+        self.events.append(("finish", task.id))
+
+    def on_retry(self, task, execution_ns):
+        self.events.append(("retry", task.id))
+
+    def on_halt(self, task, execution_ns):
+        self.events.append(("halt", task.id))
+
+
+def _make_flow():
+    root = Task(handler, args=(1,))
+    root.then(Task(fail, max_runs=2))
+    return Flow(root)
+
+
+class TestHistogram(object):
+    def test_record(self):
+        histogram = Histogram()
+        for value in range(1, 101):
+            histogram.record(value)
+
+        assert (histogram.count, histogram.total, histogram.min, histogram.max) == (100, 5050, 1, 100)
+        assert 50 <= histogram.percentile(50) <= 50 * 1.25
+        assert 99 <= histogram.percentile(99) <= 100
+        assert histogram.percentile(100) == 100
+        assert sum(bucket[2] for bucket in histogram.snapshot()["buckets"]) == 100
+
+    def test_buckets(self):
+        for value in [0, 1, 3, 4, 7, 8, 9, 10, 1000, 123456789, 2**40 + 12345]:
+            low, high = Histogram._get_bounds(Histogram._get_bucket(value))
+            assert low <= value <= high
+            assert high - low <= low / 4 + 1
+
+    def test_empty(self):
+        histogram = Histogram()
+
+        assert histogram.percentile(50) is None
+        assert histogram.snapshot()["count"] == 0
+
+
+class TestListeners(object):
+    def test_run(self):
+        flow = _make_flow()
+        listener = RecordingListener()
+        flow.add_listener(listener)
+
+        flow.run()
+        assert listener.events == [
+            ("schedule", 1),
+            ("start", 1),
+            ("finish", 1),
+            ("schedule", 2),
+            ("start", 2),
+            ("retry", 2),
+            ("schedule", 2),
+            ("start", 2),
+            ("halt", 2),
+        ]
+
+    def test_step(self):
+        flow = _make_flow()
+        listener = RecordingListener()
+        flow.add_listener(listener)
+
+        flow.step()
+        assert listener.events == [("schedule", 1), ("start", 1), ("finish", 1)]
+
+        flow.remove_listener(listener)
+        flow.step()
+        assert len(listener.events) == 3
+
+    def test_run_executor(self):
+        flow = Flow(CompositeTask(Task(handler), Task(handler)))
+        listener = RecordingListener()
+        flow.add_listener(listener)
+
+        with ThreadPoolExecutor(2) as executor:
+            flow.run(executor=executor)
+
+        assert listener.events[:2] == [("schedule", 1), ("schedule", 2)]
+        assert sorted(listener.events[2:]) == [("finish", 1), ("finish", 2), ("start", 1), ("start", 2)]
+
+    def test_arun(self):
+        flow = _make_flow()
+        listener = RecordingListener()
+        flow.add_listener(listener)
+
+        asyncio.run(flow.arun())
+        assert [event for event, _ in listener.events] == [
+            "schedule",
+            "start",
+            "finish",
+            "schedule",
+            "start",
+            "retry",
+            "schedule",
+            "start",
+            "halt",
+        ]
+
+
+class TestMetrics(object):
+    def test_snapshot(self):
+        flow = _make_flow()
+        metrics = Metrics()
+        flow.add_listener(metrics)
+        flow.run()
+
+        snapshot = json.loads(json.dumps(metrics.snapshot()))
+        assert snapshot["taskflow.test.fixtures.handler"]["counters"] == {
+            "scheduled": 1,
+            "started": 1,
+            "finished": 1,
+            "retried": 0,
+            "halted": 0,
+        }
+        assert snapshot["taskflow.test.fixtures.fail"]["counters"] == {
+            "scheduled": 2,
+            "started": 2,
+            "finished": 0,
+            "retried": 1,
+            "halted": 1,
+        }
+
+        histograms = snapshot["taskflow.test.fixtures.fail"]["histograms"]
+        assert histograms["execution_ns"]["count"] == 2
+        assert histograms["execution_ns"]["min"] > 0
+        assert histograms["queue_wait_ns"]["count"] == 2
+        assert histograms["scheduling_ns"]["count"] == 2
+
+        metrics.reset()
+        assert metrics.snapshot() == {}
+
+
+class TimingListener(Listener):
+    def __init__(self):
+        self.execution_ns = {}
+
+    def on_finish(self, task, execution_ns):
+        self.execution_ns[task.id] = execution_ns
+
+
+class DecliningFlow(Flow):
+    def _before_task_run(self, task):
+        return task.id != 2
+
+
+class TestTiming(object):
+    def test_execution_time(self):
+        flow = Flow(Task(handler, args=(1,)))
+        listener = TimingListener()
+        flow.add_listener(listener)
+
+        flow.step()
+        # the time the function ran, as in executor mode
+        assert listener.execution_ns[1] == round(flow.root_task.execution_delta_time * 1e9)
+
+    def test_declined_not_kept(self):
+        flow = DecliningFlow(CompositeTask(Task(handler), Task(handler)))
+        flow.add_listener(RecordingListener())
+
+        with ThreadPoolExecutor(2) as executor:
+            flow.run(executor=executor)
+        asyncio.run(flow.arun())
+
+        assert flow._scheduled_at == {}
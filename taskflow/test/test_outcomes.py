@@ -0,0 +1,29 @@
+import time
+from datetime import datetime
+
+from taskflow.outcomes import call_timed, make_outcome, start_clock
+
+from .fixtures import fail, handler
+
+
+class TestOutcomes(object):
+    def test_call_timed(self):
+        result, exc_info, start_time, delta_time = call_timed(handler, 1, extra=2)
+
+        assert result == (1,)
+        assert exc_info is None
+        assert isinstance(start_time, datetime)
+        assert delta_time >= 0
+
+    def test_call_timed_fails(self):
+        result, exc_info, _, _ = call_timed(fail)
+
+        assert result is None
+        assert str(exc_info[1]) == "Boom"
+
+    def test_make_outcome(self):
+        started = start_clock()
+        time.sleep(0.01)
+
+        assert make_outcome(1, None, started)[3] >= 0.01
+        assert make_outcome(1, None, started, 0.5) == (1, None, started[0], 0.5)
@@ -0,0 +1,144 @@
+import pickle
+import threading
+
+import pytest
+
+from taskflow.columnar import ColumnarFlow
+from taskflow.flow import Flow
+from taskflow.result_stores import REFERENCE_KEY, FileResultStore, ResultReference, result_from_data
+from taskflow.tasks import CompositeTask, Task
+
+from .fixtures import handler, without_execution_times
+
+
+def make_data(size):
+    return b"x" * size
+
+
+def data_size(data):
+    return len(data)
+
+
+def _make_flow(result_store):
+    root = Task(make_data, args=(1000,))
+    root.then(Task(data_size)).then(Task(handler, args=(1,)))
+    return Flow(root, result_store=result_store)
+
+
+class TestFileResultStore(object):
+    def test_store_and_load(self, tmp_path):
+        store = FileResultStore(tmp_path, min_size=100)
+
+        key = store.store([1, 2] * 100)
+        assert key in store
+        assert store.load(key) == [1, 2] * 100
+        assert store.store([1, 2] * 100) == key
+
+        store.delete(key)
+        assert key not in store
+        with pytest.raises(KeyError):
+            store.load(key)
+        with pytest.raises(KeyError):
+            store.delete(key)
+
+    def test_small_results_not_stored(self, tmp_path, mocker):
+        store = FileResultStore(tmp_path, min_size=1000)
+        dumps = mocker.spy(pickle, "dumps")
+
+        assert store.store(1) is None
+        assert store.store(("a", [1, 2.5], {"b": None})) is None
+        # told to be small without pickling them
+        assert dumps.call_count == 0
+        assert store.store([[[1]]]) is None
+        assert not list(tmp_path.iterdir())
+
+    def test_unpicklable_results_not_stored(self, tmp_path):
+        store = FileResultStore(tmp_path, min_size=100)
+
+        assert store.store(threading.Lock()) is None
+
+
+class TestResultReference(object):
+    def test_from_data(self, tmp_path):
+        store = FileResultStore(tmp_path)
+        reference = ResultReference("abc", store)
+
+        assert result_from_data(reference.to_data(), store) == reference
+        assert result_from_data({"other": 1}, store) == {"other": 1}
+        with pytest.raises(ValueError):
+            result_from_data(reference.to_data(), None)
+
+
+class TestFlowResultStore(object):
+    def test_run(self, tmp_path):
+        flow = _make_flow(FileResultStore(tmp_path, min_size=100))
+
+        assert flow.run() == (1, 1000)
+
+        root = flow.root_task
+        assert isinstance(root.result, ResultReference)
+        assert root.load_result() == make_data(1000)
+        assert root.next.result == 1000
+        assert flow.to_list()[0]["result"] == {REFERENCE_KEY: root.result.key}
+
+    def test_loaded_when_consumer_runs(self, tmp_path, mocker):
+        store = FileResultStore(tmp_path, min_size=100)
+        flow = _make_flow(store)
+        load = mocker.spy(store, "load")
+
+        flow.step()
+        assert load.call_count == 0
+
+        flow.step()
+        assert load.call_count == 1
+
+    def test_composite(self, tmp_path):
+        store = FileResultStore(tmp_path, min_size=100)
+        root = CompositeTask(Task(make_data, args=(1000,)), Task(handler, args=(2,)))
+        root.then(Task(handler))
+        flow = Flow(root, result_store=store)
+
+        assert flow.run() == ([make_data(1000), (2,)],)
+        # the results hold references to stored results, load_result the values
+        assert isinstance(root.result[0], ResultReference)
+        assert root.result[1] == (2,)
+        assert root.load_result() == [make_data(1000), (2,)]
+
+    def test_unpicklable_result(self, tmp_path):
+        root = Task(threading.Lock)
+        root.then(Task(handler))
+        flow = Flow(root, result_store=FileResultStore(tmp_path, min_size=1))
+
+        flow.run()
+        assert flow.is_complete
+        assert not isinstance(root.result, ResultReference)
+
+    def test_from_list(self, tmp_path):
+        store = FileResultStore(tmp_path, min_size=100)
+        flow = _make_flow(store)
+        flow.step()
+
+        with pytest.raises(ValueError):
+            Flow.from_list(flow.to_list())
+
+        flow = Flow.from_list(flow.to_list(), result_store=store)
+        assert isinstance(flow.root_task.result, ResultReference)
+        assert flow.run() == (1, 1000)
+
+    def test_delta(self, tmp_path):
+        store = FileResultStore(tmp_path, min_size=100)
+        flow1 = _make_flow(store)
+        flow2 = Flow.from_list(flow1.to_list(), result_store=store)
+
+        flow1.step()
+        flow2.apply_delta(flow1.to_delta())
+        assert flow2.root_task.result == flow1.root_task.result
+
+    def test_columnar(self, tmp_path):
+        store = FileResultStore(tmp_path, min_size=100)
+        flow = _make_flow(store)
+        columnar = ColumnarFlow.from_flow(flow)
+
+        assert columnar.run() == flow.run()
+        assert without_execution_times(columnar.to_list()) == without_execution_times(flow.to_list())
+        assert isinstance(columnar.get_task(flow.root_task.id).result, ResultReference)
@@ -0,0 +1,201 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from taskflow.defaults import Defaults
+from taskflow.flow import Flow
+from taskflow.retries import Backoff
+from taskflow.tasks import CompositeTask, Task
+
+# names of the functions called, in order
+CALLS = []
+
+
+def flaky(failures):
+    # fails the given number of times, then succeeds
+    CALLS.append("flaky")
+    if CALLS.count("flaky") <= failures:
+        raise ValueError("Boom")
+    return "flaky"
+
+
+def other(*args):
+    CALLS.append("other")
+    return "other"
+
+
+@pytest.fixture(autouse=True)
+def _clear_calls():
+    CALLS.clear()
+
+
+def _make_flow(failures=2, delay=0.05):
+    # the flaky task fails while the other chain keeps running
+    flaky_task = Task(flaky, args=(failures,), backoff=Backoff(initial=delay, jitter=0))
+    other_chain = Task(other)
+    other_chain.then(Task(other)).then(Task(other))
+    return Flow(CompositeTask(flaky_task, other_chain))
+
+
+class TestBackoff(object):
+    def test_get_delay(self):
+        backoff = Backoff(initial=1, multiplier=2, max_delay=5, jitter=0)
+
+        assert [backoff.get_delay(runs) for runs in range(1, 6)] == [1, 2, 4, 5, 5]
+        assert backoff.get_delay(10000) == 5
+
+    def test_jitter(self, mocker):
+        mocker.patch("taskflow.retries.random.random", return_value=0.5)
+
+        assert Backoff(initial=4, jitter=0.5).get_delay(1) == 3
+        assert Backoff(initial=4, jitter=1).get_delay(1) == 2
+
+    def test_invalid_jitter(self):
+        with pytest.raises(ValueError):
+            Backoff(jitter=2)
+
+    def test_data(self):
+        backoff = Backoff(initial=0.5, max_delay=None)
+
+        assert Backoff.from_data(backoff.to_data()) == backoff
+
+
+class TestTaskBackoff(object):
+    def test_retry_at(self):
+        task = Task(flaky, args=(1,), backoff=Backoff(initial=10, jitter=0))
+        task.run()
+
+        assert task.status == Task.STATUS_PENDING
+        assert task.retry_at == pytest.approx(time.time() + 10, abs=1)
+        assert not task.is_due()
+        assert task.is_due(task.retry_at)
+
+        task.run()
+        assert task.status == Task.STATUS_COMPLETE
+        assert task.retry_at is None
+
+    def test_no_retry_at_when_halted(self):
+        task = Task(flaky, args=(1,), max_runs=1, backoff=Backoff())
+        task.run()
+
+        assert task.status == Task.STATUS_HALTED
+        assert task.retry_at is None
+
+    def test_defaults(self, monkeypatch):
+        backoff = Backoff(initial=3)
+        monkeypatch.setattr(Defaults, "backoff", backoff)
+
+        assert Task(flaky).backoff is backoff
+        assert Task(flaky, backoff=Backoff(initial=1)).backoff.initial == 1
+
+    def test_serialized(self):
+        flow = _make_flow(delay=10)
+        flow.step()
+        task_list = flow.to_list()
+        flaky_task = flow.get_task(1)
+
+        assert task_list[0]["retry_at"] == flaky_task.retry_at
+        assert "retry_at" not in task_list[1]
+        assert Flow.from_list(task_list).to_list() == task_list
+        assert Flow.from_bytes(flow.to_bytes()).get_task(1).backoff == flaky_task.backoff
+
+
+class TestFlowBackoff(object):
+    def test_run(self):
+        flow = _make_flow()
+        start = time.monotonic()
+
+        assert flow.run() == ["flaky", "other"]
+        # 0.05 seconds after the first run, 0.1 after the second
+        assert time.monotonic() - start >= 0.15
+        # the other tasks ran while the flaky one waited
+        assert CALLS == ["flaky", "other", "other", "other", "flaky", "flaky"]
+
+    def test_step(self):
+        flow = _make_flow(failures=1)
+        for _ in range(4):
+            flow.step()
+        assert flow.get_ready_tasks() == []
+        retry_at = flow.get_retry_at()
+
+        # sleeps until the flaky task is due
+        task = flow.step()
+        assert time.time() >= retry_at
+        assert task.result == "flaky"
+        assert flow.step() is None
+        assert flow.is_complete
+
+    def test_step_waiting(self):
+        flow = _make_flow(failures=1, delay=10)
+        for _ in range(4):
+            flow.step()
+
+        assert flow.get_retry_at() == pytest.approx(time.time() + 10, abs=1)
+        assert flow.get_ready_tasks() == []
+
+    def test_step_cancelled(self):
+        flow = _make_flow(failures=1, delay=10)
+        for _ in range(4):
+            flow.step()
+        threading.Timer(0.05, flow.cancel).start()
+
+        start = time.monotonic()
+        assert flow.step() is None
+        assert time.monotonic() - start < 5
+
+    @pytest.mark.parametrize("executor_type", [None, ThreadPoolExecutor])
+    def test_run_cancelled(self, executor_type):
+        flow = _make_flow(failures=1, delay=5)
+        threading.Timer(0.3, flow.cancel).start()
+        start = time.monotonic()
+
+        if executor_type is None:
+            flow.run()
+        else:
+            with executor_type(2) as executor:
+                flow.run(executor=executor)
+        assert time.monotonic() - start < 2
+        assert CALLS.count("flaky") == 1
+
+    def test_arun_cancelled(self):
+        flow = _make_flow(failures=1, delay=5)
+        threading.Timer(0.3, flow.cancel).start()
+        start = time.monotonic()
+
+        asyncio.run(flow.arun())
+        assert time.monotonic() - start < 2
+        assert CALLS.count("flaky") == 1
+
+    def test_not_waiting(self):
+        flow = _make_flow(failures=0)
+
+        assert flow.get_retry_at() is None
+        flow.run()
+        assert flow.get_retry_at() is None
+
+    def test_run_executor(self):
+        flow = _make_flow()
+        start = time.monotonic()
+
+        with ThreadPoolExecutor(2) as executor:
+            assert flow.run(executor=executor) == ["flaky", "other"]
+        assert time.monotonic() - start >= 0.15
+        assert CALLS.count("flaky") == 3
+
+    def test_arun(self):
+        flow = _make_flow()
+        start = time.monotonic()
+
+        assert asyncio.run(flow.arun()) == ["flaky", "other"]
+        assert time.monotonic() - start >= 0.15
+        assert CALLS.count("flaky") == 3
+
+    def test_halts_after_max_runs(self):
+        flow = _make_flow(failures=5, delay=0.01)
+
+        flow.run()
+        assert flow.is_halted
+        assert CALLS.count("flaky") == 3
@@ -0,0 +1,196 @@
+import random
+
+from taskflow.flow import Flow
+from taskflow.scheduler import Scheduler
+from taskflow.tasks import BaseTask, CompositeTask, Task
+
+from .fixtures import Handlers
+
+
+def _make_graph(rng, depth=0):
+    chain = Task(Handlers.repeat, args=(depth,))
+    leaf = chain
+    for _ in range(rng.randint(0, 3)):
+        if depth < 3 and rng.random() < 0.4:
+            task = CompositeTask(*[_make_graph(rng, depth + 1) for _ in range(rng.randint(1, 4))])
+        else:
+            task = Task(Handlers.repeat, args=(depth,))
+        leaf = leaf.then(task)
+
+    return chain
+
+
+class TestScheduler(object):
+    def test_get_next_chain(self):
+        root = Task(Handlers.repeat, args=(1,))
+        leaf = root.then(Task(Handlers.repeat, args=(2,)))
+        scheduler = Scheduler(root)
+
+        assert scheduler.get_next() == root
+
+        root._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.get_next() == leaf
+
+        leaf._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.get_next() is None
+
+    def test_get_next_composite(self):
+        sub1 = Task(Handlers.repeat, args=(1,))
+        sub11 = sub1.then(Task(Handlers.repeat, args=(11,)))
+        sub2 = Task(Handlers.repeat, args=(2,))
+        root = CompositeTask(sub1, sub2)
+        leaf = root.then(Task(Handlers.repeat))
+        scheduler = Scheduler(root)
+
+        assert scheduler.get_next() == sub1
+
+        sub1._status = BaseTask.STATUS_RUNNING
+        assert scheduler.get_next() == sub2
+
+        sub1._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.get_next() == sub11
+
+        sub11._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.get_next() == sub2
+
+        sub2._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.get_next() == leaf
+
+    def test_get_next_halted_composite(self):
+        sub1 = Task(Handlers.repeat, args=(1,))
+        sub2 = Task(Handlers.repeat, args=(2,))
+        root = CompositeTask(sub1, sub2)
+        sub1._status = BaseTask.STATUS_HALTED
+        scheduler = Scheduler(root)
+
+        assert scheduler.get_next() is None
+
+        sub1._status = BaseTask.STATUS_PENDING
+        assert scheduler.get_next() == sub1
+
+    def test_get_next_rebuilds_on_inconsistent_statuses(self):
+        sub1 = Task(Handlers.repeat, args=(1,))
+        sub2 = Task(Handlers.repeat, args=(2,))
+        root = CompositeTask(sub1, sub2)
+        sub1._status = BaseTask.STATUS_COMPLETE
+        scheduler = Scheduler(root)
+
+        assert scheduler.get_next() == sub2
+
+        # the composite cannot complete, because a task that was already passed is pending again
+        sub1._status = BaseTask.STATUS_PENDING
+        sub2._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.get_next() == sub1
+
+    def test_get_ready(self):
+        sub1 = Task(Handlers.repeat, args=(1,))
+        sub11 = sub1.then(Task(Handlers.repeat, args=(11,)))
+        sub2 = Task(Handlers.repeat, args=(2,))
+        sub3 = Task(Handlers.repeat, args=(3,))
+        root = CompositeTask(sub1, sub2, sub3)
+        scheduler = Scheduler(root)
+
+        assert scheduler.get_ready() == [sub1, sub2, sub3]
+        assert scheduler.get_ready(limit=2) == [sub1, sub2]
+
+        sub2._status = BaseTask.STATUS_RUNNING
+        sub1._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.get_ready() == [sub11, sub3]
+
+    def test_update(self):
+        sub1 = Task(Handlers.repeat, args=(1,))
+        sub11 = sub1.then(Task(Handlers.repeat, args=(11,)))
+        sub2 = Task(Handlers.repeat, args=(2,))
+        root = CompositeTask(sub1, sub2)
+        leaf = root.then(Task(Handlers.repeat))
+        scheduler = Scheduler(root)
+
+        assert scheduler.get_ready() == [sub1, sub2]
+        sub1._status = BaseTask.STATUS_RUNNING
+        sub2._status = BaseTask.STATUS_RUNNING
+
+        sub1._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.update(sub1) == [sub11]
+
+        sub11._status = BaseTask.STATUS_HALTED
+        assert scheduler.update(sub11) == []
+
+        sub11._status = BaseTask.STATUS_PENDING
+        assert scheduler.update(sub11) == [sub11]
+
+        sub11._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.update(sub11) == []
+
+        sub2._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.update(sub2) == [leaf]
+
+    def test_reset(self):
+        root = Task(Handlers.repeat, args=(1,))
+        leaf = root.then(Task(Handlers.repeat, args=(2,)))
+        scheduler = Scheduler(root)
+
+        root._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.get_next() == leaf
+
+        root._status = BaseTask.STATUS_PENDING
+        scheduler.reset()
+        assert scheduler.get_next() == root
+
+    def test_linked_after_complete(self):
+        root = Task(Handlers.repeat, args=(1,))
+        scheduler = Scheduler(root)
+
+        root._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.get_next() is None
+
+        leaf = root.then(Task(Handlers.repeat, args=(2,)))
+        assert scheduler.get_next() == leaf
+
+    def test_linked_after_complete_sub_chain(self):
+        sub = Task(Handlers.repeat, args=(1,))
+        composite = CompositeTask(sub)
+        leaf = composite.then(Task(Handlers.repeat, args=(3,)))
+        scheduler = Scheduler(composite)
+
+        sub._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.get_next() == leaf
+
+        # the composite is pending again, so the task after it has to wait
+        sub_leaf = sub.then(Task(Handlers.repeat, args=(2,)))
+        assert scheduler.get_ready() == [sub_leaf]
+
+        sub_leaf._status = BaseTask.STATUS_COMPLETE
+        assert scheduler.update(sub_leaf) == [leaf]
+
+    def test_matches_walk(self):
+        rng = random.Random(1234)
+
+        for _ in range(50):
+            root = _make_graph(rng)
+            flow = Flow(root)
+            running = []
+
+            while True:
+                expected = Flow._walk_next(root)
+                assert flow._get_next(root) == expected
+
+                if running and (not expected or rng.random() < 0.5):
+                    task = running.pop(rng.randrange(len(running)))
+                    task._status = BaseTask.STATUS_COMPLETE
+                elif expected:
+                    expected._status = BaseTask.STATUS_RUNNING
+                    running.append(expected)
+                else:
+                    break
+
+            assert flow.is_complete
+
+    def test_run_long_chain(self):
+        root = Task(Handlers.repeat, args=(0,), needs_prev_result=False)
+        leaf = root
+        for index in range(1, 5000):
+            leaf = leaf.then(Task(Handlers.repeat, args=(index,), needs_prev_result=False))
+
+        flow = Flow(root)
+        assert flow.run() == (4999,)
+        assert flow.is_complete
@@ -0,0 +1,209 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from taskflow.flow import Flow
+from taskflow.streaming import StageExited, run_pipeline
+from taskflow.tasks import BaseTask, StreamTask, Task
+
+# number of items count_up produced and collect consumed so far
+PRODUCED = []
+CONSUMED = []
+
+
+def count_up(count, *args, **kwargs):
+    for number in range(count):
+        PRODUCED.append(number)
+        yield number
+
+
+def count_forever():
+    for number in itertools.count():
+        PRODUCED.append(number)
+        yield number
+
+
+def square(numbers, offset=0):
+    for number in numbers:
+        yield number * number + offset
+
+
+def fail_at(numbers, at=3):
+    for number in numbers:
+        if number == at:
+            raise ValueError("Boom")
+        yield number
+
+
+def collect(numbers, offset=0):
+    # how far ahead of the consumer the producer got, for every item
+    ahead = []
+    for number in numbers:
+        CONSUMED.append(number)
+        ahead.append(len(PRODUCED) - len(CONSUMED))
+        time.sleep(0.001)
+    return max(ahead, default=0)
+
+
+def exit_at(numbers, at=3):
+    # the process dies the way a killed or crashed one does
+    for number in numbers:
+        if number == at:
+            os._exit(1)
+        yield number
+
+
+def unpicklable_at(numbers, at=3):
+    for number in numbers:
+        yield threading.Lock() if number == at else number
+
+
+def fail_unpicklable(numbers):
+    for number in numbers:
+        raise ValueError(threading.Lock())
+        yield number
+
+
+def take_five(numbers):
+    return list(itertools.islice(numbers, 5))
+
+
+@pytest.fixture(autouse=True)
+def _clear_counts():
+    PRODUCED.clear()
+    CONSUMED.clear()
+
+
+class TestRunPipeline(object):
+    def test_stages(self):
+        assert run_pipeline(count_up, [square, take_five], (10,), {}, 2) == [0, 1, 4, 9, 16]
+
+    def test_no_stages(self):
+        assert run_pipeline(count_up, [], (3,), {}, 2) == [0, 1, 2]
+
+    def test_kwargs(self):
+        assert run_pipeline(count_up, [square], (3,), {"offset": 1}, 2) == [1, 2, 5]
+
+    def test_backpressure(self):
+        # the producer never gets further ahead than the queues and the items in the stages allow
+        assert run_pipeline(count_up, [collect], (200,), {}, 5) <= 5 + 2
+        assert len(CONSUMED) == 200
+
+    def test_failure(self):
+        with pytest.raises(ValueError):
+            run_pipeline(count_up, [fail_at, list], (10,), {}, 2)
+
+    def test_stops_stages(self):
+        assert run_pipeline(count_forever, [take_five], (), {}, 3) == [0, 1, 2, 3, 4]
+
+        # the source stopped while waiting on its full queue
+        produced = len(PRODUCED)
+        time.sleep(0.1)
+        assert len(PRODUCED) == produced
+
+    def test_processes(self):
+        assert run_pipeline(count_up, [square, take_five], (10,), {}, 2, processes=True) == [0, 1, 4, 9, 16]
+
+    def test_processes_failure(self):
+        with pytest.raises(ValueError):
+            run_pipeline(count_up, [fail_at, square, list], (10,), {}, 2, processes=True)
+
+    def test_processes_exited(self):
+        start = time.monotonic()
+
+        with pytest.raises(StageExited):
+            run_pipeline(count_up, [exit_at, list], (10,), {}, 2, processes=True)
+        with pytest.raises(StageExited):
+            run_pipeline(count_up, [exit_at, square, list], (10,), {}, 2, processes=True)
+        assert time.monotonic() - start < 5
+
+    def test_processes_unpicklable_item(self):
+        with pytest.raises(TypeError):
+            run_pipeline(count_up, [unpicklable_at, list], (10,), {}, 2, processes=True)
+
+    def test_processes_unpicklable_failure(self):
+        with pytest.raises(RuntimeError, match="ValueError"):
+            run_pipeline(count_up, [fail_unpicklable, list], (10,), {}, 2, processes=True)
+
+    def test_processes_stopped(self):
+        start = time.monotonic()
+
+        assert run_pipeline(count_forever, [take_five], (), {}, 3, processes=True) == [0, 1, 2, 3, 4]
+        assert time.monotonic() - start < 5
+
+
+class TestStreamTask(object):
+    def test_run(self):
+        task = StreamTask(count_up, square, take_five, args=(10,), queue_size=4)
+
+        assert task.run() == [0, 1, 4, 9, 16]
+        assert task.queue_size == 4
+        assert not task.processes
+        assert "count_up | " in str(task)
+
+    def test_flow(self):
+        root = Task(len, args=([1, 2, 3],))
+        root.then(StreamTask(count_up, square, list)).then(Task(sum))
+
+        # the previous result is the argument of the source
+        assert Flow(root).run() == 0 + 1 + 4
+
+    def test_failed(self):
+        flow = Flow(StreamTask(count_up, fail_at, list, args=(10,), max_runs=2))
+        flow.run()
+
+        assert flow.root_task.status == BaseTask.STATUS_HALTED
+        assert flow.root_task.runs == 2
+        assert isinstance(flow.root_task.error, ValueError)
+
+    def test_serialized(self):
+        flow = Flow(StreamTask(count_up, square, take_five, args=(10,), queue_size=4, processes=True))
+        task_list = flow.to_list()
+
+        assert task_list[0]["stages"] == [
+            "taskflow.test.test_streaming.square",
+            "taskflow.test.test_streaming.take_five",
+        ]
+        assert task_list[0]["processes"]
+        restored = Flow.from_bytes(flow.to_bytes())
+        assert restored.root_task.stages == (square, take_five)
+        assert restored.run() == [0, 1, 4, 9, 16]
+
+    def test_timeout(self):
+        task = StreamTask(count_forever, collect, timeout=0.1, max_runs=1)
+        flow = Flow(task)
+
+        flow.run()
+        assert isinstance(task.error, TimeoutError)
+
+        # the pipeline was stopped
+        for _ in range(100):
+            produced = len(PRODUCED)
+            time.sleep(0.1)
+            if len(PRODUCED) == produced:
+                break
+        assert len(PRODUCED) == produced
+
+    def test_cancel(self):
+        flow = Flow(StreamTask(count_forever, collect))
+        threading.Timer(0.05, flow.cancel).start()
+
+        flow.run()
+        assert flow.is_cancelled
+        assert flow.root_task.status == BaseTask.STATUS_PENDING
+
+    def test_process_pool(self):
+        flow = Flow(StreamTask(count_up, square, take_five, args=(10,)))
+
+        with ProcessPoolExecutor(1) as executor:
+            assert flow.run(executor=executor) == [0, 1, 4, 9, 16]
+
+    def test_arun(self):
+        flow = Flow(StreamTask(count_up, square, take_five, args=(10,)))
+
+        assert asyncio.run(flow.arun()) == [0, 1, 4, 9, 16]
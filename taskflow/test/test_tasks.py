@@ -1,11 +1,40 @@
+import asyncio
 import random
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import pytest
 
+from taskflow.batching import batched
+from taskflow.columnar import ColumnarFlow
 from taskflow.defaults import Defaults
-from taskflow.tasks import BaseTask, CompositeTask, Task
+from taskflow.flow import Flow
+from taskflow.tasks import BaseTask, CompositeTask, MapTask, Task
 
-from .fixtures import Handlers
+from .fixtures import Handlers, handler
+
+# the items each call of double failed for
+FAILED_ITEMS = []
+# the items of each call of triple_all
+BATCHES = []
+
+
+def double(item, *args):
+    # fails for negative items until they were called as many times as the item says
+    if item < 0 and FAILED_ITEMS.count(item) < -item:
+        FAILED_ITEMS.append(item)
+        raise ValueError(f"Boom {item}")
+    return item * 2 + sum(args)
+
+
+def triple_all(args_list):
+    BATCHES.append([args[0] for args in args_list])
+    return [args[0] * 3 for args in args_list]
+
+
+@batched(triple_all, max_size=2)
+def triple(item):
+    return item * 3
 
 
 class TestBaseTask(object):
@@ -169,6 +198,47 @@ class TestBaseTask(object):
         root._status = BaseTask.STATUS_HALTED
         assert leaf.is_halted
 
+    def test_is_halted_after(self):
+        root = BaseTask()
+        mid = BaseTask()
+        leaf = BaseTask()
+
+        root.then(mid).then(leaf)
+        mid._status = BaseTask.STATUS_HALTED
+        assert not root.is_halted
+        assert mid.is_halted
+        assert leaf.is_halted
+
+        mid._status = BaseTask.STATUS_PENDING
+        assert not leaf.is_halted
+
+    def test_then_joins_shorter_chain_first(self):
+        root = BaseTask()
+        root._status = BaseTask.STATUS_HALTED
+        leaf = BaseTask()
+        leaf.then(BaseTask()).then(BaseTask())
+
+        result = root.then(leaf)
+        assert result == leaf.next.next
+        assert result.local_root == root
+        assert root.leaf == result
+        assert leaf.is_halted
+        assert root._chain is leaf._chain
+        assert root._chain.length == 4
+
+    def test_then_long_chain(self):
+        root = BaseTask()
+        leaf = root
+        for _ in range(100000):
+            leaf = leaf.then(BaseTask())
+
+        assert root.leaf == leaf
+        assert leaf.local_root == root
+        assert not leaf.is_halted
+
+        root._status = BaseTask.STATUS_HALTED
+        assert leaf.is_halted
+
     def test_set_ids(self):
         root = BaseTask()
         mid = BaseTask()
@@ -291,6 +361,29 @@ class TestBaseTask(object):
         assert tasks_data[2]["id"] == 12
         assert tasks_data[2]["prev"] == 11
 
+    def test_to_list_long_chain(self):
+        root = BaseTask()
+        leaf = root
+        for _ in range(100000):
+            leaf = leaf.then(BaseTask())
+
+        assert root.set_ids() == 100002
+
+        tasks_data = root.to_list()
+        assert len(tasks_data) == 100001
+        assert [task_data["id"] for task_data in tasks_data] == list(range(1, 100002))
+        assert tasks_data[-1]["prev"] == 100000
+
+    def test_to_list_nested_composites(self):
+        task = BaseTask()
+        for _ in range(5000):
+            task = CompositeTask(task)
+
+        assert task.set_ids() == 5002
+        tasks_data = task.to_list()
+        assert len(tasks_data) == 5001
+        assert tasks_data[-1]["sub_tasks"] == [5000]
+
     def test_from_data(self):
         task = BaseTask()
         task.max_runs = 5
@@ -331,6 +424,23 @@ class TestTask(object):
         assert task._func == Handlers.repeat
         assert task._args == (1, 2)
 
+    def test_memory_per_task(self):
+        # tasks, their chain bookkeeping and their empty args included
+        count = 20000
+        tracemalloc.start()
+        try:
+            composite = CompositeTask(*[Task(func=handler) for _ in range(count)])
+            memory, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert composite.status == BaseTask.STATUS_PENDING
+        assert memory / count < 350
+
+    def test_no_instance_dict(self):
+        assert not hasattr(Task(func=Handlers.repeat), "__dict__")
+        assert not hasattr(CompositeTask(), "__dict__")
+
     def test_func_name(self):
         task = Task(func=Handlers.repeat)
         assert task.func_name == "taskflow.test.fixtures.Handlers.repeat"
@@ -480,6 +590,34 @@ class TestComposite(object):
         task1._status = BaseTask.STATUS_HALTED
         assert task2.is_halted
 
+    def test_is_halted_nested(self):
+        sub1 = Task(func=Handlers.repeat)
+        sub11 = Task(func=Handlers.repeat)
+        inner = CompositeTask(sub11)
+        sub1.then(inner)
+
+        task = CompositeTask(sub1)
+        then = task.then(Task(func=Handlers.repeat))
+        assert not then.is_halted
+
+        sub11._status = BaseTask.STATUS_HALTED
+        assert inner.is_halted
+        assert task.is_halted
+        assert then.is_halted
+        assert not sub1.is_halted
+
+        sub11._status = BaseTask.STATUS_COMPLETE
+        assert not then.is_halted
+
+    def test_is_halted_then_after_init(self):
+        sub1 = Task(func=Handlers.repeat)
+        task = CompositeTask(sub1)
+
+        halted = Task(func=Handlers.repeat)
+        halted._status = BaseTask.STATUS_HALTED
+        sub1.then(halted)
+        assert task.is_halted
+
     def test_result(self):
         sub1 = Task(func=Handlers.repeat)
         sub1._result = 1
@@ -492,6 +630,67 @@ class TestComposite(object):
         task = CompositeTask(sub1, sub2)
         assert task.result == [1, 21]
 
+    def test_status_then_after_init(self):
+        sub1 = Task(func=Handlers.repeat)
+        sub1._status = BaseTask.STATUS_COMPLETE
+
+        task = CompositeTask(sub1)
+        assert task.status == BaseTask.STATUS_COMPLETE
+
+        sub11 = sub1.then(Task(func=Handlers.repeat))
+        assert task.status == BaseTask.STATUS_PENDING
+
+        sub11._status = BaseTask.STATUS_COMPLETE
+        assert task.status == BaseTask.STATUS_COMPLETE
+
+    def test_status_nested_composite(self):
+        sub1 = Task(func=Handlers.repeat)
+        inner = CompositeTask(sub1)
+        sub2 = Task(func=Handlers.repeat)
+        task = CompositeTask(inner, sub2)
+
+        sub2._status = BaseTask.STATUS_COMPLETE
+        assert task.status == BaseTask.STATUS_PENDING
+
+        sub1._status = BaseTask.STATUS_HALTED
+        assert inner.status == BaseTask.STATUS_HALTED
+        assert task.status == BaseTask.STATUS_HALTED
+
+        sub1._status = BaseTask.STATUS_COMPLETE
+        assert inner.status == BaseTask.STATUS_COMPLETE
+        assert task.status == BaseTask.STATUS_COMPLETE
+
+    def test_result_cached(self):
+        sub1 = Task(func=Handlers.repeat)
+        sub1._result = 1
+        sub2 = Task(func=Handlers.repeat)
+
+        task = CompositeTask(sub1, sub2)
+        result = task.result
+        assert result == [1, None]
+        assert task._result_cache is not None
+
+        # every caller gets a copy
+        result.append(3)
+        assert task.result == [1, None]
+        assert task.result is not task.result
+
+        sub2._result = 2
+        assert task.result == [1, 2]
+
+    def test_result_nested_invalidated(self):
+        sub1 = Task(func=Handlers.repeat)
+        inner = CompositeTask(sub1)
+        task = CompositeTask(inner)
+        assert task.result == [[None]]
+
+        sub1._result = 1
+        assert task.result == [[1]]
+
+        sub11 = sub1.then(Task(func=Handlers.repeat))
+        sub11._result = 11
+        assert task.result == [[11]]
+
     def test_set_ids(self):
         sub1 = Task(func=Handlers.repeat)
         sub2 = Task(func=Handlers.repeat)
@@ -559,3 +758,132 @@ class TestComposite(object):
         assert task1._sub_tasks == data["sub_tasks"]
         assert data["sub_tasks"][0].parent == task1
         assert data["sub_tasks"][1].parent == task1
+
+
+class TestMapTask(object):
+    @pytest.fixture(autouse=True)
+    def _clear_failed_items(self):
+        FAILED_ITEMS.clear()
+        BATCHES.clear()
+
+    def test_run(self):
+        task = MapTask(double, range(7), chunk_size=3)
+
+        assert task.chunk_count == 3
+        assert task.run() == [0, 2, 4, 6, 8, 10, 12]
+        assert task.chunk_runs == [1, 1, 1]
+        assert task.done_chunks == 3
+
+    def test_empty(self):
+        assert MapTask(double, []).run() == []
+
+    def test_default_chunk_size(self, monkeypatch):
+        monkeypatch.setattr(Defaults, "chunk_size", 2)
+
+        assert MapTask(double, range(5)).chunk_count == 3
+
+    def test_failed_chunk_retried(self):
+        task = MapTask(double, [1, 2, -1, 3, 4], chunk_size=2)
+
+        assert task.run() is None
+        assert task.status == BaseTask.STATUS_PENDING
+        assert isinstance(task.error, ValueError)
+        assert task.done_chunks == 2
+        assert task.chunk_runs == [1, 1, 1]
+
+        # only the failed chunk runs again
+        assert task.run() == [2, 4, -2, 6, 8]
+        assert task.chunk_runs == [1, 2, 1]
+        assert task.runs == 2
+
+    def test_halts_per_chunk(self):
+        task = MapTask(double, [1, -5, 2], chunk_size=1, max_runs=2)
+        task.run()
+        task.run()
+
+        assert task.status == BaseTask.STATUS_HALTED
+        assert task.chunk_runs == [1, 2, 1]
+
+    def test_batch_function(self):
+        assert MapTask(triple, range(5), chunk_size=3).run() == [0, 3, 6, 9, 12]
+        # once per chunk, split by the max size
+        assert BATCHES == [[0, 1], [2], [3, 4]]
+
+    def test_serialized(self):
+        task = MapTask(double, [1, -1, 2], chunk_size=1, name="map")
+        task.set_ids()
+        task.run()
+        data = task.to_list()
+
+        assert data[0]["chunk_runs"] == [1, 1, 1]
+        assert data[0]["chunk_results"] == [[2], None, [4]]
+        assert "cacheable" not in data[0]
+
+        restored = MapTask.from_data(dict(data[0], prev=None))
+        assert restored.done_chunks == 2
+        assert restored.run() == [2, -2, 4]
+        assert "chunk_results" not in restored.to_list()[0]
+        assert MapTask.from_data(dict(restored.to_list()[0], prev=None)).result == [2, -2, 4]
+
+    def test_flow(self):
+        root = Task(sum, args=([1],))
+        root.then(MapTask(double, range(4), chunk_size=3)).then(Task(sum))
+        flow = Flow(root)
+
+        # the result of the previous task is passed along with every item
+        assert flow.run() == 2 * 6 + 4 * 1
+        assert len(flow.to_list()) == 3
+
+    def test_flow_checkpoint(self):
+        flow = Flow(MapTask(double, [1, -1, 2], chunk_size=1))
+        flow.step()
+
+        for restored in (Flow.from_list(flow.to_list()), Flow.from_bytes(flow.to_bytes())):
+            assert restored.run() == [2, -2, 4]
+            assert restored.root_task.chunk_runs == [1, 2, 1]
+
+    def test_delta_checkpoint(self):
+        flow = Flow(MapTask(double, [1, -1, 2], chunk_size=1))
+        checkpoint = flow.to_list()
+        flow.to_delta()
+        flow.step()
+        delta = flow.to_delta()
+
+        # the items are in the full checkpoint only
+        assert "items" not in delta[0]
+        restored = Flow.from_list(checkpoint)
+        restored.apply_delta(delta)
+        assert restored.root_task.runs == 1
+        assert restored.root_task.chunk_runs == [1, 1, 1]
+        assert restored.root_task.done_chunks == 2
+
+        # only the failed chunk runs again
+        assert restored.run() == [2, -2, 4]
+        assert restored.root_task.chunk_runs == [1, 2, 1]
+        assert restored.to_list()[0]["items"] == [1, -1, 2]
+
+    def test_columnar(self):
+        flow = ColumnarFlow.from_list(Flow(MapTask(double, [1, -1, 2], chunk_size=1)).to_list())
+        flow.step()
+
+        assert flow.to_list()[0]["chunk_results"] == [[2], None, [4]]
+        flow.run()
+        assert flow.get_result(1) == [2, -2, 4]
+
+    @pytest.mark.parametrize("executor_type", [ThreadPoolExecutor, ProcessPoolExecutor])
+    def test_executor(self, executor_type):
+        flow = Flow(CompositeTask(MapTask(double, range(5), chunk_size=2), MapTask(double, [1, -3], max_runs=1)))
+
+        with executor_type(2) as executor:
+            flow.run(executor=executor)
+
+        first, second = flow.root_task.get_all_tasks()
+        assert first.result == [0, 2, 4, 6, 8]
+        assert second.status == BaseTask.STATUS_HALTED
+        assert isinstance(second.error, ValueError)
+
+    def test_arun(self):
+        flow = Flow(MapTask(double, [1, -1, 2], chunk_size=2))
+
+        assert asyncio.run(flow.arun()) == [2, -2, 4]
+        assert flow.root_task.chunk_runs == [2, 1]
@@ -1,3 +1,6 @@
+import gc
+import weakref
+
 import pytest
 
 from taskflow import type_helpers
@@ -5,6 +8,18 @@ from taskflow import type_helpers
 from .fixtures import Handlers, InheritedHandlers, handler
 
 
+class Worker(object):
+    def work(self):
+        return self
+
+
+def _make_closure(value):
+    def local():
+        return value
+
+    return local
+
+
 def test_handler():
     # dummy test for coverage of the test fixture
     handler()
@@ -48,3 +63,63 @@ def test_import_string_no_dots():
 def test_import_string_not_found():
     with pytest.raises(ImportError):
         type_helpers.import_string("taskflow.missing")
+
+
+def test_function_to_string_unhashable():
+    class Unhashable(object):
+        __hash__ = None
+
+        def __init__(self):
+            self.__qualname__ = "unhashable"
+
+        def __call__(self):
+            pass
+
+    assert type_helpers.function_to_string(Unhashable()) == f"{__name__}.unhashable"
+
+
+def test_resolver_cache():
+    type_helpers.clear_resolver_cache()
+
+    assert type_helpers.function_from_string("taskflow.test.fixtures.Handlers.repeat") == Handlers.repeat
+    assert type_helpers.function_from_string("taskflow.test.fixtures.Handlers.repeat") == Handlers.repeat
+    assert type_helpers.type_from_string("taskflow.test.fixtures.Handlers") == Handlers
+
+    info = type_helpers.resolver_cache_info()
+    assert info["function_from_string"].hits == 1
+    assert info["function_from_string"].misses == 1
+    assert info["type_from_string"].misses == 1
+
+    type_helpers.clear_resolver_cache()
+    info = type_helpers.resolver_cache_info()
+    assert info["function_from_string"].currsize == 0
+    assert info["type_from_string"].currsize == 0
+
+
+def test_function_from_string_not_found_not_cached():
+    type_helpers.clear_resolver_cache()
+
+    with pytest.raises(ImportError):
+        type_helpers.function_from_string("taskflow.missing.func")
+
+    assert type_helpers.resolver_cache_info()["function_from_string"].currsize == 0
+
+
+def test_function_to_string_not_kept_alive():
+    type_helpers.clear_resolver_cache()
+    instance = Worker()
+    reference = weakref.ref(instance)
+
+    local = _make_closure(instance)
+
+    assert type_helpers.function_to_string(instance.work) == f"{__name__}.Worker.work"
+    assert type_helpers.function_to_string(local).endswith("_make_closure.<locals>.local")
+    assert type_helpers.resolver_cache_info()["function_to_string"].currsize == 0
+
+    del instance, local
+    gc.collect()
+    assert reference() is None
+
+    type_helpers.function_to_string(handler)
+    type_helpers.function_to_string(Handlers.repeat)
+    assert type_helpers.resolver_cache_info()["function_to_string"].currsize == 2
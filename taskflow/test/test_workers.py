@@ -0,0 +1,70 @@
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from taskflow import type_helpers
+from taskflow.flow import Flow
+from taskflow.tasks import BaseTask, CompositeTask, Task
+from taskflow.workers import RemoteTraceback, call_function, preload_functions
+
+from .fixtures import Handlers, fail, handler
+
+
+def make_lock():
+    # a result that cannot be pickled back to the parent process
+    return threading.Lock()
+
+
+def test_call_function():
+    result, exc_info, start_time, delta_time = call_function("taskflow.test.fixtures.Handlers.repeat", (1, 2), {})
+    assert result == (1, 2)
+    assert exc_info is None
+    assert start_time is not None
+    assert delta_time >= 0
+
+
+def test_call_function_error():
+    result, exc_info, _, _ = pickle.loads(pickle.dumps(call_function("taskflow.test.fixtures.fail", (), {})))
+    assert result is None
+    assert exc_info[0] is ValueError
+    assert isinstance(exc_info[1], ValueError)
+    assert isinstance(exc_info[1].__cause__, RemoteTraceback)
+    assert "Boom" in str(exc_info[1].__cause__)
+
+
+def test_preload_functions():
+    type_helpers.clear_resolver_cache()
+    preload_functions(["taskflow.test.fixtures.handler"])
+
+    assert type_helpers.resolver_cache_info()["function_from_string"].currsize == 1
+    assert type_helpers.function_from_string("taskflow.test.fixtures.handler") == handler
+
+
+def test_run_process_pool():
+    tasks = [Task(Handlers.repeat, args=(index,), needs_prev_result=False) for index in range(4)]
+    failing = Task(fail, max_runs=2, needs_prev_result=False)
+    flow = Flow(CompositeTask(*tasks).then(CompositeTask(failing, Task(handler, args=(5,)))))
+
+    with ProcessPoolExecutor(2, initializer=preload_functions, initargs=(["taskflow.test.fixtures.fail"],)) as executor:
+        flow.run(executor=executor)
+
+    assert [task.result for task in tasks] == [(0,), (1,), (2,), (3,)]
+    assert flow.is_halted
+    assert failing.status == BaseTask.STATUS_HALTED
+    assert failing.runs == 2
+    assert isinstance(failing.error, ValueError)
+    assert isinstance(failing.exc_info[1].__cause__, RemoteTraceback)
+
+
+def test_run_process_pool_unpicklable_result():
+    failing = Task(make_lock, max_runs=2, needs_prev_result=False)
+    flow = Flow(CompositeTask(failing, Task(handler, args=(1,), needs_prev_result=False)))
+
+    with ProcessPoolExecutor(2) as executor:
+        flow.run(executor=executor)
+
+    assert flow.is_halted
+    assert failing.status == BaseTask.STATUS_HALTED
+    assert failing.runs == 2
+    assert "pickle" in str(failing.error)
+    assert failing.execution_delta_time > 0
@@ -1,17 +1,40 @@
 import inspect
+from functools import lru_cache
 from importlib import import_module
 
+# number of entries kept by each of the caches below
+RESOLVER_CACHE_SIZE = 4096
 
+
+@lru_cache(maxsize=RESOLVER_CACHE_SIZE)
 def type_to_string(type_object):
     return f"{type_object.__module__}.{type_object.__name__}"
 
 
+@lru_cache(maxsize=RESOLVER_CACHE_SIZE)
 def type_from_string(type_name):
     container = import_string(type_name)
     return container
 
 
 def function_to_string(func):
+    if _lives_forever(func):
+        return _cached_function_to_string(func)
+
+    # the cache would keep the instance of a bound method, or the variables of a closure, alive
+    return _function_to_string(func)
+
+
+def _lives_forever(func):
+    # module level functions, and methods bound to a class, which are dropped with their module or class anyway
+    if inspect.ismethod(func) or inspect.isbuiltin(func):
+        owner = getattr(func, "__self__", None)
+        return owner is None or inspect.isclass(owner) or inspect.ismodule(owner)
+
+    return inspect.isfunction(func) and func.__closure__ is None and "<locals>" not in func.__qualname__
+
+
+def _function_to_string(func):
     cls = getattr(func, "__self__", None)
     if inspect.isclass(cls):
         return f"{cls.__module__}.{cls.__qualname__}.{func.__name__}"
@@ -20,6 +43,10 @@ def function_to_string(func):
     return f"{func.__module__}.{func.__qualname__}"
 
 
+_cached_function_to_string = lru_cache(maxsize=RESOLVER_CACHE_SIZE)(_function_to_string)
+
+
+@lru_cache(maxsize=RESOLVER_CACHE_SIZE)
 def function_from_string(func_path):
     container_name, func_name = func_path.rsplit(".", maxsplit=1)
 
@@ -32,6 +59,28 @@ def function_from_string(func_path):
     return getattr(container, func_name)
 
 
+def resolver_cache_info():
+    """
+    Return the hit/miss statistics of the caches used to convert types and functions to and from dotted paths.
+    """
+    return {
+        "type_to_string": type_to_string.cache_info(),
+        "type_from_string": type_from_string.cache_info(),
+        "function_to_string": _cached_function_to_string.cache_info(),
+        "function_from_string": function_from_string.cache_info(),
+    }
+
+
+def clear_resolver_cache():
+    """
+    Forget all converted types and functions, e.g. after a module was reloaded or an attribute was patched.
+    """
+    type_to_string.cache_clear()
+    type_from_string.cache_clear()
+    _cached_function_to_string.cache_clear()
+    function_from_string.cache_clear()
+
+
 def import_string(dotted_path):
     """
     Import a dotted module path and return the attribute/class designated by the
@@ -0,0 +1,135 @@
+import sys
+import traceback
+
+from .batching import execute_batch, get_batch_function
+from .cancellation import Cancelled, current_token
+from .outcomes import make_outcome, start_clock
+from .type_helpers import function_from_string
+
+
+class RemoteTraceback(Exception):
+    """
+    The formatted traceback of an exception raised in a worker process, set as the cause of the exception.
+    """
+
+    def __init__(self, tb):
+        super().__init__(tb)
+        self.tb = tb
+
+    def __str__(self):
+        return self.tb
+
+
+def _rebuild_exception(error, tb):
+    error.__cause__ = RemoteTraceback(tb)
+    return error
+
+
+class _ExceptionWithTraceback(object):
+    # tracebacks cannot be pickled - send the formatted one along and restore the exception when unpickling
+    def __init__(self, error):
+        self.error = error
+        self.tb = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+
+    def __reduce__(self):
+        return _rebuild_exception, (self.error, self.tb)
+
+
+def call_function(func_path, args, kwargs):
+    """
+    Resolve a function by its path and call it. Meant to be submitted to a process pool - the task itself stays in
+    the parent process, and each worker keeps the functions it resolved cached between calls.
+    Returns the outcome in the same form as Task._execute once it is unpickled in the parent process.
+    """
+    started = start_clock()
+    try:
+        result = function_from_string(func_path)(*args, **kwargs)
+    except Exception as ex:
+        return make_outcome(None, (type(ex), _ExceptionWithTraceback(ex), None), started)
+
+    return make_outcome(result, None, started)
+
+
+def call_batch(batch_func_path, func_path, args_list, kwargs):
+    """
+    Same as call_function for a batch of calls - see taskflow.batching.execute_batch. Returns the list of outcomes.
+    """
+    outcomes = execute_batch(function_from_string(batch_func_path), function_from_string(func_path), args_list, kwargs)
+    return [
+        (result, (exc_info[0], _ExceptionWithTraceback(exc_info[1]), None) if exc_info else None, start_time, delta)
+        for result, exc_info, start_time, delta in outcomes
+    ]
+
+
+def run_chunks(func, chunks, args, kwargs):
+    """
+    Call func(item, *args, **kwargs) for the items of each (index, items) chunk, or its batch version once per chunk
+    - see taskflow.batching. Stops before the next chunk once the current token is cancelled.
+    Returns the list of (index, results, exc_info) of the chunks that ran - results are None for a chunk that failed
+    - as the result of an outcome in the form Task._execute returns it. The exception info is the first failure, or
+    Cancelled if chunks were skipped.
+    """
+    started = start_clock()
+    batch_function = get_batch_function(func)
+    token = current_token()
+
+    outcomes = []
+    exc_info = None
+    for index, items in chunks:
+        if token.is_cancelled:
+            try:
+                raise Cancelled()
+            except Cancelled:
+                exc_info = exc_info or sys.exc_info()
+            break
+
+        try:
+            results = _run_chunk(func, batch_function, items, args, kwargs)
+            outcomes.append((index, results, None))
+        except Exception:
+            outcomes.append((index, None, sys.exc_info()))
+            exc_info = exc_info or outcomes[-1][2]
+
+    return make_outcome(outcomes, exc_info, started)
+
+
+def _run_chunk(func, batch_function, items, args, kwargs):
+    if batch_function is None:
+        return [func(item, *args, **kwargs) for item in items]
+
+    # a batch call that fails fails the chunk, which is retried as a whole anyway
+    size = batch_function.max_size or len(items) or 1
+    results = []
+    for start in range(0, len(items), size):
+        args_list = [(item, *args) for item in items[start:start + size]]
+        batch_results = list(batch_function.func(args_list, **kwargs))
+        if len(batch_results) != len(args_list):
+            raise ValueError(f"The batch function returned {len(batch_results)} results for {len(args_list)} calls")
+        results.extend(batch_results)
+
+    return results
+
+
+def call_chunks(func_path, chunks, args, kwargs):
+    """
+    Same as call_function for the chunks of a MapTask - see run_chunks.
+    """
+    outcomes, exc_info, start_time, delta = run_chunks(function_from_string(func_path), chunks, args, kwargs)
+    outcomes = [
+        (index, results, (error_info[0], _ExceptionWithTraceback(error_info[1]), None) if error_info else None)
+        for index, results, error_info in outcomes
+    ]
+    if exc_info is not None:
+        # there is no cancelling in worker processes, so it is the first failure
+        exc_info = next(error_info for _, _, error_info in outcomes if error_info)
+
+    return outcomes, exc_info, start_time, delta
+
+
+def preload_functions(func_paths):
+    """
+    Resolve the given function paths up front. Pass it as the initializer of a process pool to have its workers
+    import everything before the first task arrives.
+    """
+    for func_path in func_paths:
+        function_from_string(func_path)